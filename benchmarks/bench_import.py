@@ -0,0 +1,41 @@
+"""
+Import time benchmarks.
+
+The `timeraw_*` benchmarks run in a fresh interpreter, so the modules that were imported
+by previous benchmarks don't affect the results.
+"""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+
+HEAVY_MODULES = ("dask", "geopandas", "httpx", "pandas", "pyogrio", "rich", "shapely", "xarray")
+
+RESOLVE_PATH = """
+import seareport_data
+seareport_data.gebco("ice", download=False, check_hash=False)
+"""
+
+
+def timeraw_import_seareport_data() -> str:
+    return "import seareport_data"
+
+
+def timeraw_resolve_path() -> str:
+    return RESOLVE_PATH
+
+
+def timeraw_cli_help() -> str:
+    return "from seareport_data._cli import get_parser; get_parser().format_help()"
+
+
+def track_heavy_modules_imported() -> int:
+    """The number of heavy dependencies that are imported just to resolve the path of a cached file."""
+    code = RESOLVE_PATH + f"import sys; print(sum(name in sys.modules for name in {HEAVY_MODULES!r}))"
+    args = [sys.executable, "-c", code]
+    output = subprocess.run(args, capture_output=True, check=True, text=True).stdout  # noqa: S603
+    return int(output)
+
+
+track_heavy_modules_imported.unit = "modules"  # type: ignore[attr-defined]
@@ -0,0 +1,325 @@
+# ruff: noqa: ARG002, RUF012
+# asv passes the result of `setup_cache()` and the parameters to every method, used or not
+"""
+I/O benchmarks: downloads from a local HTTP server, hashing, decompression, registries, accessors, chunking
+and sampling.
+
+The synthetic fixtures are built once per run by `setup_cache()`. See `common.py` for their size.
+"""
+
+from __future__ import annotations
+
+import collections.abc
+import os
+import pathlib
+import shutil
+import tempfile
+import typing as T
+
+import seareport_data as D
+from .common import build_fixtures
+from .common import PLAIN
+from .common import TILE_SIZE
+from .common import TILED_NC
+from seareport_data import _core as core
+from seareport_data import _hdf5 as hdf5
+from seareport_data._testing import RangeServer
+
+# Constants
+FIXTURES = "fixtures"
+BBOX = (-10.0, 30.0, 40.0, 45.0)
+# dask chunks of 1.5 on-disk chunks, so that most of them overlap 4 on-disk chunks
+CHUNKS: dict[str, T.Any] = {
+    "native": "native",
+    "misaligned": {"lat": TILE_SIZE * 3 // 2, "lon": TILE_SIZE * 3 // 2},
+}
+# Windows that are smaller than the on-disk chunks and not aligned with them, e.g. the cells of a mesh
+WINDOW = 200
+# Random points all over the globe, e.g. the nodes of a global mesh
+N_POINTS = 1_000_000
+
+
+def get_registry_url(fixtures: str) -> str:
+    return (pathlib.Path(fixtures) / "registry.json").as_uri()
+
+
+def get_cache_dir(fixtures: str) -> str:
+    return os.path.join(fixtures, "cache")
+
+
+OPENERS: dict[str, collections.abc.Callable[[str], T.Any]] = {
+    "gebco": lambda registry_url: D.gebco_ds("ice", "2024", registry_url=registry_url),
+    "srtm15p": lambda registry_url: D.srtm15p_ds("2.6", registry_url=registry_url),
+    "srtm15p_zarr": lambda registry_url: D.srtm15p_ds("2.6", registry_url=registry_url, format="zarr"),
+    "srtm15p_overview": lambda registry_url: D.srtm15p_ds("2.6", registry_url=registry_url, level=2),
+    "osm": lambda registry_url: D.osm_df("land", "2025-10", registry_url=registry_url),
+    "gshhg": lambda registry_url: D.gshhg_df("crude", "5", registry_url=registry_url),
+}
+SUBSETTERS: dict[str, collections.abc.Callable[[str], T.Any]] = {
+    "gebco": lambda registry_url: D.gebco_ds("ice", "2024", registry_url=registry_url, bbox=BBOX).load(),
+    "srtm15p": lambda registry_url: D.srtm15p_ds("2.6", registry_url=registry_url, bbox=BBOX).load(),
+    "srtm15p_zarr": lambda registry_url: D.srtm15p_ds(
+        "2.6",
+        registry_url=registry_url,
+        bbox=BBOX,
+        format="zarr",
+    ).load(),
+    "srtm15p_overview": lambda registry_url: D.srtm15p_ds(
+        "2.6",
+        registry_url=registry_url,
+        bbox=BBOX,
+        level=2,
+    ).load(),
+    "osm": lambda registry_url: D.osm_df("land", "2025-10", registry_url=registry_url, bbox=BBOX),
+    "gshhg": lambda registry_url: D.gshhg_df("crude", "5", registry_url=registry_url, bbox=BBOX),
+}
+
+
+def setup_cache() -> str:
+    fixtures = os.fspath(build_fixtures(pathlib.Path(FIXTURES).absolute()))
+    # Populate the cache of the accessor benchmarks (including the Zarr stores and the overviews),
+    # so that they measure opening the files, not fetching or transcoding them
+    os.environ["SEAREPORT_DATA_DIR"] = get_cache_dir(fixtures)
+    registry_url = get_registry_url(fixtures)
+    for opener in OPENERS.values():
+        opener(registry_url)
+    return fixtures
+
+
+setup_cache.timeout = 1800  # type: ignore[attr-defined]
+
+
+class TemporaryCache:
+    """
+    Run each benchmark with an empty cache directory.
+    """
+
+    def setup(self, fixtures: str, *args: T.Any) -> None:
+        self.tmp_dir = pathlib.Path(tempfile.mkdtemp())
+        self.environ = os.environ.copy()
+        os.environ["SEAREPORT_DATA_DIR"] = os.fspath(self.tmp_dir)
+        self.server = RangeServer(fixtures).start()
+
+    def teardown(self, fixtures: str, *args: T.Any) -> None:
+        self.server.close()
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+class Download(TemporaryCache):
+    params = ([1, 4],)
+    param_names = ["connections"]
+    timeout = 600
+
+    def time_download(self, fixtures: str, connections: int) -> None:
+        core.download(self.server.url + PLAIN, self.tmp_dir / PLAIN, connections=connections)
+
+
+class DownloadDecompressed(TemporaryCache):
+    timeout = 600
+
+    def time_download_zstd(self, fixtures: str) -> None:
+        core.download_zstd(f"{self.server.url}{PLAIN}.zst", self.tmp_dir / PLAIN)
+
+    def time_download_zip_member(self, fixtures: str) -> None:
+        core.download_zip_member(f"{self.server.url}{PLAIN}.zip", filename=PLAIN, target_dir=self.tmp_dir)
+
+    def time_download_zip_archive(self, fixtures: str) -> None:
+        # The archive is stored on disk and extracted afterwards
+        core.download_zip_member(
+            f"{self.server.url}{PLAIN}.zip",
+            filename=PLAIN,
+            target_dir=self.tmp_dir,
+            archive=f"{PLAIN}.zip",
+        )
+
+
+class Hash:
+    params = ([2**16, 2**20, 2**24],)
+    param_names = ["chunksize"]
+    timeout = 300
+
+    def time_hash_file(self, fixtures: str, chunksize: int) -> None:
+        core.hash_file(os.path.join(fixtures, PLAIN), chunksize=chunksize)
+
+
+class Extract(TemporaryCache):
+    timeout = 600
+
+    def time_extract_zstd(self, fixtures: str) -> None:
+        core.extract_zstd(os.path.join(fixtures, f"{PLAIN}.zst"), self.tmp_dir / PLAIN)
+
+    def time_extract_zip(self, fixtures: str) -> None:
+        core.extract_zip(os.path.join(fixtures, f"{PLAIN}.zip"), PLAIN, self.tmp_dir)
+
+
+class LoadRegistry(TemporaryCache):
+    def setup(self, fixtures: str, *args: T.Any) -> None:
+        super().setup(fixtures)
+        self.registry_url = f"{self.server.url}registry.json"
+        # Populate the on-disk cache of the remote registry
+        core.load_registry(self.registry_url)
+
+    def time_load_packaged(self, fixtures: str) -> None:
+        core.load_packaged_registry.cache_clear()
+        core.load_registry()
+
+    def time_load_remote(self, fixtures: str) -> None:
+        core.clear_registry_cache()
+        shutil.rmtree(core.get_registry_cache_path(self.registry_url).parent, ignore_errors=True)
+        core.load_registry(self.registry_url)
+
+    def time_load_remote_from_disk(self, fixtures: str) -> None:
+        core.clear_registry_cache()
+        core.load_registry(self.registry_url)
+
+    def time_load_remote_revalidated(self, fixtures: str) -> None:
+        # A TTL of 0 makes every load revalidate the copy on disk (i.e. a 304 response)
+        os.environ["SEAREPORT_DATA_REGISTRY_TTL"] = "0"
+        core.clear_registry_cache()
+        core.load_registry(self.registry_url)
+
+    def time_load_remote_memoized(self, fixtures: str) -> None:
+        core.load_registry(self.registry_url)
+
+    def time_load_file(self, fixtures: str) -> None:
+        core.load_registry(get_registry_url(fixtures))
+
+
+class Accessors:
+    params = (list(OPENERS),)
+    param_names = ["accessor"]
+    timeout = 300
+
+    def setup(self, fixtures: str, accessor: str) -> None:
+        # Import time is measured by `bench_import`
+        import geopandas  # noqa: F401
+        import xarray  # noqa: F401
+
+        self.environ = os.environ.copy()
+        os.environ["SEAREPORT_DATA_DIR"] = get_cache_dir(fixtures)
+        self.registry_url = get_registry_url(fixtures)
+
+    def teardown(self, fixtures: str, accessor: str) -> None:
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+    def time_open(self, fixtures: str, accessor: str) -> None:
+        OPENERS[accessor](self.registry_url)
+
+    def time_open_subset(self, fixtures: str, accessor: str) -> None:
+        SUBSETTERS[accessor](self.registry_url)
+
+    def peakmem_open_subset(self, fixtures: str, accessor: str) -> None:
+        SUBSETTERS[accessor](self.registry_url)
+
+
+def read_io_counter() -> int:
+    """
+    Return the bytes read by the process so far, cached or not. Only available on Linux.
+    """
+    with open("/proc/self/io") as fd:
+        counters = dict(line.split(": ") for line in fd)
+    return int(counters["rchar"])
+
+
+class Chunks:
+    """
+    Read a compressed, tiled grid with dask chunks that are aligned (or not) with the on-disk chunks,
+    and with the default (or tuned) chunk cache of HDF5.
+
+    Every on-disk chunk that is read again is decompressed again, so the read amplification
+    (the bytes read over the size of the file) is also the decompression amplification.
+    """
+
+    params = (list(CHUNKS), ["default", "tuned"])
+    param_names = ["chunks", "cache"]
+    timeout = 300
+
+    def setup(self, fixtures: str, chunks: str, cache: str) -> None:
+        if not os.path.exists("/proc/self/io"):
+            raise NotImplementedError("The read amplification is only tracked on Linux")
+        self.path = os.path.join(fixtures, TILED_NC)
+        self.environ = os.environ.copy()
+        if cache == "default":
+            os.environ["SEAREPORT_DATA_HDF5_CHUNK_CACHE"] = "0"
+
+    def teardown(self, fixtures: str, chunks: str, cache: str) -> None:
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+    def read_tiles(self, chunks: str) -> int:
+        start = read_io_counter()
+        with hdf5.open_dataset(self.path, {"engine": "h5netcdf", "chunks": CHUNKS[chunks]}) as ds:
+            ds.z.mean().compute()
+        return read_io_counter() - start
+
+    def read_windows(self, cache: str) -> int:
+        start = read_io_counter()
+        kwargs = {"engine": "h5netcdf", "pin_chunk_cache": cache == "tuned"}
+        with hdf5.open_dataset(self.path, kwargs) as ds:
+            n_lat, n_lon = ds.z.shape
+            for lat in range(0, n_lat, WINDOW):
+                for lon in range(0, n_lon, WINDOW):
+                    _ = ds.z[lat : lat + WINDOW, lon : lon + WINDOW].values
+        return read_io_counter() - start
+
+    def time_read_tiles(self, fixtures: str, chunks: str, cache: str) -> None:
+        self.read_tiles(chunks)
+
+    def track_read_amplification_tiles(self, fixtures: str, chunks: str, cache: str) -> float:
+        return self.read_tiles(chunks) / os.path.getsize(self.path)
+
+    def time_read_windows(self, fixtures: str, chunks: str, cache: str) -> None:
+        self.read_windows(cache)
+
+    def track_read_amplification_windows(self, fixtures: str, chunks: str, cache: str) -> float:
+        return self.read_windows(cache) / os.path.getsize(self.path)
+
+
+class Sample:
+    """
+    Sample a global grid at random points, compared to the vectorized interpolation of xarray.
+    """
+
+    params = (["nearest", "bilinear"],)
+    param_names = ["method"]
+    timeout = 300
+
+    def setup(self, fixtures: str, method: str) -> None:
+        import numpy as np
+
+        self.environ = os.environ.copy()
+        os.environ["SEAREPORT_DATA_DIR"] = get_cache_dir(fixtures)
+        self.registry_url = get_registry_url(fixtures)
+        rng = np.random.default_rng(0)
+        self.points = np.column_stack([rng.uniform(-180, 180, N_POINTS), rng.uniform(-90, 90, N_POINTS)])
+
+    def teardown(self, fixtures: str, method: str) -> None:
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+    def sample(self, method: str) -> None:
+        with D.srtm15p_ds("2.6", registry_url=self.registry_url) as ds:
+            D.sample(self.points, ds, method=T.cast(T.Any, method))
+
+    def interp(self, method: str) -> None:
+        import xarray as xr
+
+        lon = xr.DataArray(self.points[:, 0], dims="point")
+        lat = xr.DataArray(self.points[:, 1], dims="point")
+        with D.srtm15p_ds("2.6", registry_url=self.registry_url) as ds:
+            ds.z.interp(lon=lon, lat=lat, method="linear" if method == "bilinear" else method).compute()
+
+    def time_sample(self, fixtures: str, method: str) -> None:
+        self.sample(method)
+
+    def peakmem_sample(self, fixtures: str, method: str) -> None:
+        self.sample(method)
+
+    def time_interp(self, fixtures: str, method: str) -> None:
+        self.interp(method)
+
+    def peakmem_interp(self, fixtures: str, method: str) -> None:
+        self.interp(method)
@@ -0,0 +1,171 @@
+"""
+Synthetic fixtures for the I/O benchmarks.
+
+The size of the fixtures is controlled with `SEAREPORT_BENCH_SIZE` (e.g. `4G`). It defaults to `256M`,
+which keeps a `make bench` run short; use a multi-GB size to reproduce the behaviour with the real datasets.
+"""
+
+from __future__ import annotations
+
+import collections.abc
+import json
+import math
+import os
+import pathlib
+import shutil
+import zipfile
+
+import numpy as np
+
+from seareport_data import _core as core
+from seareport_data._cache import parse_size
+
+# Constants
+BENCH_SIZE = parse_size(os.environ.get("SEAREPORT_BENCH_SIZE", "256M"))
+BLOCK_ROWS = 256
+
+PLAIN = "plain.bin"
+GEBCO_NC = "GEBCO_2024.nc"
+SRTM15P_NC = "SRTM15_V2.6.nc"
+# A compressed grid with square chunks, like the tiled netCDF4 files that are read by tiles
+TILED_NC = "tiled.nc"
+TILE_SIZE = 256
+OSM_GPKG = "osm_land_complete_4326.gpkg"
+GSHHG_GPKG = "gshhg_crude_l5.gpkg"
+N_POLYGONS = 100_000
+
+
+def iter_terrain(n_rows: int, n_cols: int, seed: int = 0) -> collections.abc.Iterator[np.ndarray]:
+    """
+    Yield blocks of rows of a smooth int16 random walk, which compresses about as well as real bathymetry.
+    """
+    rng = np.random.default_rng(seed)
+    row = np.zeros(n_cols, dtype=np.int32)
+    for start in range(0, n_rows, BLOCK_ROWS):
+        steps = rng.integers(-8, 9, size=(min(BLOCK_ROWS, n_rows - start), n_cols), dtype=np.int32)
+        block = row + np.cumsum(steps, axis=0)
+        row = block[-1]
+        yield np.clip(block, -11000, 9000).astype(np.int16)
+
+
+def write_plain(path: pathlib.Path, size: int) -> None:
+    n_cols = 2**16
+    with open(path, "wb") as fd:
+        for block in iter_terrain(math.ceil(size / 2 / n_cols), n_cols):
+            fd.write(block.tobytes())
+        fd.truncate(size)
+
+
+def write_grid(
+    path: pathlib.Path,
+    size: int,
+    variable: str,
+    chunks: tuple[int, int] | None = None,
+    compression: str | None = None,
+) -> None:
+    """
+    Write a global lat/lon grid of about `size` bytes, in blocks, so that the memory usage stays bounded.
+
+    The chunks default to blocks of rows that are about 4096 columns wide.
+    """
+    import h5netcdf
+
+    n_lat = max(BLOCK_ROWS, int(math.sqrt(size / 2 / 2)))
+    n_lon = 2 * n_lat
+    with h5netcdf.File(path, "w") as nc:
+        nc.dimensions = {"lat": n_lat, "lon": n_lon}
+        lat = nc.create_variable("lat", ("lat",), "f8")
+        lat[:] = np.linspace(-90, 90, n_lat)
+        lat.attrs["units"] = "degrees_north"
+        lon = nc.create_variable("lon", ("lon",), "f8")
+        lon[:] = np.linspace(-180, 180, n_lon)
+        lon.attrs["units"] = "degrees_east"
+        if chunks is None:
+            chunks = (BLOCK_ROWS, math.ceil(n_lon / math.ceil(n_lon / 4096)))
+        data = nc.create_variable(variable, ("lat", "lon"), "i2", chunks=chunks, compression=compression)
+        for index, block in enumerate(iter_terrain(n_lat, n_lon)):
+            start = index * BLOCK_ROWS
+            data[start : start + len(block)] = block
+
+
+def write_polygons(path: pathlib.Path, n_polygons: int) -> None:
+    import geopandas as gpd
+    import shapely
+
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-180, 179, n_polygons)
+    y = rng.uniform(-90, 89, n_polygons)
+    size = rng.uniform(0.01, 1, n_polygons)
+    geometry = shapely.box(x, y, x + size, y + size)
+    gpd.GeoDataFrame(geometry=geometry, crs=4326).to_file(path, engine="pyogrio")
+
+
+def compress_zstd(src: pathlib.Path, dst: pathlib.Path) -> None:
+    import zstandard
+
+    with open(src, "rb") as f_in, open(dst, "wb") as f_out:
+        _ = zstandard.ZstdCompressor(level=3).copy_stream(f_in, f_out)
+
+
+def compress_zip(src: pathlib.Path, dst: pathlib.Path) -> None:
+    with zipfile.ZipFile(dst, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zip_ref:
+        zip_ref.write(src, arcname=src.name)
+
+
+def write_registry(directory: pathlib.Path) -> None:
+    """
+    Write a registry that describes the fixtures with URLs that are relative to the registry,
+    so that it works both with `file://` URLs and with the server, whatever its port.
+    """
+    registry = {
+        "GEBCO": {
+            "2024": {
+                "ice": {
+                    "url": "gebco.zip",
+                    "archive": "gebco.zip",
+                    "filename": GEBCO_NC,
+                    "hash": core.hash_file(directory / GEBCO_NC),
+                },
+            },
+        },
+        "SRTM15+": {
+            "2.6": {
+                "url": SRTM15P_NC,
+                "filename": SRTM15P_NC,
+                "hash": core.hash_file(directory / SRTM15P_NC),
+            },
+        },
+        "OSM": {
+            "2025-10": {
+                "land": {
+                    "url": f"{OSM_GPKG}.zst",
+                    "archive": f"{OSM_GPKG}.zstd",
+                    "filename": OSM_GPKG,
+                    "hash": core.hash_file(directory / OSM_GPKG),
+                },
+            },
+        },
+        "GSHHG": {
+            "2.3.7.1": {"base_url": "./", "hashes": {GSHHG_GPKG: core.hash_file(directory / GSHHG_GPKG)}},
+        },
+    }
+    (directory / "registry.json").write_text(json.dumps(registry, indent=2))
+
+
+def build_fixtures(directory: pathlib.Path) -> pathlib.Path:
+    # GeoPackages embed their creation time, so fixtures from a previous run would not match the new registry
+    shutil.rmtree(directory, ignore_errors=True)
+    directory.mkdir(parents=True)
+    write_plain(directory / PLAIN, BENCH_SIZE)
+    compress_zstd(directory / PLAIN, directory / f"{PLAIN}.zst")
+    compress_zip(directory / PLAIN, directory / f"{PLAIN}.zip")
+    write_grid(directory / GEBCO_NC, BENCH_SIZE, variable="elevation")
+    compress_zip(directory / GEBCO_NC, directory / "gebco.zip")
+    write_grid(directory / SRTM15P_NC, BENCH_SIZE, variable="z")
+    tiles = (TILE_SIZE, TILE_SIZE)
+    write_grid(directory / TILED_NC, BENCH_SIZE, variable="z", chunks=tiles, compression="gzip")
+    write_polygons(directory / OSM_GPKG, N_POLYGONS)
+    compress_zstd(directory / OSM_GPKG, directory / f"{OSM_GPKG}.zst")
+    write_polygons(directory / GSHHG_GPKG, N_POLYGONS)
+    write_registry(directory)
+    return directory
@@ -1,41 +1,218 @@
-import importlib.metadata
-
-from ._copernicus import copernicus
-from ._copernicus import copernicus_ds
-from ._emodnet import emodnet
-from ._etopo import etopo
-from ._etopo import etopo_ds
-from ._gebco import gebco
-from ._gebco import gebco_ds
-from ._gshhg import gshhg
-from ._gshhg import gshhg_df
-from ._osm import osm
-from ._osm import osm_df
-from ._rtopo import rtopo
-from ._rtopo import rtopo_ds
-from ._srtm15p import srtm15p
-from ._srtm15p import srtm15p_ds
-from ._utm import utm_df
-
-__version__ = importlib.metadata.version(__name__)
+from __future__ import annotations
+
+import typing as T
+from importlib import import_module
+
+if T.TYPE_CHECKING:
+    from ._aio import acopernicus
+    from ._aio import acopernicus_ds
+    from ._aio import adownload
+    from ._aio import aemodnet
+    from ._aio import aemodnet_ds
+    from ._aio import aetopo
+    from ._aio import aetopo_ds
+    from ._aio import afetch
+    from ._aio import agebco
+    from ._aio import agebco_ds
+    from ._aio import agshhg
+    from ._aio import agshhg_df
+    from ._aio import aosm
+    from ._aio import aosm_df
+    from ._aio import artopo
+    from ._aio import artopo_ds
+    from ._aio import asrtm15p
+    from ._aio import asrtm15p_ds
+    from ._aio import autm_df
+    from ._bundle import export_bundle
+    from ._bundle import export_mirror
+    from ._bundle import import_bundle
+    from ._cache import cache_usage
+    from ._cache import CacheEntry
+    from ._cache import evict
+    from ._cache import list_cache
+    from ._cache import pin
+    from ._cache import unpin
+    from ._copernicus import copernicus
+    from ._copernicus import copernicus_ds
+    from ._core import close_httpx_client
+    from ._core import Resource
+    from ._core import set_httpx_client
+    from ._emodnet import emodnet
+    from ._emodnet import emodnet_ds
+    from ._etopo import etopo
+    from ._etopo import etopo_ds
+    from ._fetch import fetch
+    from ._fetch import fetch_many
+    from ._fetch import FetchResult
+    from ._gebco import gebco
+    from ._gebco import gebco_ds
+    from ._gshhg import gshhg
+    from ._gshhg import gshhg_df
+    from ._instrument import add_sink
+    from ._instrument import collect_events
+    from ._instrument import Event
+    from ._instrument import LoggingSink
+    from ._instrument import MemorySink
+    from ._instrument import OpenTelemetrySink
+    from ._instrument import remove_sink
+    from ._instrument import Sink
+    from ._osm import osm
+    from ._osm import osm_df
+    from ._resources import iter_resources
+    from ._rtopo import rtopo
+    from ._rtopo import rtopo_ds
+    from ._sample import sample
+    from ._srtm15p import srtm15p
+    from ._srtm15p import srtm15p_ds
+    from ._utm import utm_df
+
+# The public API is imported lazily (PEP 562), so that e.g. `seareport_data.gebco()` doesn't import
+# xarray or geopandas and `import seareport_data` stays fast for CLIs and short-lived workers.
+_LAZY_IMPORTS: dict[str, str] = {
+    "acopernicus": "._aio",
+    "acopernicus_ds": "._aio",
+    "adownload": "._aio",
+    "aemodnet": "._aio",
+    "aemodnet_ds": "._aio",
+    "aetopo": "._aio",
+    "aetopo_ds": "._aio",
+    "afetch": "._aio",
+    "agebco": "._aio",
+    "agebco_ds": "._aio",
+    "agshhg": "._aio",
+    "agshhg_df": "._aio",
+    "aosm": "._aio",
+    "aosm_df": "._aio",
+    "artopo": "._aio",
+    "artopo_ds": "._aio",
+    "asrtm15p": "._aio",
+    "asrtm15p_ds": "._aio",
+    "autm_df": "._aio",
+    "export_bundle": "._bundle",
+    "export_mirror": "._bundle",
+    "import_bundle": "._bundle",
+    "cache_usage": "._cache",
+    "CacheEntry": "._cache",
+    "evict": "._cache",
+    "list_cache": "._cache",
+    "pin": "._cache",
+    "unpin": "._cache",
+    "copernicus": "._copernicus",
+    "copernicus_ds": "._copernicus",
+    "close_httpx_client": "._core",
+    "Resource": "._core",
+    "set_httpx_client": "._core",
+    "emodnet": "._emodnet",
+    "emodnet_ds": "._emodnet",
+    "etopo": "._etopo",
+    "etopo_ds": "._etopo",
+    "fetch": "._fetch",
+    "fetch_many": "._fetch",
+    "FetchResult": "._fetch",
+    "gebco": "._gebco",
+    "gebco_ds": "._gebco",
+    "gshhg": "._gshhg",
+    "gshhg_df": "._gshhg",
+    "add_sink": "._instrument",
+    "collect_events": "._instrument",
+    "Event": "._instrument",
+    "LoggingSink": "._instrument",
+    "MemorySink": "._instrument",
+    "OpenTelemetrySink": "._instrument",
+    "remove_sink": "._instrument",
+    "Sink": "._instrument",
+    "osm": "._osm",
+    "osm_df": "._osm",
+    "iter_resources": "._resources",
+    "rtopo": "._rtopo",
+    "rtopo_ds": "._rtopo",
+    "sample": "._sample",
+    "srtm15p": "._srtm15p",
+    "srtm15p_ds": "._srtm15p",
+    "utm_df": "._utm",
+}
 
 
 __all__: list[str] = [
+    "CacheEntry",
+    "Event",
+    "FetchResult",
+    "LoggingSink",
+    "MemorySink",
+    "OpenTelemetrySink",
+    "Resource",
+    "Sink",
     "__version__",
+    "acopernicus",
+    "acopernicus_ds",
+    "add_sink",
+    "adownload",
+    "aemodnet",
+    "aemodnet_ds",
+    "aetopo",
+    "aetopo_ds",
+    "afetch",
+    "agebco",
+    "agebco_ds",
+    "agshhg",
+    "agshhg_df",
+    "aosm",
+    "aosm_df",
+    "artopo",
+    "artopo_ds",
+    "asrtm15p",
+    "asrtm15p_ds",
+    "autm_df",
+    "cache_usage",
+    "close_httpx_client",
+    "collect_events",
     "copernicus",
     "copernicus_ds",
     "emodnet",
+    "emodnet_ds",
     "etopo",
     "etopo_ds",
+    "evict",
+    "export_bundle",
+    "export_mirror",
+    "fetch",
+    "fetch_many",
     "gebco",
     "gebco_ds",
     "gshhg",
     "gshhg_df",
+    "import_bundle",
+    "iter_resources",
+    "list_cache",
     "osm",
     "osm_df",
+    "pin",
+    "remove_sink",
     "rtopo",
     "rtopo_ds",
+    "sample",
+    "set_httpx_client",
     "srtm15p",
     "srtm15p_ds",
+    "unpin",
     "utm_df",
 ]
+
+
+def __getattr__(name: str) -> T.Any:
+    if name == "__version__":
+        from importlib.metadata import version
+
+        value: T.Any = version(__name__)
+    elif name in _LAZY_IMPORTS:
+        module = import_module(_LAZY_IMPORTS[name], __name__)
+        value = getattr(module, name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Cache the attribute, so that __getattr__ is only called once per name
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,1022 @@
+"""
+Asynchronous counterparts of the accessors.
+
+The accessors share the cache layout and the hash checks of the synchronous API. The network I/O
+happens on the event loop using `httpx.AsyncClient`, while file I/O, decompression and hashing
+happen in worker threads, so that the event loop is never blocked.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections.abc
+import concurrent.futures
+import contextlib
+import functools
+import logging
+import os
+import pathlib
+import queue
+import typing as ty
+
+import httpx
+import stamina
+import xxhash
+
+from . import _cache
+from . import _core as core
+from . import _instrument as instrument
+from . import _stream
+from ._copernicus import copernicus
+from ._copernicus import copernicus_ds
+from ._copernicus import COPERNICUSBathyVersion
+from ._copernicus import COPERNICUSDataset
+from ._emodnet import EMODNET
+from ._emodnet import emodnet_ds
+from ._emodnet import EMODNET_LATEST_VERSION
+from ._emodnet import EMODnetVersion
+from ._emodnet import get_emodnet_resources
+from ._emodnet import index_grids
+from ._enforce_literals import enforce_literals
+from ._etopo import etopo_ds
+from ._etopo import ETOPO_LATEST_VERSION
+from ._etopo import ETopoDataset
+from ._etopo import ETopoResolution
+from ._etopo import ETopoVersion
+from ._etopo import get_etopo_resource
+from ._fetch import locate
+from ._gebco import gebco_ds
+from ._gebco import GEBCO_LATEST_VERSION
+from ._gebco import GEBCODatasets
+from ._gebco import GEBCOVersion
+from ._gebco import get_gebco_resource
+from ._gshhg import get_gshhg_resource
+from ._gshhg import gshhg_df
+from ._gshhg import GSHHG_LATEST_VERSION
+from ._gshhg import GSHHGResolution
+from ._gshhg import GSHHGShoreline
+from ._gshhg import GSHHGVersion
+from ._lock import FileLock
+from ._osm import get_osm_resource
+from ._osm import osm_df
+from ._osm import OSM_LATEST_VERSION
+from ._osm import OSMDataset
+from ._osm import OSMVersion
+from ._rtopo import get_rtopo_resource
+from ._rtopo import rtopo_ds
+from ._rtopo import RTOPO_LATEST_VERSION
+from ._rtopo import RTopoDataset
+from ._rtopo import RTopoVersion
+from ._srtm15p import get_srtm15p_resource
+from ._srtm15p import srtm15p_ds
+from ._srtm15p import SRTM15P_LATEST_VERSION
+from ._srtm15p import SRTM15PVersion
+from ._subset import BBox
+
+if ty.TYPE_CHECKING:
+    import geopandas as gpd
+    import xarray as xr
+
+logger = logging.getLogger(__name__)
+
+# Types
+Decoder: ty.TypeAlias = collections.abc.Callable[
+    [collections.abc.Iterable[bytes]],
+    collections.abc.Iterator[bytes],
+]
+R = ty.TypeVar("R")
+
+# Constants
+# The amount of data that is accumulated before it is written to disk in a worker thread.
+WRITE_SIZE = 2**22
+# The maximum number of chunks that are waiting to be decompressed.
+QUEUE_SIZE = 16
+
+
+@contextlib.asynccontextmanager
+async def resolve_async_client(
+    client: httpx.AsyncClient | None = None,
+) -> collections.abc.AsyncIterator[httpx.AsyncClient]:
+    # An async client is bound to its event loop, so unlike the sync API there is no shared client.
+    # Pass a client explicitly to reuse connections between calls.
+    if client is not None:
+        yield client
+        return
+    async with httpx.AsyncClient(**core.get_httpx_client_options()) as owned:
+        yield owned
+
+
+class ChunkWriter:
+    """
+    Write chunks to a file and hash them. Meant to be called from worker threads.
+    """
+
+    def __init__(self, path: pathlib.Path, hasher: xxhash.xxh128, *, append: bool) -> None:
+        self.fd = open(path, "ab" if append else "wb")
+        self.hasher = hasher
+
+    def write(self, chunks: list[bytes]) -> None:
+        for chunk in chunks:
+            self.fd.write(chunk)
+            self.hasher.update(chunk)
+
+    def close(self) -> None:
+        self.fd.close()
+
+
+class ChunkQueue:
+    """
+    Pass chunks from the event loop to a consumer that runs in its own thread.
+
+    The queue is bounded, so a slow consumer applies backpressure to the download. The event loop waits
+    for a free slot without blocking any thread, so the consumers of concurrent downloads can't starve
+    the producers of threads (which the default executor would, once all its threads wait for chunks).
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.queue: queue.SimpleQueue[bytes | None] = queue.SimpleQueue()
+        self.slots = asyncio.Semaphore(QUEUE_SIZE)
+        self.is_closed = False
+        self.is_stopped = False
+
+    async def put(self, chunk: bytes) -> None:
+        await self.slots.acquire()
+        self.queue.put(chunk)
+
+    def close(self) -> None:
+        self.queue.put(None)
+
+    def __iter__(self) -> collections.abc.Iterator[bytes]:
+        while (chunk := self.queue.get()) is not None:
+            self.loop.call_soon_threadsafe(self.slots.release)
+            yield chunk
+        self.is_closed = True
+
+    def consume(self, func: collections.abc.Callable[[collections.abc.Iterator[bytes]], R]) -> R:
+        try:
+            return func(iter(self))
+        finally:
+            # Unblock the producer if the consumer stopped early (e.g. on error)
+            self.is_stopped = True
+            if not self.is_closed:
+                for _ in self:
+                    pass
+
+
+@stamina.retry(on=httpx.HTTPError, attempts=3)
+async def adownload_stream(url: str, filename: os.PathLike[str] | str, client: httpx.AsyncClient) -> str:
+    part_path = core.get_part_path(filename)
+    meta = await asyncio.to_thread(core.load_part_meta, filename)
+    offset = await asyncio.to_thread(core.get_part_size, filename)
+    headers: dict[str, str] = {}
+    if offset and meta.get("url") == url and (if_range := core.get_if_range(meta.get("validators", {}))):
+        headers = {"Range": f"bytes={offset}-", "If-Range": if_range}
+    async with client.stream("GET", url, headers=headers) as response:
+        if response.status_code == httpx.codes.REQUESTED_RANGE_NOT_SATISFIABLE:
+            await asyncio.to_thread(core.remove_part, filename)
+        _ = response.raise_for_status()
+        if response.status_code == httpx.codes.PARTIAL_CONTENT:
+            if core.get_content_range_start(response.headers) != offset:
+                await asyncio.to_thread(core.remove_part, filename)
+                raise httpx.RemoteProtocolError(f"Unexpected Content-Range while resuming: {url}")
+        else:
+            offset = 0
+            validators = core.get_validators(response.headers)
+            await asyncio.to_thread(core.save_part_meta, filename, {"url": url, "validators": validators})
+        content_length = int(response.headers.get("Content-Length", 0))
+        total = offset + content_length if content_length else None
+        if offset:
+            hasher = await asyncio.to_thread(core.hash_prefix, part_path, offset)
+        else:
+            hasher = xxhash.xxh128()
+        writer = await asyncio.to_thread(ChunkWriter, part_path, hasher, append=bool(offset))
+        try:
+            with instrument.progress_task(url, total=total, completed=offset) as task:
+                batch: list[bytes] = []
+                batch_size = 0
+                async for chunk in response.aiter_bytes():
+                    batch.append(chunk)
+                    batch_size += len(chunk)
+                    if batch_size >= WRITE_SIZE:
+                        await asyncio.to_thread(writer.write, batch)
+                        task.update(advance=batch_size)
+                        batch, batch_size = [], 0
+                await asyncio.to_thread(writer.write, batch)
+                task.update(advance=batch_size)
+        finally:
+            await asyncio.to_thread(writer.close)
+    await asyncio.to_thread(core.publish_part, filename)
+    digest = hasher.hexdigest()
+    await asyncio.to_thread(core.write_stamp, filename, digest)
+    return digest
+
+
+async def adownload(
+    url: str,
+    filename: os.PathLike[str] | str,
+    client: httpx.AsyncClient | None = None,
+) -> str:
+    """
+    Asynchronous counterpart of `core.download()`. Return the xxh128 hash of the downloaded file.
+
+    Interrupted downloads are resumed from their `.part` file. Ranged (multi-connection) downloads
+    are not supported; concurrency should come from fetching many files at the same time instead.
+    """
+    with instrument.phase("download", url=url) as span:
+        if core.is_file_url(url):
+            digest = await asyncio.to_thread(core.copy_file_url, url, filename)
+        else:
+            async with resolve_async_client(client) as client_:
+                digest = await adownload_stream(url, filename, client=client_)
+        span.nbytes = await asyncio.to_thread(os.path.getsize, filename)
+    return digest
+
+
+async def aiter_remote_chunks(
+    url: str,
+    client: httpx.AsyncClient,
+    task: instrument.Task,
+) -> collections.abc.AsyncIterator[bytes]:
+    offset = 0
+    validators: dict[str, str] = {}
+    async for attempt in stamina.retry_context(on=httpx.HTTPError, attempts=3):
+        with attempt:
+            headers: dict[str, str] = {}
+            if offset:
+                if not (if_range := core.get_if_range(validators)):
+                    raise ValueError(f"Can't resume streaming download without validators: {url}")
+                headers = {"Range": f"bytes={offset}-", "If-Range": if_range}
+            async with client.stream("GET", url, headers=headers) as response:
+                _ = response.raise_for_status()
+                if not offset:
+                    validators = core.get_validators(response.headers)
+                    task.update(total=int(response.headers.get("Content-Length", 0)) or None)
+                elif core.get_content_range_start(response.headers) != offset:
+                    raise ValueError(f"Server ignored range request or the resource changed: {url}")
+                async for chunk in response.aiter_bytes():
+                    offset += len(chunk)
+                    task.update(completed=offset)
+                    yield chunk
+
+
+def write_decoded(
+    chunks: collections.abc.Iterator[bytes],
+    target: os.PathLike[str] | str,
+    decoder: Decoder,
+) -> str:
+    hasher = xxhash.xxh128()
+    with open(core.get_part_path(target), "wb") as fd:
+        for chunk in decoder(chunks):
+            fd.write(chunk)
+            hasher.update(chunk)
+    core.publish_part(target)
+    digest = hasher.hexdigest()
+    core.write_stamp(target, digest)
+    return digest
+
+
+async def adownload_decompressed(
+    url: str,
+    target: os.PathLike[str] | str,
+    decoder: Decoder,
+    client: httpx.AsyncClient | None = None,
+) -> str:
+    """
+    Asynchronous counterpart of `core.download_decompressed()`.
+
+    The chunks are received on the event loop and they are decoded, written and hashed in a thread
+    of the download, which blocks while it waits for chunks (see `ChunkQueue`).
+    """
+    if core.is_file_url(url):
+        return await asyncio.to_thread(core.download_decompressed, url, target, decoder)
+    loop = asyncio.get_running_loop()
+    chunk_queue = ChunkQueue(loop)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="decoder")
+    consumer = loop.run_in_executor(
+        executor,
+        chunk_queue.consume,
+        functools.partial(write_decoded, target=target, decoder=decoder),
+    )
+    try:
+        with instrument.phase("download", url=url) as span, instrument.progress_task(url) as task:
+            try:
+                async with resolve_async_client(client) as client_:
+                    async for chunk in aiter_remote_chunks(url, client=client_, task=task):
+                        if chunk_queue.is_stopped:
+                            break
+                        await chunk_queue.put(chunk)
+            except BaseException:
+                chunk_queue.close()
+                with contextlib.suppress(Exception):
+                    _ = await consumer
+                raise
+            chunk_queue.close()
+            digest = await consumer
+            span.nbytes = task.completed
+            span.attributes["decompressed_bytes"] = await asyncio.to_thread(os.path.getsize, target)
+    finally:
+        executor.shutdown(wait=False)
+    return digest
+
+
+async def adownload_zip_member(
+    url: str,
+    filename: str,
+    target_dir: os.PathLike[str] | str,
+    archive: str | None = None,
+    client: httpx.AsyncClient | None = None,
+) -> str:
+    target = pathlib.Path(target_dir) / filename
+    try:
+        return await adownload_decompressed(
+            url,
+            target,
+            decoder=functools.partial(_stream.iter_zip_member, filename=filename),
+            client=client,
+        )
+    except _stream.UnsupportedArchiveError:
+        logger.info("Can't extract %s while streaming. Downloading the archive first.", url)
+        await asyncio.to_thread(core.lenient_remove, core.get_part_path(target))
+    archive_path = pathlib.Path(target_dir) / (archive or f"{filename}.zip")
+    _ = await adownload(url, archive_path, client=client)
+    digest = await asyncio.to_thread(core.extract_zip, archive_path, filename, target_dir)
+    await asyncio.to_thread(core.lenient_remove, archive_path)
+    return digest
+
+
+@contextlib.asynccontextmanager
+async def alock(path: os.PathLike[str] | str) -> collections.abc.AsyncIterator[FileLock]:
+    """
+    Asynchronous counterpart of `with FileLock(path)`.
+    """
+    lock = FileLock(path)
+    with instrument.phase("lock") as span:
+        for waits, interval in enumerate(lock.iter_waits()):
+            poll = asyncio.ensure_future(asyncio.to_thread(lock.poll))
+            try:
+                is_locked = await asyncio.shield(poll)
+            except asyncio.CancelledError:
+                # Don't leak the lock if it gets acquired after we were cancelled
+                if await poll:
+                    await asyncio.to_thread(lock.release)
+                raise
+            if is_locked:
+                span.attributes["contended"] = waits > 0
+                break
+            await asyncio.sleep(interval)
+    try:
+        yield lock
+    finally:
+        await asyncio.to_thread(lock.release)
+
+
+async def adownload_resource(
+    resource: core.Resource,
+    path: pathlib.Path,
+    client: httpx.AsyncClient | None = None,
+) -> str:
+    if resource.compression == "zip":
+        return await adownload_zip_member(
+            resource.url,
+            filename=path.name,
+            target_dir=path.parent,
+            archive=resource.archive,
+            client=client,
+        )
+    elif resource.compression == "zstd":
+        return await adownload_decompressed(resource.url, path, _stream.iter_zstd, client=client)
+    elif resource.compression == "gzip":
+        return await adownload_decompressed(resource.url, path, _stream.iter_gzip, client=client)
+    else:
+        return await adownload(resource.url, path, client=client)
+
+
+async def afetch(
+    resource: core.Resource,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    client: httpx.AsyncClient | None = None,
+) -> pathlib.Path:
+    """
+    Asynchronous counterpart of `fetch()`.
+    """
+    with instrument.phase("fetch", resource=resource.key) as span:
+        path = await asyncio.to_thread(locate, resource.path)
+        digest: str | None = None
+        is_cached = await asyncio.to_thread(path.exists)
+        span.cache_hit = is_cached
+        if download and not is_cached:
+            await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+            async with alock(path):
+                if not await asyncio.to_thread(path.exists):
+                    digest = await adownload_resource(resource, path, client=client)
+                    span.nbytes = await asyncio.to_thread(os.path.getsize, path)
+                    _ = await asyncio.to_thread(_cache.evict, keep=[path])
+        if check_hash:
+            await asyncio.to_thread(core.check_hash, path, resource.hash, digest)
+        if await asyncio.to_thread(path.exists):
+            await asyncio.to_thread(_cache.record_access, path)
+    return path
+
+
+async def aload_registry(registry_url: str | None = None) -> core.Registry:
+    return await asyncio.to_thread(core.load_registry, registry_url)
+
+
+def _to_paths(paths: list[pathlib.Path], *, as_paths: bool) -> list[str] | list[pathlib.Path]:
+    if as_paths:
+        return paths
+    else:
+        return [str(path) for path in paths]
+
+
+@ty.overload
+async def agebco(
+    dataset: GEBCODatasets,
+    version: GEBCOVersion = GEBCO_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: ty.Literal[False] = False,
+) -> list[str]: ...
+@ty.overload
+async def agebco(
+    dataset: GEBCODatasets,
+    version: GEBCOVersion = GEBCO_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: ty.Literal[True],
+) -> list[pathlib.Path]: ...
+@instrument.traced
+async def agebco(
+    dataset: GEBCODatasets,
+    version: GEBCOVersion = GEBCO_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: bool = False,
+) -> list[str] | list[pathlib.Path]:
+    enforce_literals(agebco)
+    registry = await aload_registry(registry_url=registry_url)
+    resource = get_gebco_resource(registry, dataset=dataset, version=version)
+    path = await afetch(resource, download=download, check_hash=check_hash, client=client)
+    return _to_paths([path], as_paths=as_paths)
+
+
+@instrument.traced
+async def agebco_ds(
+    dataset: GEBCODatasets,
+    version: GEBCOVersion = GEBCO_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    **kwargs: ty.Any,
+) -> xr.Dataset:
+    _ = await agebco(
+        dataset=dataset,
+        version=version,
+        download=download,
+        check_hash=check_hash,
+        registry_url=registry_url,
+        client=client,
+    )
+    return await asyncio.to_thread(
+        gebco_ds,
+        dataset=dataset,
+        version=version,
+        download=False,
+        check_hash=False,
+        registry_url=registry_url,
+        **kwargs,
+    )
+
+
+@ty.overload
+async def aetopo(
+    dataset: ETopoDataset,
+    resolution: ETopoResolution = "30sec",
+    version: ETopoVersion = ETOPO_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: ty.Literal[False] = False,
+) -> list[str]: ...
+@ty.overload
+async def aetopo(
+    dataset: ETopoDataset,
+    resolution: ETopoResolution = "30sec",
+    version: ETopoVersion = ETOPO_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: ty.Literal[True],
+) -> list[pathlib.Path]: ...
+@instrument.traced
+async def aetopo(
+    dataset: ETopoDataset,
+    resolution: ETopoResolution = "30sec",
+    version: ETopoVersion = ETOPO_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: bool = False,
+) -> list[str] | list[pathlib.Path]:
+    enforce_literals(aetopo)
+    registry = await aload_registry(registry_url=registry_url)
+    resource = get_etopo_resource(registry, dataset=dataset, resolution=resolution, version=version)
+    path = await afetch(resource, download=download, check_hash=check_hash, client=client)
+    return _to_paths([path], as_paths=as_paths)
+
+
+@instrument.traced
+async def aetopo_ds(
+    dataset: ETopoDataset,
+    resolution: ETopoResolution = "30sec",
+    version: ETopoVersion = ETOPO_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    **kwargs: ty.Any,
+) -> xr.Dataset:
+    _ = await aetopo(
+        dataset=dataset,
+        resolution=resolution,
+        version=version,
+        download=download,
+        check_hash=check_hash,
+        registry_url=registry_url,
+        client=client,
+    )
+    return await asyncio.to_thread(
+        etopo_ds,
+        dataset=dataset,
+        resolution=resolution,
+        version=version,
+        download=False,
+        check_hash=False,
+        registry_url=registry_url,
+        **kwargs,
+    )
+
+
+@ty.overload
+async def asrtm15p(
+    version: SRTM15PVersion = SRTM15P_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: ty.Literal[False] = False,
+) -> list[str]: ...
+@ty.overload
+async def asrtm15p(
+    version: SRTM15PVersion = SRTM15P_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: ty.Literal[True],
+) -> list[pathlib.Path]: ...
+@instrument.traced
+async def asrtm15p(
+    version: SRTM15PVersion = SRTM15P_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: bool = False,
+) -> list[str] | list[pathlib.Path]:
+    enforce_literals(asrtm15p)
+    registry = await aload_registry(registry_url=registry_url)
+    resource = get_srtm15p_resource(registry, version=version)
+    path = await afetch(resource, download=download, check_hash=check_hash, client=client)
+    return _to_paths([path], as_paths=as_paths)
+
+
+@instrument.traced
+async def asrtm15p_ds(
+    version: SRTM15PVersion = SRTM15P_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    **kwargs: ty.Any,
+) -> xr.Dataset:
+    _ = await asrtm15p(
+        version=version,
+        download=download,
+        check_hash=check_hash,
+        registry_url=registry_url,
+        client=client,
+    )
+    return await asyncio.to_thread(
+        srtm15p_ds,
+        version=version,
+        download=False,
+        check_hash=False,
+        registry_url=registry_url,
+        **kwargs,
+    )
+
+
+@ty.overload
+async def artopo(
+    dataset: RTopoDataset,
+    version: RTopoVersion = RTOPO_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: ty.Literal[False] = False,
+) -> list[str]: ...
+@ty.overload
+async def artopo(
+    dataset: RTopoDataset,
+    version: RTopoVersion = RTOPO_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: ty.Literal[True],
+) -> list[pathlib.Path]: ...
+@instrument.traced
+async def artopo(
+    dataset: RTopoDataset,
+    version: RTopoVersion = RTOPO_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: bool = False,
+) -> list[str] | list[pathlib.Path]:
+    enforce_literals(artopo)
+    registry = await aload_registry(registry_url=registry_url)
+    resource = get_rtopo_resource(registry, dataset=dataset, version=version)
+    path = await afetch(resource, download=download, check_hash=check_hash, client=client)
+    return _to_paths([path], as_paths=as_paths)
+
+
+@instrument.traced
+async def artopo_ds(
+    dataset: RTopoDataset,
+    version: RTopoVersion = RTOPO_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    normalize: bool = True,
+    **kwargs: ty.Any,
+) -> xr.Dataset:
+    _ = await artopo(
+        dataset=dataset,
+        version=version,
+        download=download,
+        check_hash=check_hash,
+        registry_url=registry_url,
+        client=client,
+    )
+    return await asyncio.to_thread(
+        rtopo_ds,
+        dataset=dataset,
+        version=version,
+        download=False,
+        check_hash=False,
+        registry_url=registry_url,
+        normalize=normalize,
+        **kwargs,
+    )
+
+
+@ty.overload
+async def agshhg(
+    resolution: GSHHGResolution,
+    shoreline: GSHHGShoreline,
+    version: GSHHGVersion = GSHHG_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: ty.Literal[False] = False,
+) -> list[str]: ...
+@ty.overload
+async def agshhg(
+    resolution: GSHHGResolution,
+    shoreline: GSHHGShoreline,
+    version: GSHHGVersion = GSHHG_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: ty.Literal[True],
+) -> list[pathlib.Path]: ...
+@instrument.traced
+async def agshhg(
+    resolution: GSHHGResolution,
+    shoreline: GSHHGShoreline,
+    version: GSHHGVersion = GSHHG_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: bool = False,
+) -> list[str] | list[pathlib.Path]:
+    enforce_literals(agshhg)
+    registry = await aload_registry(registry_url=registry_url)
+    resource = get_gshhg_resource(registry, resolution=resolution, shoreline=shoreline, version=version)
+    path = await afetch(resource, download=download, check_hash=check_hash, client=client)
+    return _to_paths([path], as_paths=as_paths)
+
+
+@instrument.traced
+async def agshhg_df(
+    resolution: GSHHGResolution,
+    shoreline: GSHHGShoreline,
+    version: GSHHGVersion = GSHHG_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    **kwargs: ty.Any,
+) -> gpd.GeoDataFrame:
+    _ = await agshhg(
+        resolution=resolution,
+        shoreline=shoreline,
+        version=version,
+        download=download,
+        check_hash=check_hash,
+        registry_url=registry_url,
+        client=client,
+    )
+    return await asyncio.to_thread(
+        gshhg_df,
+        resolution=resolution,
+        shoreline=shoreline,
+        version=version,
+        download=False,
+        check_hash=False,
+        registry_url=registry_url,
+        **kwargs,
+    )
+
+
+@ty.overload
+async def aosm(
+    dataset: OSMDataset = "land",
+    version: OSMVersion = OSM_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: ty.Literal[False] = False,
+) -> list[str]: ...
+@ty.overload
+async def aosm(
+    dataset: OSMDataset = "land",
+    version: OSMVersion = OSM_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: ty.Literal[True],
+) -> list[pathlib.Path]: ...
+@instrument.traced
+async def aosm(
+    dataset: OSMDataset = "land",
+    version: OSMVersion = OSM_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    as_paths: bool = False,
+) -> list[str] | list[pathlib.Path]:
+    enforce_literals(aosm)
+    registry = await aload_registry(registry_url=registry_url)
+    resource = get_osm_resource(registry, dataset=dataset, version=version)
+    path = await afetch(resource, download=download, check_hash=check_hash, client=client)
+    return _to_paths([path], as_paths=as_paths)
+
+
+@instrument.traced
+async def aosm_df(
+    dataset: OSMDataset = "land",
+    version: OSMVersion = OSM_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    **kwargs: ty.Any,
+) -> gpd.GeoDataFrame:
+    _ = await aosm(
+        dataset=dataset,
+        version=version,
+        download=download,
+        check_hash=check_hash,
+        registry_url=registry_url,
+        client=client,
+    )
+    return await asyncio.to_thread(
+        osm_df,
+        dataset=dataset,
+        version=version,
+        download=False,
+        check_hash=False,
+        registry_url=registry_url,
+        **kwargs,
+    )
+
+
+@ty.overload
+async def aemodnet(
+    version: EMODnetVersion = EMODNET_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    max_workers: int = 4,
+    bbox: BBox | None = None,
+    as_paths: ty.Literal[False] = False,
+) -> list[str]: ...
+@ty.overload
+async def aemodnet(
+    version: EMODnetVersion = EMODNET_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    max_workers: int = 4,
+    bbox: BBox | None = None,
+    as_paths: ty.Literal[True],
+) -> list[pathlib.Path]: ...
+@instrument.traced
+async def aemodnet(
+    version: EMODnetVersion = EMODNET_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    max_workers: int = 4,
+    bbox: BBox | None = None,
+    as_paths: bool = False,
+) -> list[str] | list[pathlib.Path]:
+    enforce_literals(aemodnet)
+    registry = await aload_registry(registry_url=registry_url)
+    # Selecting the tiles may read the grids of the cached tiles
+    resources = await asyncio.to_thread(get_emodnet_resources, registry, version, bbox)
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def fetch_tile(resource: core.Resource, client: httpx.AsyncClient) -> pathlib.Path:
+        async with semaphore:
+            path = await afetch(resource, download=download, check_hash=check_hash, client=client)
+        overall.update(advance=1)
+        return path
+
+    async with resolve_async_client(client) as client_:
+        with instrument.progress_task("Resources", total=len(resources)) as overall:
+            paths = await asyncio.gather(*(fetch_tile(resource, client_) for resource in resources))
+    await asyncio.to_thread(index_grids, resources, paths, registry[EMODNET][str(version)])
+    return _to_paths(list(paths), as_paths=as_paths)
+
+
+@instrument.traced
+async def aemodnet_ds(
+    version: EMODnetVersion = EMODNET_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    client: httpx.AsyncClient | None = None,
+    max_workers: int = 4,
+    bbox: BBox | None = None,
+    buffer: float = 0.0,
+    **kwargs: ty.Any,
+) -> xr.Dataset:
+    buffered = (
+        None if bbox is None else (bbox[0] - buffer, bbox[1] - buffer, bbox[2] + buffer, bbox[3] + buffer)
+    )
+    _ = await aemodnet(
+        version=version,
+        download=download,
+        check_hash=check_hash,
+        registry_url=registry_url,
+        client=client,
+        max_workers=max_workers,
+        bbox=buffered,
+    )
+    return await asyncio.to_thread(
+        emodnet_ds,
+        version=version,
+        download=False,
+        check_hash=False,
+        registry_url=registry_url,
+        bbox=bbox,
+        buffer=buffer,
+        **kwargs,
+    )
+
+
+@ty.overload
+async def acopernicus(
+    dataset: COPERNICUSDataset = "bathy",
+    version: COPERNICUSBathyVersion | None = None,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    as_paths: ty.Literal[False] = False,
+) -> list[str]: ...
+@ty.overload
+async def acopernicus(
+    dataset: COPERNICUSDataset = "bathy",
+    version: COPERNICUSBathyVersion | None = None,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    as_paths: ty.Literal[True],
+) -> list[pathlib.Path]: ...
+@instrument.traced
+async def acopernicus(
+    dataset: COPERNICUSDataset = "bathy",
+    version: COPERNICUSBathyVersion | None = None,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    as_paths: bool = False,
+) -> list[str] | list[pathlib.Path]:
+    # The Copernicus data are downloaded by `copernicusmarine`, which only has a blocking API
+    paths = await asyncio.to_thread(
+        copernicus,
+        dataset=dataset,
+        version=version,
+        download=download,
+        check_hash=check_hash,
+        registry_url=registry_url,
+        as_paths=True,
+    )
+    return _to_paths(paths, as_paths=as_paths)
+
+
+@instrument.traced
+async def acopernicus_ds(
+    dataset: COPERNICUSDataset = "bathy",
+    version: COPERNICUSBathyVersion | None = None,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    **kwargs: ty.Any,
+) -> xr.Dataset:
+    return await asyncio.to_thread(
+        copernicus_ds,
+        dataset=dataset,
+        version=version,
+        download=download,
+        check_hash=check_hash,
+        registry_url=registry_url,
+        **kwargs,
+    )
+
+
+async def autm_df() -> gpd.GeoDataFrame:
+    from ._utm import utm_df
+
+    return await asyncio.to_thread(utm_df)
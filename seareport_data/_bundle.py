@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import collections.abc
+import concurrent.futures
+import dataclasses
+import datetime as dt
+import io
+import json
+import logging
+import os
+import pathlib
+import tarfile
+import tempfile
+import typing as T
+
+from . import _core as core
+from . import _instrument as instrument
+from ._fetch import fetch_many
+from ._fetch import FetchResult
+from ._lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+# Constants
+BUNDLE_FORMAT = 1
+MANIFEST = "manifest.json"
+REGISTRY = "registry.json"
+DATA = "data"
+
+
+def raise_on_failure(results: list[FetchResult]) -> list[pathlib.Path]:
+    errors = [result.error for result in results if result.error is not None]
+    if errors:
+        raise errors[0]
+    return [T.cast(pathlib.Path, result.path) for result in results]
+
+
+def add_json(tar: tarfile.TarFile, name: str, data: T.Any) -> None:
+    payload = json.dumps(data, indent=2).encode()
+    info = tarfile.TarInfo(name)
+    info.size = len(payload)
+    info.mtime = int(dt.datetime.now(tz=dt.timezone.utc).timestamp())
+    tar.addfile(info, io.BytesIO(payload))
+
+
+def compress_file(src: os.PathLike[str] | str, dst: os.PathLike[str] | str, level: int) -> None:
+    import zstandard
+
+    with open(src, "rb") as f_in, open(dst, "wb") as f_out:
+        _ = zstandard.ZstdCompressor(level=level).copy_stream(f_in, f_out)
+
+
+def get_member_name(resource: core.Resource) -> str:
+    return f"{DATA}/{resource.path}.zst"
+
+
+def export_bundle(
+    resources: collections.abc.Iterable[core.Resource],
+    bundle_path: os.PathLike[str] | str,
+    *,
+    registry_url: str | None = None,
+    max_workers: int = 4,
+    level: int = 3,
+) -> pathlib.Path:
+    """
+    Pack `resources` into a bundle that can be imported into the cache of another machine with `import_bundle()`.
+
+    The resources that are not in the cache are downloaded first. The bundle is a tar archive that contains
+    a `manifest.json` with the resources and their hashes, the `registry.json` they were resolved from,
+    and each file compressed with zstd. The files are compressed individually, so they can be
+    compressed and decompressed in parallel.
+
+    The registry is kept as it is, i.e. its URLs still point to the original servers. A bundle restores
+    the files of the cache (e.g. the extracted NetCDF files, not the zip archives), which the accessors
+    find without downloading anything, so the URLs are only used to download the files again if they are
+    evicted. Use `export_mirror()` for a registry that points to local copies of the original files.
+
+    Parameters:
+        resources: The resources to include, e.g. from `iter_resources()`.
+        bundle_path: The path of the bundle, e.g. `seareport.tar`.
+        registry_url: The registry the resources were resolved from. If None, the default registry is used.
+        max_workers: The number of files that are downloaded and compressed at the same time.
+        level: The zstd compression level.
+    """
+    resources = list(resources)
+    paths = raise_on_failure(fetch_many(resources, max_workers=max_workers))
+    bundle_path = pathlib.Path(bundle_path)
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "created_at": dt.datetime.now(tz=dt.timezone.utc).isoformat(),
+        "resources": [
+            {"resource": dataclasses.asdict(resource), "size": path.stat().st_size}
+            for resource, path in zip(resources, paths, strict=True)
+        ],
+    }
+    with tempfile.TemporaryDirectory(dir=bundle_path.parent, prefix=f".{bundle_path.name}.") as tmp_dir:
+        compressed = [pathlib.Path(tmp_dir) / f"{index}.zst" for index in range(len(resources))]
+        logger.info("Compressing %d files", len(resources))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(compress_file, path, dst, level=level)
+                for path, dst in zip(paths, compressed, strict=True)
+            ]
+            for future in futures:
+                future.result()
+        with tarfile.open(core.get_part_path(bundle_path), "w") as tar:
+            add_json(tar, MANIFEST, manifest)
+            add_json(tar, REGISTRY, core.load_registry(registry_url))
+            for resource, path in zip(resources, compressed, strict=True):
+                tar.add(path, arcname=get_member_name(resource))
+    core.publish_part(bundle_path)
+    logger.info("Exported %d resources to: %s", len(resources), bundle_path)
+    return bundle_path
+
+
+def unpack_member(
+    bundle_path: os.PathLike[str] | str,
+    member: tarfile.TarInfo,
+    resource: core.Resource,
+) -> pathlib.Path:
+    import zstandard
+
+    path = core.get_cache_path() / resource.path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with FileLock(path):
+        if path.exists():
+            logger.debug("Already in the cache: %s", path)
+            core.check_hash(path, resource.hash)
+            return path
+        # Every worker uses its own file object, so that members are read in parallel
+        with tarfile.open(bundle_path, "r:") as tar:
+            src = tar.extractfile(member)
+            assert src is not None
+            with src, zstandard.ZstdDecompressor().stream_reader(src) as reader:
+                with open(core.get_part_path(path), "wb") as dst:
+                    digest = core.copy_and_hash(reader, dst)
+        if digest != resource.hash:
+            core.remove_part(path)
+            raise ValueError(f"hash mismatch: {digest} != {resource.hash}")
+        core.publish_part(path)
+        core.write_stamp(path, digest, verified=True)
+    return path
+
+
+def import_bundle(
+    bundle_path: os.PathLike[str] | str,
+    *,
+    max_workers: int = 4,
+    registry_path: os.PathLike[str] | str | None = None,
+) -> list[pathlib.Path]:
+    """
+    Unpack a bundle that was created with `export_bundle()` into the cache.
+
+    The files are decompressed in parallel and their hashes are verified. Files that are already
+    in the cache are kept.
+
+    Parameters:
+        bundle_path: The path of the bundle.
+        max_workers: The number of files that are decompressed at the same time.
+        registry_path: If not None, the registry of the bundle is written to this path. It can then be used
+            with e.g. `registry_url=pathlib.Path(registry_path).absolute().as_uri()`. Its URLs are the
+            original ones (see `export_bundle()`).
+
+    Returns:
+        The paths of the resources in the cache.
+    """
+    with tarfile.open(bundle_path, "r:") as tar:
+        members = {member.name: member for member in tar.getmembers()}
+        manifest = json.load(T.cast(T.IO[bytes], tar.extractfile(members[MANIFEST])))
+        if manifest["format"] != BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported bundle format: {manifest['format']}")
+        if registry_path is not None:
+            registry = T.cast(T.IO[bytes], tar.extractfile(members[REGISTRY])).read()
+            pathlib.Path(registry_path).write_bytes(registry)
+    resources = [core.Resource(**entry["resource"]) for entry in manifest["resources"]]
+    with instrument.progress_task("Importing", total=len(resources)) as task:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(unpack_member, bundle_path, members[get_member_name(resource)], resource)
+                for resource in resources
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                _ = future.result()
+                task.update(advance=1)
+    paths = [future.result() for future in futures]
+    logger.info("Imported %d resources from: %s", len(paths), bundle_path)
+    return paths
+
+
+def get_base_url(registry: core.Registry, resource: core.Resource) -> str | None:
+    base_url = registry.get(resource.dataset, {}).get(resource.version, {}).get("base_url")
+    if isinstance(base_url, str) and resource.url.startswith(base_url):
+        return base_url
+    return None
+
+
+def get_mirror_path(resource: core.Resource, base_url: str | None) -> str:
+    if base_url is not None:
+        # Keep the names relative to the base URL, since the accessors build the URLs from them
+        return f"{resource.dataset}/{resource.version}/{resource.url.removeprefix(base_url)}"
+    filename = resource.archive or pathlib.PurePosixPath(resource.path).name
+    return "/".join(part for part in (resource.dataset, resource.version, resource.name, filename) if part)
+
+
+def rewrite_urls(value: T.Any, urls: dict[str, str]) -> T.Any:
+    if isinstance(value, dict):
+        return {
+            key: (
+                urls.get(item, item) if key == "url" and isinstance(item, str) else rewrite_urls(item, urls)
+            )
+            for key, item in value.items()
+        }
+    return value
+
+
+def export_mirror(
+    resources: collections.abc.Iterable[core.Resource],
+    directory: os.PathLike[str] | str,
+    *,
+    registry_url: str | None = None,
+    max_workers: int = 4,
+) -> pathlib.Path:
+    """
+    Download the original files of `resources` (e.g. the zip archives) to `directory` and write
+    a `registry.json` that points to them. Return the path of the registry.
+
+    The URLs of the mirrored resources are relative to the registry, so the directory can be moved,
+    copied to other machines or served over HTTP. Use it with e.g.
+    `gebco("ice", registry_url="file:///path/to/mirror/registry.json")`.
+    """
+    directory = pathlib.Path(directory)
+    registry = core.load_registry(registry_url)
+    urls: dict[str, str] = {}
+    base_urls: dict[tuple[str, str], str] = {}
+    for resource in resources:
+        base_url = get_base_url(registry, resource)
+        urls[resource.url] = get_mirror_path(resource, base_url)
+        if base_url is not None:
+            base_urls[resource.dataset, resource.version] = f"{resource.dataset}/{resource.version}/"
+
+    def mirror(url: str, relative_path: str) -> None:
+        path = directory / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with FileLock(path):
+            if not path.exists():
+                _ = core.download(url, path)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(mirror, url, relative_path) for url, relative_path in urls.items()]
+        for future in futures:
+            future.result()
+    mirror_registry = rewrite_urls(registry, urls)
+    for (dataset, version), base_url in base_urls.items():
+        mirror_registry[dataset][version]["base_url"] = base_url
+    registry_path = directory / REGISTRY
+    registry_path.write_text(json.dumps(mirror_registry, indent=2))
+    logger.info("Mirrored %d files to: %s", len(futures), directory)
+    return registry_path
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import collections.abc
+import contextlib
+import dataclasses
+import logging
+import os
+import pathlib
+import re
+import time
+
+from . import _core as core
+from ._lock import get_lock_path
+
+logger = logging.getLogger(__name__)
+
+# Constants
+# Directories of the writable tier that hold metadata instead of datasets
+METADATA_DIRS = ("registries", core.STAMPS, core.EXTENTS)
+SIDECAR_SUFFIXES = (".xxh128.json", ".part", ".part.json", ".lock", ".stale", ".tmp", ".access", ".pin")
+# The sidecar files that are of no use once the file they describe has been removed
+ORPHAN_SUFFIXES = (".xxh128.json", ".access")
+# Directories that are a single entry of the cache, e.g. the Zarr stores of transcoded files
+STORE_SUFFIXES = (".zarr",)
+SIZE_UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$", re.IGNORECASE)
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    """
+    A file in the local cache.
+
+    Attributes:
+        path: The path of the file (or of the store directory).
+        dataset: The dataset the file belongs to, e.g. `GEBCO`.
+        version: The version of the dataset.
+        size: The size of the file (or of all the files of the store) in bytes.
+        last_access: When the file was last returned by an accessor, as a POSIX timestamp.
+        pinned: Whether the file is protected from eviction.
+    """
+
+    path: pathlib.Path
+    dataset: str
+    version: str
+    size: int
+    last_access: float
+    pinned: bool
+
+
+def get_access_path(path: os.PathLike[str] | str) -> pathlib.Path:
+    return pathlib.Path(f"{os.fspath(path)}.access")
+
+
+def get_pin_path(path: os.PathLike[str] | str) -> pathlib.Path:
+    return pathlib.Path(f"{os.fspath(path)}.pin")
+
+
+def parse_size(size: str) -> int:
+    """
+    Parse a size like `500M`, `20G` or `1.5TiB` to bytes.
+    """
+    if (match := SIZE_PATTERN.match(size)) is None:
+        raise ValueError(f"Invalid size: {size!r}")
+    number, unit = match.groups()
+    return int(float(number) * SIZE_UNITS[unit.upper()])
+
+
+def get_cache_budget(max_bytes: int | None = None) -> int | None:
+    if max_bytes is None and (value := os.environ.get("SEAREPORT_DATA_CACHE_BUDGET")):
+        max_bytes = parse_size(value)
+    return max_bytes
+
+
+def record_access(path: os.PathLike[str] | str) -> None:
+    """
+    Record that `path` was used, by updating the modification time of its `.access` sidecar file.
+
+    A sidecar file is used because access times are unreliable on filesystems mounted with `noatime`/`relatime`.
+    Only the files of the writable tier are tracked, since they are the only ones that can be evicted.
+    """
+    if not pathlib.Path(path).is_relative_to(core.get_cache_path()):
+        return
+    access_path = get_access_path(path)
+    try:
+        access_path.touch()
+    except OSError:
+        logger.debug("Failed to record access: %s", path)
+
+
+def resolve_path(resource_or_path: core.Resource | os.PathLike[str] | str) -> pathlib.Path:
+    if isinstance(resource_or_path, core.Resource):
+        return core.get_cache_path() / resource_or_path.path
+    return pathlib.Path(resource_or_path)
+
+
+def pin(resource_or_path: core.Resource | os.PathLike[str] | str) -> None:
+    """
+    Protect a resource from being evicted from the cache.
+    """
+    path = resolve_path(resource_or_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    get_pin_path(path).touch()
+
+
+def unpin(resource_or_path: core.Resource | os.PathLike[str] | str) -> None:
+    """
+    Allow a pinned resource to be evicted from the cache again.
+    """
+    path = resolve_path(resource_or_path)
+    get_pin_path(path).unlink(missing_ok=True)
+
+
+def is_sidecar(path: pathlib.Path) -> bool:
+    return path.name.endswith(SIDECAR_SUFFIXES)
+
+
+def is_store(path: pathlib.Path) -> bool:
+    return path.name.endswith(STORE_SUFFIXES)
+
+
+def get_size(path: pathlib.Path, stat: os.stat_result) -> int:
+    if not is_store(path):
+        return stat.st_size
+    size = 0
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            with contextlib.suppress(FileNotFoundError):
+                size += os.stat(os.path.join(root, filename)).st_size
+    return size
+
+
+def get_last_access(path: pathlib.Path, stat: os.stat_result) -> float:
+    try:
+        return get_access_path(path).stat().st_mtime
+    except OSError:
+        # Never returned by an accessor since access times started being recorded
+        return stat.st_mtime
+
+
+def list_cache() -> list[CacheEntry]:
+    """
+    Return the files (and the stores) in the local cache, least recently used first.
+    """
+    cache_path = core.get_cache_path()
+    entries: list[CacheEntry] = []
+    for root, dirnames, filenames in os.walk(cache_path):
+        if pathlib.Path(root) == cache_path:
+            dirnames[:] = [dirname for dirname in dirnames if dirname not in METADATA_DIRS]
+        # Stores are listed as a whole, and the ones that are being written (i.e. sidecars) are skipped
+        stores = [dirname for dirname in dirnames if is_store(pathlib.Path(dirname))]
+        dirnames[:] = [
+            dirname
+            for dirname in dirnames
+            if dirname not in stores and not is_sidecar(pathlib.Path(dirname))
+        ]
+        for filename in [*filenames, *stores]:
+            path = pathlib.Path(root) / filename
+            if is_sidecar(path):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            parts = path.relative_to(cache_path).parts
+            entries.append(
+                CacheEntry(
+                    path=path,
+                    dataset=parts[0] if len(parts) > 1 else "",
+                    version=parts[1] if len(parts) > 2 else "",  # noqa: PLR2004
+                    size=get_size(path, stat),
+                    last_access=get_last_access(path, stat),
+                    pinned=get_pin_path(path).exists(),
+                ),
+            )
+    return sorted(entries, key=lambda entry: entry.last_access)
+
+
+def cache_usage() -> dict[str, dict[str, int]]:
+    """
+    Return the size of the local cache in bytes, per dataset and version.
+    """
+    usage: collections.defaultdict[str, dict[str, int]] = collections.defaultdict(dict)
+    for entry in list_cache():
+        usage[entry.dataset][entry.version] = usage[entry.dataset].get(entry.version, 0) + entry.size
+    return dict(usage)
+
+
+def remove_entry(entry: CacheEntry) -> None:
+    if entry.path.is_dir():
+        core.lenient_remove_tree(entry.path)
+    else:
+        core.lenient_remove(entry.path)
+    get_access_path(entry.path).unlink(missing_ok=True)
+    # Remove the directory too if nothing else is left in it (e.g. a dataset version whose only file was evicted)
+    directory = entry.path.parent
+    if directory != core.get_cache_path() and all(
+        path.name.endswith(ORPHAN_SUFFIXES) for path in directory.iterdir()
+    ):
+        core.lenient_remove_tree(directory)
+
+
+def evict(
+    max_bytes: int | None = None,
+    *,
+    keep: collections.abc.Collection[os.PathLike[str] | str] = (),
+    max_age: float | None = None,
+    dry_run: bool = False,
+) -> list[CacheEntry]:
+    """
+    Remove the least recently used files from the cache until its size doesn't exceed `max_bytes`.
+
+    Pinned files, files that are being downloaded and the files in `keep` are never removed.
+
+    Parameters:
+        max_bytes: The size budget of the cache. If None, the `SEAREPORT_DATA_CACHE_BUDGET`
+            environment variable is used (e.g. `50G`). If that is not set either, the size is not limited.
+        keep: Files that must not be removed.
+        max_age: If not None, files that were not used for more than `max_age` seconds are removed as well.
+        dry_run: If True, return the entries that would be removed without removing them.
+
+    Returns:
+        The entries that were removed.
+    """
+    max_bytes = get_cache_budget(max_bytes)
+    if max_bytes is None and max_age is None:
+        return []
+    entries = list_cache()
+    total = sum(entry.size for entry in entries)
+    keep_paths = {pathlib.Path(path) for path in keep}
+    now = time.time()
+    evicted: list[CacheEntry] = []
+    for entry in entries:
+        over_budget = max_bytes is not None and total > max_bytes
+        expired = max_age is not None and now - entry.last_access > max_age
+        if not (over_budget or expired):
+            # The entries are sorted by last access, so the rest are more recent
+            break
+        if entry.pinned or entry.path in keep_paths or get_lock_path(entry.path).exists():
+            continue
+        if not dry_run:
+            logger.info("Evicting %s (%d bytes) from the cache", entry.path, entry.size)
+            remove_entry(entry)
+        total -= entry.size
+        evicted.append(entry)
+    if max_bytes is not None and total > max_bytes:
+        logger.warning("The cache exceeds its budget of %d bytes by %d bytes", max_bytes, total - max_bytes)
+    return evicted
@@ -0,0 +1,258 @@
+# ruff: noqa: T201
+"""
+Prefetch, verify and inspect the `seareport_data` cache.
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections.abc
+import concurrent.futures
+import fnmatch
+import json
+import logging
+import os
+import pathlib
+import sys
+import time
+import typing as T
+
+from . import _cache
+from . import _core as core
+from ._instrument import format_size
+
+logger = logging.getLogger(__name__)
+
+# Constants
+AGE_UNITS = (("d", 86400), ("h", 3600), ("m", 60))
+
+
+def format_age(seconds: float) -> str:
+    for unit, length in AGE_UNITS:
+        if seconds >= length:
+            return f"{seconds / length:.0f}{unit}"
+    return f"{seconds:.0f}s"
+
+
+def matches(key: str, patterns: collections.abc.Sequence[str]) -> bool:
+    # A pattern also matches the resources below it, e.g. `GEBCO/2024` matches `GEBCO/2024/ice`
+    return not patterns or any(
+        fnmatch.fnmatchcase(key, pattern) or fnmatch.fnmatchcase(key, f"{pattern.rstrip('/')}/*")
+        for pattern in patterns
+    )
+
+
+def select_resources(
+    patterns: collections.abc.Sequence[str],
+    registry_url: str | None,
+) -> list[core.Resource]:
+    from ._resources import iter_resources
+
+    return [resource for resource in iter_resources(registry_url) if matches(resource.key, patterns)]
+
+
+def find_cached(resource: core.Resource) -> pathlib.Path | None:
+    path = core.get_cache_path() / resource.path
+    return path if path.exists() else core.find_in_tiers(resource.path)
+
+
+def get_verification_state(path: os.PathLike[str] | str) -> tuple[str, str | None]:
+    stamp = core.read_stamp(path)
+    if stamp is None:
+        return "unknown", None
+    if "verified_at" in stamp:
+        return "verified", stamp["verified_at"]
+    return "hashed", None
+
+
+def prefetch(args: argparse.Namespace) -> int:
+    from ._fetch import fetch_many
+
+    resources = select_resources(args.patterns, args.registry_url)
+    if args.dry_run:
+        for resource in resources:
+            print(resource.key)
+        return 0
+    start = time.perf_counter()
+    results = fetch_many(
+        resources,
+        max_workers=args.workers,
+        per_host_limit=args.per_host_limit,
+        check_hash=not args.no_check_hash,
+    )
+    failed = [result for result in results if not result.ok]
+    print(
+        f"Fetched {len(results) - len(failed)} of {len(results)} resources "
+        f"in {time.perf_counter() - start:.1f}s",
+    )
+    for result in failed:
+        print(f"Failed: {result.resource.key}: {result.error}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def verify(args: argparse.Namespace) -> int:
+    resources: dict[str, core.Resource] = {}
+    for resource in select_resources(args.patterns, args.registry_url):
+        if (path := find_cached(resource)) is not None:
+            # Resources that share a file are hashed once
+            resources.setdefault(os.fspath(path), resource)
+    mismatches = 0
+    cache_path = core.get_cache_path()
+    # Hashing is CPU bound, so it runs in processes, one file per core
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(core.hash_file, filename): filename for filename in resources}
+        for future in concurrent.futures.as_completed(futures):
+            filename = futures[future]
+            resource = resources[filename]
+            digest = future.result()
+            # The files of the read-only tiers are only reported, they are never stamped nor removed
+            is_writable = pathlib.Path(filename).is_relative_to(cache_path)
+            if digest == resource.hash:
+                if is_writable:
+                    core.write_stamp(filename, digest, verified=True)
+                print(f"OK: {resource.key}")
+                continue
+            mismatches += 1
+            tier = "" if is_writable else f" (read-only tier: {filename})"
+            print(f"MISMATCH: {resource.key}: {digest} != {resource.hash}{tier}", file=sys.stderr)
+            if args.remove and is_writable:
+                core.lenient_remove(filename)
+                core.lenient_remove(_cache.get_access_path(filename))
+    print(f"Verified {len(resources) - mismatches} of {len(resources)} files")
+    return 1 if mismatches else 0
+
+
+def status(args: argparse.Namespace) -> int:
+    now = time.time()
+    entries = _cache.list_cache()
+    records: list[dict[str, T.Any]] = []
+    for entry in entries:
+        state, verified_at = get_verification_state(entry.path)
+        records.append(
+            {
+                "path": os.fspath(entry.path.relative_to(core.get_cache_path())),
+                "dataset": entry.dataset,
+                "version": entry.version,
+                "size": entry.size,
+                "last_access": entry.last_access,
+                "pinned": entry.pinned,
+                "state": state,
+                "verified_at": verified_at,
+            },
+        )
+    if args.json:
+        cache_dirs = [os.fspath(path) for path in core.get_cache_dirs()]
+        print(json.dumps({"cache_dirs": cache_dirs, "files": records}))
+        return 0
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title=os.fspath(core.get_cache_path()))
+    for column in ("Path", "Size", "Last access", "State", "Pinned"):
+        table.add_column(column, justify="right" if column in ("Size", "Last access") else "left")
+    for record in records:
+        table.add_row(
+            record["path"],
+            format_size(record["size"]),
+            format_age(now - record["last_access"]),
+            record["state"],
+            "yes" if record["pinned"] else "",
+        )
+    console = Console()
+    console.print(table)
+    total = sum(entry.size for entry in entries)
+    budget = _cache.get_cache_budget()
+    budget_str = f" of {format_size(budget)}" if budget is not None else ""
+    console.print(f"{len(entries)} files, {format_size(total)}{budget_str}")
+    return 0
+
+
+def prune(args: argparse.Namespace) -> int:
+    max_bytes = _cache.parse_size(args.max_bytes) if args.max_bytes is not None else None
+    max_age = args.older_than * 86400 if args.older_than is not None else None
+    if _cache.get_cache_budget(max_bytes) is None and max_age is None:
+        message = "Nothing to do: set --max-bytes, --older-than or SEAREPORT_DATA_CACHE_BUDGET"
+        print(message, file=sys.stderr)
+        return 2
+    evicted = _cache.evict(max_bytes, max_age=max_age, dry_run=args.dry_run)
+    verb = "Would remove" if args.dry_run else "Removed"
+    for entry in evicted:
+        print(f"{verb}: {entry.path} ({format_size(entry.size)})")
+    print(f"{verb} {len(evicted)} files, {format_size(sum(entry.size for entry in evicted))}")
+    return 0
+
+
+def index_emodnet(args: argparse.Namespace) -> int:
+    from ._emodnet import EMODNET
+    from ._emodnet import EMODNET_LATEST_VERSION
+    from ._emodnet import read_grids
+
+    path = pathlib.Path(args.registry)
+    version = args.version or EMODNET_LATEST_VERSION
+    grids = read_grids(version, registry_url=path.absolute().as_uri(), max_workers=args.workers)
+    # The registry is updated as it is, i.e. without resolving its relative URLs
+    registry = json.loads(path.read_text())
+    registry[EMODNET][version]["grids"] = grids
+    path.write_text(json.dumps(registry, indent=2) + "\n")
+    print(f"Recorded the grids of {len(grids)} EMODnet tiles in {path}")
+    return 0
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="seareport-data", description=__doc__)
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Log more details.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    patterns_help = (
+        "Glob patterns that select resources by key, e.g. `GEBCO/2024/*` or `GSHHG/*/crude/*`. "
+        "A pattern also matches the resources below it, e.g. `OSM`. Defaults to all resources."
+    )
+    registry_help = "The URL of the registry. Defaults to the registry that is shipped with the package."
+
+    parser_prefetch = subparsers.add_parser("prefetch", help="Download resources to the cache.")
+    parser_prefetch.add_argument("patterns", nargs="*", help=patterns_help)
+    parser_prefetch.add_argument("--registry-url", help=registry_help)
+    parser_prefetch.add_argument("-j", "--workers", type=int, default=4, help="Concurrent downloads.")
+    parser_prefetch.add_argument("--per-host-limit", type=int, help="Concurrent downloads per host.")
+    parser_prefetch.add_argument("--no-check-hash", action="store_true", help="Don't check the hashes.")
+    parser_prefetch.add_argument("-n", "--dry-run", action="store_true", help="Only list the resources.")
+    parser_prefetch.set_defaults(func=prefetch)
+
+    parser_verify = subparsers.add_parser("verify", help="Check the hashes of the cached resources.")
+    parser_verify.add_argument("patterns", nargs="*", help=patterns_help)
+    parser_verify.add_argument("--registry-url", help=registry_help)
+    parser_verify.add_argument("-j", "--workers", type=int, help="Files hashed in parallel.")
+    parser_verify.add_argument(
+        "--remove",
+        action="store_true",
+        help="Remove the files that don't match, except those of the read-only tiers.",
+    )
+    parser_verify.set_defaults(func=verify)
+
+    parser_status = subparsers.add_parser("status", help="Show the files in the cache.")
+    parser_status.add_argument("--json", action="store_true", help="Print JSON instead of a table.")
+    parser_status.set_defaults(func=status)
+
+    parser_prune = subparsers.add_parser("prune", help="Remove least recently used files from the cache.")
+    parser_prune.add_argument("--max-bytes", help="The size budget of the cache, e.g. `50G`.")
+    parser_prune.add_argument("--older-than", type=float, help="Remove files not used for this many days.")
+    parser_prune.add_argument("-n", "--dry-run", action="store_true", help="Only list the files.")
+    parser_prune.set_defaults(func=prune)
+
+    parser_index = subparsers.add_parser(
+        "index-emodnet",
+        help="Record the grids of the EMODnet tiles in a registry, for `bbox`.",
+    )
+    parser_index.add_argument("registry", help="The path of the registry, e.g. `registry.json`.")
+    parser_index.add_argument("--version", help="The EMODnet version. Defaults to the latest version.")
+    parser_index.add_argument("-j", "--workers", type=int, default=4, help="Concurrent downloads.")
+    parser_index.set_defaults(func=index_emodnet)
+    return parser
+
+
+def main(argv: collections.abc.Sequence[str] | None = None) -> int:
+    args = get_parser().parse_args(argv)
+    level = (logging.WARNING, logging.INFO, logging.DEBUG)[min(args.verbose, 2)]
+    logging.basicConfig(level=level, format="%(levelname)s %(name)s: %(message)s")
+    exit_code: int = args.func(args)
+    return exit_code
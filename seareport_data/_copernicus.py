@@ -1,11 +1,23 @@
+from __future__ import annotations
+
 import logging
+import os
 import pathlib
+import tempfile
 import typing as ty
 
-import xarray as xr
-
+from . import _cache
 from . import _core as core
+from . import _instrument as instrument
 from ._enforce_literals import enforce_literals
+from ._fetch import locate
+from ._hdf5 import open_dataset
+from ._lock import FileLock
+from ._subset import BBox
+from ._subset import subset_bbox
+
+if ty.TYPE_CHECKING:
+    import xarray as xr
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +67,7 @@ def copernicus(
     registry_url: str | None = None,
     as_paths: ty.Literal[True],
 ) -> list[pathlib.Path]: ...
+@instrument.traced
 def copernicus(
     dataset: COPERNICUSDataset = "bathy",
     version: COPERNICUSBathyVersion | None = None,
@@ -77,30 +90,39 @@ def copernicus(
         str: The path of the requested GEBCO dataset in the local cache.
 
     """
+    enforce_literals(copernicus)
     import copernicusmarine
 
-    enforce_literals(copernicus)
     version = resolve_version(dataset)
-    cache_dir = core.get_cache_path() / COPERNICUS / dataset / version
     registry = core.load_registry(registry_url=registry_url)
     record: COPERNICUSRecord = registry[COPERNICUS][dataset][version]
-    file_path = cache_dir / record["filename"]
+    file_path = locate(f"{COPERNICUS}/{dataset}/{version}/{record['filename']}")
+    cache_dir = file_path.parent
     if download and not file_path.exists():
         cache_dir.mkdir(parents=True, exist_ok=True)
-        _ = copernicusmarine.get(
-            dataset_id=record["dataset_id"],
-            dataset_version=version,
-            no_directories=True,
-            output_directory=cache_dir,
-        )
+        with FileLock(file_path):
+            if not file_path.exists():
+                # Download to a temporary directory, so that the file only appears in the cache once it is complete
+                with tempfile.TemporaryDirectory(dir=cache_dir) as tmp_dir:
+                    _ = copernicusmarine.get(
+                        dataset_id=record["dataset_id"],
+                        dataset_version=version,
+                        no_directories=True,
+                        output_directory=tmp_dir,
+                    )
+                    os.replace(pathlib.Path(tmp_dir) / record["filename"], file_path)
+                _ = _cache.evict(keep=[file_path])
     if check_hash:
         core.check_hash(file_path, record["hash"])
+    if file_path.exists():
+        _cache.record_access(file_path)
     if as_paths:
         return [pathlib.Path(file_path)]
     else:
         return [str(file_path)]
 
 
+@instrument.traced
 def copernicus_ds(
     dataset: COPERNICUSDataset = "bathy",
     version: COPERNICUSBathyVersion | None = None,
@@ -108,6 +130,8 @@ def copernicus_ds(
     download: bool = True,
     check_hash: bool = True,
     registry_url: str | None = None,
+    bbox: BBox | None = None,
+    buffer: float = 0.0,
     **kwargs: ty.Any,
 ) -> xr.Dataset:
     path = copernicus(
@@ -120,5 +144,9 @@ def copernicus_ds(
     if "engine" not in kwargs:
         kwargs["engine"] = "h5netcdf"
 
-    ds = xr.open_dataset(path, **kwargs)
+    with instrument.phase("open"):
+        ds = open_dataset(path, kwargs)
+    if bbox is not None:
+        with instrument.phase("subset"):
+            ds = subset_bbox(ds, bbox, buffer=buffer)
     return ds
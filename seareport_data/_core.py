@@ -1,26 +1,35 @@
 from __future__ import annotations
 
+import atexit
+import collections.abc
+import concurrent.futures
+import dataclasses
+import datetime as dt
+import functools
 import gzip
+import importlib.util
 import json
 import logging
 import os
 import pathlib
 import shutil
+import threading
+import time
 import typing as T
+import urllib.parse
 import zipfile
 from importlib.resources import files
 
-import httpx
 import platformdirs
-import stamina
 import xxhash
-import zstandard
-from rich.progress import BarColumn
-from rich.progress import DownloadColumn
-from rich.progress import Progress
-from rich.progress import TextColumn
-from rich.progress import TimeRemainingColumn
-from rich.progress import TransferSpeedColumn
+
+from . import _instrument as instrument
+from . import _stream
+
+# httpx, rich and stamina are only imported when something is downloaded,
+# so that resolving the paths of cached files stays fast.
+if T.TYPE_CHECKING:
+    import httpx
 
 logger = logging.getLogger(__name__)
 
@@ -29,62 +38,683 @@ logger = logging.getLogger(__name__)
 Registry: T.TypeAlias = dict[str, dict[str, dict[str, T.Any]]]
 
 
-def resolve_httpx_client(
-    client: httpx.Client | None = None,
-    timeout: float = 20,
-    read: float = 30,
-) -> httpx.Client:
-    if client is None:
-        client = httpx.Client(
-            timeout=httpx.Timeout(timeout=timeout, read=read),
-        )
-    return client
+Compression: T.TypeAlias = T.Literal["zip", "zstd", "gzip"]
 
 
-@stamina.retry(on=httpx.HTTPError, attempts=3)
-def download(
+class SupportsRead(T.Protocol):
+    def read(self, size: int = ..., /) -> bytes: ...
+
+
+@dataclasses.dataclass(frozen=True)
+class Resource:
+    """
+    A file that can be downloaded to the cache.
+
+    Attributes:
+        dataset: The name of the dataset, e.g. `GEBCO`.
+        version: The version of the dataset.
+        name: The name of the resource within the dataset version, e.g. `ice` or `30sec/bedrock`.
+        url: The URL of the file (or of the archive that contains it).
+        path: The path of the file, relative to the cache directory.
+        hash: The expected xxh128 hash of the file.
+        compression: The type of the archive at `url`, if any.
+        archive: The name of the archive, if it needs to be stored on disk while extracting.
+        size: The expected size in bytes of the file at `url`, if the registry records it.
+        etag: The expected ETag of the file at `url`, if the registry records it.
+    """
+
+    dataset: str
+    version: str
+    name: str
+    url: str
+    path: str
+    hash: str
+    compression: Compression | None = None
+    archive: str | None = None
+    size: int | None = None
+    etag: str | None = None
+
+    @property
+    def key(self) -> str:
+        return "/".join(part for part in (self.dataset, self.version, self.name) if part)
+
+
+def get_upstream_validators(record: dict[str, T.Any], filename: str | None = None) -> dict[str, T.Any]:
+    """
+    Return the expected `size` and `etag` of an upstream file, as recorded in a registry record.
+
+    Records with a single `url` may have `size` and `etag` keys. Records with a `base_url` may have
+    `sizes` and `etags` mappings, keyed by the name of the file relative to the base URL.
+    """
+    if filename is None:
+        return {"size": record.get("size"), "etag": record.get("etag")}
+    return {"size": record.get("sizes", {}).get(filename), "etag": record.get("etags", {}).get(filename)}
+
+
+# Constants
+MIN_PART_SIZE = 2**25
+STAMPS = "stamps"
+# The extents of the tiles of tiled datasets (e.g. EMODnet), keyed by their hash
+EXTENTS = "extents"
+# The keys of the registry records that hold URLs
+REGISTRY_URL_KEYS = ("url", "base_url")
+
+
+def get_http2(*, http2: bool | None = None) -> bool:
+    if http2 is None:
+        http2 = os.environ.get("SEAREPORT_DATA_HTTP2", "1") == "1"
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.debug("HTTP/2 is disabled because `h2` is not installed")
+        http2 = False
+    return http2
+
+
+def get_httpx_client_options() -> dict[str, T.Any]:
+    """
+    Return the options of the clients that are used for downloading, configured from the environment.
+    """
+    import httpx
+
+    environ = os.environ
+    return {
+        "timeout": httpx.Timeout(
+            timeout=float(environ.get("SEAREPORT_DATA_TIMEOUT", "20")),
+            read=float(environ.get("SEAREPORT_DATA_READ_TIMEOUT", "30")),
+        ),
+        "limits": httpx.Limits(
+            max_connections=int(environ.get("SEAREPORT_DATA_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(environ.get("SEAREPORT_DATA_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        ),
+        "http2": get_http2(),
+        # If not set, httpx honours the standard `HTTP(S)_PROXY` environment variables
+        "proxy": environ.get("SEAREPORT_DATA_PROXY") or None,
+    }
+
+
+class SharedClient:
+    """
+    An `httpx.Client` that is shared by all downloads, so that connections are kept alive between them.
+
+    The client is created lazily and it is closed when the interpreter exits.
+    Forked processes create a new client, since connections can't be shared with the parent process.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.client: httpx.Client | None = None
+        self.is_owned = True
+        self.pid = os.getpid()
+
+    def get(self) -> httpx.Client:
+        import httpx
+
+        with self.lock:
+            if self.is_owned and self.pid != os.getpid():
+                self.client = None
+            if self.client is None or self.client.is_closed:
+                self.client = httpx.Client(**get_httpx_client_options())
+                self.is_owned = True
+                self.pid = os.getpid()
+            return self.client
+
+    def set(self, client: httpx.Client | None) -> None:
+        self.close()
+        with self.lock:
+            self.client = client
+            self.is_owned = client is None
+
+    def close(self) -> None:
+        with self.lock:
+            if self.client is not None and self.is_owned and self.pid == os.getpid():
+                self.client.close()
+            self.client = None
+            self.is_owned = True
+
+
+_SHARED_CLIENT = SharedClient()
+atexit.register(_SHARED_CLIENT.close)
+
+
+def get_httpx_client() -> httpx.Client:
+    """
+    Return the client that is used by default for all downloads.
+    """
+    return _SHARED_CLIENT.get()
+
+
+def set_httpx_client(client: httpx.Client | None) -> None:
+    """
+    Use `client` by default for all downloads. The caller remains responsible for closing it.
+
+    If `client` is None, the default client is restored; it is recreated from the environment when it is next used.
+    """
+    _SHARED_CLIENT.set(client)
+
+
+def close_httpx_client() -> None:
+    """
+    Close the default client. A new one is created if it is needed again.
+    """
+    _SHARED_CLIENT.close()
+
+
+def resolve_httpx_client(client: httpx.Client | None = None) -> httpx.Client:
+    return client if client is not None else get_httpx_client()
+
+
+def get_download_connections(connections: int | None = None) -> int:
+    if connections is None:
+        connections = int(os.environ.get("SEAREPORT_DATA_CONNECTIONS", "1"))
+    return max(1, connections)
+
+
+def get_part_path(filename: os.PathLike[str] | str) -> pathlib.Path:
+    return pathlib.Path(f"{os.fspath(filename)}.part")
+
+
+def get_part_size(filename: os.PathLike[str] | str) -> int:
+    """
+    Return the size of the `.part` file of `filename`, i.e. the offset a download resumes from.
+    """
+    part_path = get_part_path(filename)
+    return part_path.stat().st_size if part_path.exists() else 0
+
+
+def get_part_meta_path(filename: os.PathLike[str] | str) -> pathlib.Path:
+    return pathlib.Path(f"{os.fspath(filename)}.part.json")
+
+
+def load_part_meta(filename: os.PathLike[str] | str) -> dict[str, T.Any]:
+    try:
+        with get_part_meta_path(filename).open() as fd:
+            meta: dict[str, T.Any] = json.load(fd)
+    except (OSError, ValueError):
+        meta = {}
+    return meta
+
+
+def save_part_meta(filename: os.PathLike[str] | str, meta: dict[str, T.Any]) -> None:
+    meta_path = get_part_meta_path(filename)
+    tmp_path = meta_path.with_name(f"{meta_path.name}.tmp")
+    tmp_path.write_text(json.dumps(meta))
+    os.replace(tmp_path, meta_path)
+
+
+def remove_part(filename: os.PathLike[str] | str) -> None:
+    lenient_remove(get_part_path(filename))
+    lenient_remove(get_part_meta_path(filename))
+
+
+def publish_part(filename: os.PathLike[str] | str) -> None:
+    os.replace(get_part_path(filename), filename)
+    lenient_remove(get_part_meta_path(filename))
+
+
+def get_validators(headers: httpx.Headers) -> dict[str, str]:
+    validators: dict[str, str] = {}
+    if (etag := headers.get("ETag")) and not etag.startswith("W/"):
+        validators["etag"] = etag
+    if last_modified := headers.get("Last-Modified"):
+        validators["last_modified"] = last_modified
+    return validators
+
+
+def get_if_range(validators: dict[str, str]) -> str | None:
+    # RFC 9110: If-Range requires a strong ETag or a Last-Modified date
+    return validators.get("etag") or validators.get("last_modified")
+
+
+def get_content_range_start(headers: httpx.Headers) -> int | None:
+    # e.g. "bytes 100-199/200"
+    content_range = headers.get("Content-Range", "")
+    unit, _, spec = content_range.partition(" ")
+    if unit != "bytes" or not spec[:1].isdigit():
+        return None
+    return int(spec.partition("-")[0])
+
+
+class RangeProbe(T.NamedTuple):
+    url: str
+    total: int
+    validators: dict[str, str]
+
+
+def probe_ranges(url: str, client: httpx.Client) -> RangeProbe | None:
+    """
+    Return the final URL, the size and the validators of the resource if the server supports byte ranges.
+    """
+    import httpx
+
+    try:
+        response = client.head(url, follow_redirects=True)
+        _ = response.raise_for_status()
+    except httpx.HTTPError:
+        logger.debug("Failed to probe %s for range support", url)
+        return None
+    if response.headers.get("Accept-Ranges", "").lower() != "bytes":
+        return None
+    total = int(response.headers.get("Content-Length", 0))
+    if not total:
+        return None
+    return RangeProbe(url=str(response.url), total=total, validators=get_validators(response.headers))
+
+
+def split_ranges(total: int, connections: int, min_part_size: int | None = None) -> list[list[int]]:
+    if min_part_size is None:
+        min_part_size = MIN_PART_SIZE
+    parts = max(1, min(connections, total // min_part_size))
+    part_size = -(-total // parts)
+    return [[start, min(start + part_size, total) - 1] for start in range(0, total, part_size)]
+
+
+class RangeState:
+    """
+    Keep track of the progress of each range, so that an interrupted download can be resumed.
+    """
+
+    def __init__(self, filename: os.PathLike[str] | str, meta: dict[str, T.Any]) -> None:
+        self.filename = filename
+        self.meta = meta
+        self.lock = threading.Lock()
+
+    def update(self, index: int, position: int) -> None:
+        with self.lock:
+            self.meta["ranges"][index][0] = position
+            save_part_meta(self.filename, self.meta)
+
+
+def download_range(
     url: str,
     filename: os.PathLike[str] | str,
-    client: httpx.Client | None = None,
+    *,
+    index: int,
+    state: RangeState,
+    client: httpx.Client,
+    task: instrument.Task,
+) -> None:
+    import httpx
+    import stamina
+
+    position, end = state.meta["ranges"][index]
+    if_range = get_if_range(state.meta["validators"])
+    for attempt in stamina.retry_context(on=httpx.HTTPError, attempts=3):
+        with attempt:
+            headers = {"Range": f"bytes={position}-{end}"}
+            if if_range:
+                headers["If-Range"] = if_range
+            try:
+                with client.stream("GET", url, headers=headers) as response:
+                    _ = response.raise_for_status()
+                    if response.status_code != httpx.codes.PARTIAL_CONTENT:
+                        raise ValueError(f"Server ignored range request or the resource changed: {url}")
+                    with open(get_part_path(filename), "r+b") as fd:
+                        _ = fd.seek(position)
+                        for chunk in response.iter_bytes():
+                            _ = fd.write(chunk)
+                            position += len(chunk)
+                            task.update(advance=len(chunk))
+            finally:
+                state.update(index, position)
+            if position != end + 1:
+                raise httpx.ReadError(f"Incomplete range {position}-{end} for: {url}")
+
+
+def download_ranges(
+    url: str,
+    filename: os.PathLike[str] | str,
+    probe: RangeProbe,
+    client: httpx.Client,
+    connections: int,
 ) -> None:
-    client = resolve_httpx_client(client=client)
-    with client.stream("GET", url) as response:
+    part_path = get_part_path(filename)
+    meta = load_part_meta(filename)
+    is_resumable = (
+        part_path.exists()
+        and part_path.stat().st_size == probe.total
+        and meta.get("url") == url
+        and meta.get("total") == probe.total
+        and meta.get("validators") == probe.validators
+        and bool(get_if_range(probe.validators))
+        and "ranges" in meta
+    )
+    if is_resumable:
+        logger.debug("Resuming ranged download of: %s", url)
+    else:
+        meta = {
+            "url": url,
+            "total": probe.total,
+            "validators": probe.validators,
+            "ranges": split_ranges(total=probe.total, connections=connections),
+        }
+        with open(part_path, "wb") as fd:
+            _ = fd.truncate(probe.total)
+    state = RangeState(filename=filename, meta=meta)
+    pending = [index for index, (position, end) in enumerate(meta["ranges"]) if position <= end]
+    completed = probe.total - sum(end - position + 1 for position, end in meta["ranges"] if position <= end)
+    logger.debug("Downloading %s using %d ranges", url, len(pending))
+    with instrument.progress_task(url, total=probe.total, completed=completed) as task:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(pending))) as executor:
+            futures = [
+                executor.submit(
+                    download_range,
+                    probe.url,
+                    filename,
+                    index=index,
+                    state=state,
+                    client=client,
+                    task=task,
+                )
+                for index in pending
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+    publish_part(filename)
+
+
+def download_stream(
+    url: str,
+    filename: os.PathLike[str] | str,
+    client: httpx.Client,
+) -> str:
+    import httpx
+    import stamina
+
+    retrying = stamina.retry(on=httpx.HTTPError, attempts=3)(download_stream_once)
+    return retrying(url, filename, client=client)
+
+
+def download_stream_once(
+    url: str,
+    filename: os.PathLike[str] | str,
+    client: httpx.Client,
+) -> str:
+    import httpx
+
+    part_path = get_part_path(filename)
+    meta = load_part_meta(filename)
+    offset = get_part_size(filename)
+    headers: dict[str, str] = {}
+    if offset and meta.get("url") == url and (if_range := get_if_range(meta.get("validators", {}))):
+        logger.debug("Resuming download of %s from byte %d", url, offset)
+        headers = {"Range": f"bytes={offset}-", "If-Range": if_range}
+    with client.stream("GET", url, headers=headers) as response:
+        if response.status_code == httpx.codes.REQUESTED_RANGE_NOT_SATISFIABLE:
+            # The partial file is not usable; start from scratch on the next attempt
+            remove_part(filename)
         _ = response.raise_for_status()
-        total = int(response.headers.get("Content-Length", 0)) or None
-        with Progress(
-            TextColumn("[bold blue]{task.description}"),
-            BarColumn(),
-            DownloadColumn(),
-            TransferSpeedColumn(),
-            TimeRemainingColumn(),
-        ) as progress:
-            task = progress.add_task(url, total=total)
-            with open(filename, "wb") as fd:
+        if response.status_code == httpx.codes.PARTIAL_CONTENT:
+            if get_content_range_start(response.headers) != offset:
+                remove_part(filename)
+                raise httpx.RemoteProtocolError(f"Unexpected Content-Range while resuming: {url}")
+        else:
+            offset = 0
+            save_part_meta(filename, {"url": url, "validators": get_validators(response.headers)})
+        content_length = int(response.headers.get("Content-Length", 0))
+        total = offset + content_length if content_length else None
+        # Hash the data while they are being written, so that we don't need to read the file again.
+        # When resuming, the existing part needs to be hashed first
+        hasher = hash_prefix(part_path, offset) if offset else xxhash.xxh128()
+        with instrument.progress_task(url, total=total, completed=offset) as task:
+            with open(part_path, "ab" if offset else "wb") as fd:
                 downloaded = response.num_bytes_downloaded
                 for chunk in response.iter_bytes():
                     fd.write(chunk)
-                    progress.update(task, advance=response.num_bytes_downloaded - downloaded)
+                    hasher.update(chunk)
+                    task.update(advance=response.num_bytes_downloaded - downloaded)
                     downloaded = response.num_bytes_downloaded
+    publish_part(filename)
+    digest = hasher.hexdigest()
+    write_stamp(filename, digest)
+    return digest
+
+
+def is_file_url(url: str) -> bool:
+    return urllib.parse.urlsplit(url).scheme == "file"
 
 
-def extract_zip(archive: os.PathLike[str] | str, filename: str, target_dir: os.PathLike[str] | str) -> None:
+def file_url_to_path(url: str) -> pathlib.Path:
+    import urllib.request
+
+    return pathlib.Path(urllib.request.url2pathname(urllib.parse.urlsplit(url).path))
+
+
+def iter_file_chunks(
+    path: os.PathLike[str] | str,
+    task: instrument.Task,
+    chunksize: int = 2**20,
+) -> collections.abc.Iterator[bytes]:
+    task.update(total=os.path.getsize(path))
+    with open(path, "rb") as fd:
+        for chunk in iter(lambda: fd.read(chunksize), b""):
+            task.update(advance=len(chunk))
+            yield chunk
+
+
+def copy_file_url(url: str, filename: os.PathLike[str] | str) -> str:
+    """
+    Copy the file at a `file://` URL to `filename` and return its xxh128 hash.
+    """
+    logger.debug("Copying %s to: %s", url, filename)
+    with instrument.progress_task(url) as task, open(get_part_path(filename), "wb") as fd:
+        hasher = xxhash.xxh128()
+        for chunk in iter_file_chunks(file_url_to_path(url), task=task):
+            fd.write(chunk)
+            hasher.update(chunk)
+    publish_part(filename)
+    digest = hasher.hexdigest()
+    write_stamp(filename, digest)
+    return digest
+
+
+def download(
+    url: str,
+    filename: os.PathLike[str] | str,
+    client: httpx.Client | None = None,
+    connections: int | None = None,
+) -> str | None:
+    """
+    Download `url` to `filename` and return its xxh128 hash.
+
+    The data are written to a `.part` file which is renamed to `filename` only after the download completes.
+    If a `.part` file from a previous attempt exists, the download is resumed using HTTP range requests,
+    as long as the server reports that the resource has not changed.
+
+    If `connections` (or the `SEAREPORT_DATA_CONNECTIONS` environment variable) is greater than 1
+    and the server supports byte ranges, the file is fetched using that many concurrent range requests.
+    Otherwise, the file is fetched using a single stream.
+
+    The hash is computed while the data are being streamed. Ranged downloads are not written sequentially,
+    so in that case no hash is computed and `None` is returned.
+
+    `file://` URLs are copied, so that a local directory can be used as a mirror.
+    """
+    with instrument.phase("download", url=url) as span:
+        if is_file_url(url):
+            digest = copy_file_url(url, filename)
+        else:
+            client = resolve_httpx_client(client=client)
+            connections = get_download_connections(connections)
+            probe = probe_ranges(url, client) if connections > 1 else None
+            if probe is not None and probe.total >= 2 * MIN_PART_SIZE:
+                span.attributes["connections"] = connections
+                download_ranges(url, filename, probe=probe, client=client, connections=connections)
+                digest = None
+            else:
+                digest = download_stream(url, filename, client=client)
+        span.nbytes = os.path.getsize(filename)
+    return digest
+
+
+def iter_remote_chunks(
+    url: str,
+    client: httpx.Client,
+    task: instrument.Task,
+) -> collections.abc.Iterator[bytes]:
+    """
+    Yield the body of `url`. If the connection breaks, continue from the current offset with a range request.
+    """
+    import httpx
+    import stamina
+
+    offset = 0
+    validators: dict[str, str] = {}
+    for attempt in stamina.retry_context(on=httpx.HTTPError, attempts=3):
+        with attempt:
+            headers: dict[str, str] = {}
+            if offset:
+                if not (if_range := get_if_range(validators)):
+                    raise ValueError(f"Can't resume streaming download without validators: {url}")
+                headers = {"Range": f"bytes={offset}-", "If-Range": if_range}
+            with client.stream("GET", url, headers=headers) as response:
+                _ = response.raise_for_status()
+                if not offset:
+                    validators = get_validators(response.headers)
+                    total = int(response.headers.get("Content-Length", 0)) or None
+                    task.update(total=total)
+                elif get_content_range_start(response.headers) != offset:
+                    raise ValueError(f"Server ignored range request or the resource changed: {url}")
+                for chunk in response.iter_bytes():
+                    offset += len(chunk)
+                    task.update(completed=offset)
+                    yield chunk
+
+
+def download_decompressed(
+    url: str,
+    target: os.PathLike[str] | str,
+    decoder: collections.abc.Callable[[collections.abc.Iterable[bytes]], collections.abc.Iterator[bytes]],
+    client: httpx.Client | None = None,
+) -> str:
+    """
+    Stream `url` through `decoder` and write the decoded data to `target`. Return the xxh128 hash of `target`.
+
+    The compressed data never touch the disk. The decoded data are written to a `.part` file
+    which is renamed to `target` after the download completes.
+
+    The `download` phase reports the compressed size, while the decompressed size is reported
+    as its `decompressed_bytes` attribute.
+    """
+    part_path = get_part_path(target)
+    hasher = xxhash.xxh128()
+    with instrument.phase("download", url=url) as span, instrument.progress_task(url) as task:
+        if is_file_url(url):
+            chunks = iter_file_chunks(file_url_to_path(url), task=task)
+        else:
+            client = resolve_httpx_client(client=client)
+            chunks = iter_remote_chunks(url, client=client, task=task)
+        with open(part_path, "wb") as fd:
+            for chunk in decoder(chunks):
+                fd.write(chunk)
+                hasher.update(chunk)
+            # The data are decompressed while they are downloaded, so the phase covers both
+            span.nbytes = task.completed
+            span.attributes["decompressed_bytes"] = fd.tell()
+    publish_part(target)
+    digest = hasher.hexdigest()
+    write_stamp(target, digest)
+    return digest
+
+
+def download_zstd(url: str, target: os.PathLike[str] | str, client: httpx.Client | None = None) -> str:
+    logger.debug(f"Streaming {url} to: {target}")
+    return download_decompressed(url, target, decoder=_stream.iter_zstd, client=client)
+
+
+def download_gzip(url: str, target: os.PathLike[str] | str, client: httpx.Client | None = None) -> str:
+    logger.debug(f"Streaming {url} to: {target}")
+    return download_decompressed(url, target, decoder=_stream.iter_gzip, client=client)
+
+
+def download_zip_member(
+    url: str,
+    filename: str,
+    target_dir: os.PathLike[str] | str,
+    archive: str | None = None,
+    client: httpx.Client | None = None,
+) -> str:
+    """
+    Stream the `filename` member of the zip archive at `url` to `target_dir`.
+
+    If the archive can't be decompressed while streaming, it is downloaded to `target_dir`
+    as `archive` and it is extracted from there instead.
+    """
+    logger.debug(f"Streaming {filename} from {url} to: {target_dir}")
+    target = pathlib.Path(target_dir) / filename
+    try:
+        return download_decompressed(
+            url,
+            target,
+            decoder=functools.partial(_stream.iter_zip_member, filename=filename),
+            client=client,
+        )
+    except _stream.UnsupportedArchiveError:
+        logger.info("Can't extract %s while streaming. Downloading the archive first.", url)
+        lenient_remove(get_part_path(target))
+    archive_path = pathlib.Path(target_dir) / (archive or f"{filename}.zip")
+    _ = download(url, archive_path, client=client)
+    digest = extract_zip(archive_path, filename, target_dir)
+    lenient_remove(archive_path)
+    return digest
+
+
+def copy_and_hash(src: SupportsRead, dst: T.IO[bytes], chunksize: int = 2**20) -> str:
+    hasher = xxhash.xxh128()
+    for chunk in iter(lambda: src.read(chunksize), b""):
+        dst.write(chunk)
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def extract_zip(archive: os.PathLike[str] | str, filename: str, target_dir: os.PathLike[str] | str) -> str:
     logger.debug(f"Extracting {filename} to: {target_dir}")
-    with zipfile.ZipFile(archive, "r") as zip_ref:
-        zip_ref.extract(member=filename, path=target_dir)
+    target = pathlib.Path(target_dir) / filename
+    with instrument.phase("extract", archive=os.fspath(archive)) as span:
+        with zipfile.ZipFile(archive, "r") as zip_ref:
+            with zip_ref.open(filename) as f_in, open(get_part_path(target), "wb") as f_out:
+                digest = copy_and_hash(f_in, f_out)
+                span.nbytes = f_out.tell()
+    publish_part(target)
+    write_stamp(target, digest)
+    return digest
 
 
-def extract_gzip(archive: os.PathLike[str] | str, target: os.PathLike[str] | str) -> None:
+def extract_gzip(archive: os.PathLike[str] | str, target: os.PathLike[str] | str) -> str:
     logger.debug(f"Extracting {archive} to: {target}")
-    with gzip.open(archive, "rb") as f_in:
-        with open(target, "wb") as f_out:
-            shutil.copyfileobj(f_in, f_out)
+    with instrument.phase("extract", archive=os.fspath(archive)) as span:
+        with gzip.open(archive, "rb") as f_in:
+            with open(get_part_path(target), "wb") as f_out:
+                digest = copy_and_hash(f_in, f_out)
+                span.nbytes = f_out.tell()
+    publish_part(target)
+    write_stamp(target, digest)
+    return digest
 
 
-def extract_zstd(archive: os.PathLike[str] | str, target: os.PathLike[str] | str) -> None:
+def extract_zstd(archive: os.PathLike[str] | str, target: os.PathLike[str] | str) -> str:
     logger.debug(f"Extracting {archive} to: {target}")
+    import zstandard
+
     dctx = zstandard.ZstdDecompressor()
-    with open(archive, "rb") as ifh, open(target, "wb") as ofh:
-        dctx.copy_stream(ifh, ofh)
+    with (
+        instrument.phase("extract", archive=os.fspath(archive)) as span,
+        open(archive, "rb") as ifh,
+        dctx.stream_reader(ifh) as reader,
+        open(get_part_path(target), "wb") as ofh,
+    ):
+        digest = copy_and_hash(reader, ofh)
+        span.nbytes = ofh.tell()
+    publish_part(target)
+    write_stamp(target, digest)
+    return digest
+
+
+def hash_prefix(path: os.PathLike[str] | str, size: int, chunksize: int = 2**20) -> xxhash.xxh128:
+    hasher = xxhash.xxh128()
+    with open(path, "rb") as fd:
+        while size > 0 and (chunk := fd.read(min(chunksize, size))):
+            hasher.update(chunk)
+            size -= len(chunk)
+    return hasher
 
 
 def hash_file(path: os.PathLike[str] | str, chunksize: int = 2**20) -> str:
@@ -95,29 +725,191 @@ def hash_file(path: os.PathLike[str] | str, chunksize: int = 2**20) -> str:
     return hasher.hexdigest()
 
 
-def check_hash(path: os.PathLike[str] | str, expected_hash: str) -> None:
+def get_stamp_path(path: os.PathLike[str] | str) -> pathlib.Path:
+    return pathlib.Path(f"{os.fspath(path)}.xxh128.json")
+
+
+def get_fingerprint(path: os.PathLike[str] | str) -> dict[str, int]:
+    stat = os.stat(path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "inode": stat.st_ino,
+    }
+
+
+def get_shadow_stamp_path(path: os.PathLike[str] | str) -> pathlib.Path:
+    """
+    Return the path of the stamp of a file that is in a read-only cache tier.
+    The stamp is stored in the writable tier instead.
+    """
+    key = xxhash.xxh128_hexdigest(os.path.abspath(path).encode())
+    return get_cache_path() / STAMPS / f"{key}.json"
+
+
+def read_stamp_file(stamp_path: pathlib.Path, path: os.PathLike[str] | str) -> dict[str, T.Any] | None:
+    try:
+        with stamp_path.open() as fd:
+            stamp: dict[str, T.Any] = json.load(fd)
+        fingerprint = get_fingerprint(path)
+    except (OSError, ValueError):
+        return None
+    if any(stamp.get(key) != value for key, value in fingerprint.items()):
+        logger.debug("Stale hash stamp: %s", path)
+        return None
+    return stamp
+
+
+def read_stamp(path: os.PathLike[str] | str) -> dict[str, T.Any] | None:
+    """
+    Return the hash stamp of `path`, but only if the file has not changed since the stamp was written.
+    """
+    stamp = read_stamp_file(get_stamp_path(path), path)
+    if stamp is None and not is_writable_dir(os.path.dirname(path)):
+        stamp = read_stamp_file(get_shadow_stamp_path(path), path)
+    return stamp
+
+
+def write_stamp(path: os.PathLike[str] | str, digest: str, *, verified: bool = False) -> None:
+    """
+    Persist the hash of `path` next to it, together with the stat fingerprint of the file.
+    """
+    stamp: dict[str, T.Any] = {"hash": digest, **get_fingerprint(path)}
+    if verified:
+        stamp["verified_at"] = dt.datetime.now(tz=dt.timezone.utc).isoformat()
+    stamp_path = get_stamp_path(path)
+    if not is_writable_dir(stamp_path.parent):
+        stamp_path = get_shadow_stamp_path(path)
+        stamp_path.parent.mkdir(parents=True, exist_ok=True)
+    # Processes that share the cache may write the same stamp concurrently
+    tmp_path = stamp_path.with_name(f"{stamp_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp_path.write_text(json.dumps(stamp))
+        os.replace(tmp_path, stamp_path)
+    except OSError:
+        logger.exception("Failed to write hash stamp: %s", stamp_path)
+
+
+def get_force_hash_check(*, force: bool | None = None) -> bool:
+    if force is None:
+        force = os.environ.get("SEAREPORT_DATA_FORCE_HASH_CHECK", "0").lower() in ("1", "true", "yes")
+    return force
+
+
+def check_hash(
+    path: os.PathLike[str] | str,
+    expected_hash: str,
+    digest: str | None = None,
+    *,
+    force: bool | None = None,
+) -> None:
+    """
+    Raise a `ValueError` if the hash of `path` is not `expected_hash`.
+
+    If `digest` is provided (e.g. because it was computed while downloading the file),
+    it is used instead of reading the file again. Otherwise, if the file has a hash stamp
+    and its size, mtime and inode have not changed since the stamp was written, the stamped hash is used.
+    The file is only hashed if neither is available or if `force` (or the `SEAREPORT_DATA_FORCE_HASH_CHECK`
+    environment variable) is set.
+    """
     logger.debug(f"Checking hash of: {path}")
-    current_hash = hash_file(path)
-    if current_hash != expected_hash:
-        raise ValueError(f"hash mismatch: {current_hash} != {expected_hash}")
+    with instrument.phase("hash") as span:
+        stamp = None if digest is not None or get_force_hash_check(force=force) else read_stamp(path)
+        span.cache_hit = stamp is not None or digest is not None
+        if stamp is not None:
+            current_hash = stamp["hash"]
+        elif digest is not None:
+            current_hash = digest
+        else:
+            current_hash = hash_file(path)
+            span.nbytes = os.path.getsize(path)
+        if current_hash != expected_hash:
+            raise ValueError(f"hash mismatch: {current_hash} != {expected_hash}")
+        if stamp is None or "verified_at" not in stamp:
+            write_stamp(path, current_hash, verified=True)
 
 
-def get_cache_path() -> pathlib.Path:
+def is_writable_dir(path: os.PathLike[str] | str) -> bool:
+    return os.access(path or ".", os.W_OK)
+
+
+def get_cache_dirs() -> list[pathlib.Path]:
+    """
+    Return the cache tiers in lookup order. The last one is the writable tier, where files are downloaded to.
+
+    The tiers are configured with `SEAREPORT_DATA_DIRS`, e.g. `/shared/mirror:/scratch/user`.
+    Otherwise, there is a single tier, `SEAREPORT_DATA_DIR` or the user's cache directory.
+    """
+    if dirs := os.environ.get("SEAREPORT_DATA_DIRS"):
+        return [pathlib.Path(path) for path in dirs.split(os.pathsep) if path]
     cache = os.environ.get(
         "SEAREPORT_DATA_DIR",
         platformdirs.user_cache_dir("seareport_data"),
     )
-    cache_path = pathlib.Path(cache)
+    return [pathlib.Path(cache)]
+
+
+def get_cache_path() -> pathlib.Path:
+    """
+    Return the writable cache tier.
+    """
+    cache_path = get_cache_dirs()[-1]
     cache_path.mkdir(parents=True, exist_ok=True)
     return cache_path
 
 
+def find_in_tiers(relative_path: os.PathLike[str] | str) -> pathlib.Path | None:
+    """
+    Return the path of `relative_path` in the first read-only cache tier that has it.
+    """
+    for cache_dir in get_cache_dirs()[:-1]:
+        path = cache_dir / relative_path
+        if path.exists():
+            return path
+    return None
+
+
+def get_promote_mode(mode: str | None = None) -> str | None:
+    if mode is None:
+        mode = os.environ.get("SEAREPORT_DATA_PROMOTE") or None
+    if mode not in (None, "link", "copy"):
+        raise ValueError(f"SEAREPORT_DATA_PROMOTE must be one of: link, copy. Not: {mode}")
+    return mode
+
+
+def promote(src: os.PathLike[str] | str, dst: os.PathLike[str] | str, mode: str) -> None:
+    """
+    Hard-link (`mode="link"`) or copy (`mode="copy"`) a file from a read-only tier to the writable tier.
+
+    If a hard link can't be created (e.g. because the tiers are on different filesystems), the file is copied.
+    """
+    with instrument.phase("promote", mode=mode) as span:
+        if mode == "link":
+            try:
+                os.link(src, dst)
+            except OSError:
+                logger.debug("Can't hard-link %s, copying it instead", src)
+            else:
+                # Hard links share the inode, so the stamp of the source is still valid
+                if (stamp := read_stamp(src)) is not None:
+                    write_stamp(dst, stamp["hash"], verified="verified_at" in stamp)
+                return
+        logger.info("Copying %s to: %s", src, dst)
+        span.attributes["mode"] = "copy"
+        with open(src, "rb") as f_in, open(get_part_path(dst), "wb") as f_out:
+            digest = copy_and_hash(f_in, f_out)
+            span.nbytes = f_out.tell()
+        publish_part(dst)
+        write_stamp(dst, digest)
+
+
 def lenient_remove(path: os.PathLike[str] | str) -> None:
-    if os.path.exists(path):
-        try:
-            os.remove(path)
-        except Exception:
-            logger.exception("Failed to remove: %s", path)
+    for path_ in (path, get_stamp_path(path)):
+        if os.path.exists(path_):
+            try:
+                os.remove(path_)
+            except Exception:
+                logger.exception("Failed to remove: %s", path_)
 
 
 def lenient_remove_tree(path: os.PathLike[str] | str) -> None:
@@ -127,11 +919,164 @@ def lenient_remove_tree(path: os.PathLike[str] | str) -> None:
         logger.exception("Failed to remove: %s", path)
 
 
-def load_registry(registry_url: str | None = None) -> Registry:
-    registry: Registry
-    if registry_url is not None:
-        registry = httpx.get(registry_url, timeout=30).json()
+def get_registry_ttl() -> float:
+    return float(os.environ.get("SEAREPORT_DATA_REGISTRY_TTL", "3600"))
+
+
+def get_registry_cache_path(registry_url: str) -> pathlib.Path:
+    key = xxhash.xxh128_hexdigest(registry_url.encode())
+    return get_cache_path() / "registries" / f"{key}.json"
+
+
+def load_cached_registry(registry_url: str) -> dict[str, T.Any] | None:
+    path = get_registry_cache_path(registry_url)
+    try:
+        entry: dict[str, T.Any] = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    if entry.get("url") != registry_url:
+        return None
+    return entry
+
+
+def save_cached_registry(registry_url: str, entry: dict[str, T.Any]) -> None:
+    path = get_registry_cache_path(registry_url)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(json.dumps(entry))
+    os.replace(tmp_path, path)
+
+
+def fetch_remote_registry(registry_url: str) -> Registry:
+    """
+    Return the registry at `registry_url`, using the copy in the cache directory while it is fresh.
+
+    Stale copies are revalidated with `If-None-Match`/`If-Modified-Since`.
+    If the server can't be reached, the last good copy is used.
+    """
+    import httpx
+
+    entry = load_cached_registry(registry_url)
+    if entry is not None and time.time() - entry["fetched_at"] < get_registry_ttl():
+        instrument.annotate(cache_hit=True, source="disk")
+        registry: Registry = entry["registry"]
+        return registry
+    headers: dict[str, str] = {}
+    if entry is not None:
+        if etag := entry["validators"].get("etag"):
+            headers["If-None-Match"] = etag
+        if last_modified := entry["validators"].get("last_modified"):
+            headers["If-Modified-Since"] = last_modified
+    try:
+        response = get_httpx_client().get(registry_url, headers=headers)
+        _ = response.raise_for_status()
+    except httpx.HTTPError as exc:
+        if entry is None:
+            raise
+        logger.warning("Using the cached registry, %s can't be reached: %s", registry_url, exc)
+        instrument.annotate(cache_hit=True, source="disk")
+        registry = entry["registry"]
+        return registry
+    if entry is not None and response.status_code == httpx.codes.NOT_MODIFIED:
+        logger.debug("Registry not modified: %s", registry_url)
+        instrument.annotate(cache_hit=True, source="revalidated")
+        entry["fetched_at"] = time.time()
     else:
-        with (files("seareport_data") / "registry.json").open() as fd:
-            registry = json.load(fd)
+        instrument.annotate(nbytes=len(response.content), cache_hit=False, source="remote")
+        entry = {
+            "url": registry_url,
+            "validators": get_validators(response.headers),
+            "fetched_at": time.time(),
+            "registry": response.json(),
+        }
+    save_cached_registry(registry_url, entry)
+    registry = entry["registry"]
     return registry
+
+
+@functools.cache
+def load_packaged_registry() -> Registry:
+    with (files("seareport_data") / "registry.json").open() as fd:
+        registry: Registry = json.load(fd)
+    return registry
+
+
+class RegistryMemo:
+    """
+    Remote registries that were loaded by this process, so that they are not re-read for every accessor call.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.registries: dict[str, tuple[float, Registry]] = {}
+
+    def get(self, registry_url: str) -> Registry:
+        with self.lock:
+            if registry_url in self.registries:
+                loaded_at, registry = self.registries[registry_url]
+                if time.monotonic() - loaded_at < get_registry_ttl():
+                    instrument.annotate(cache_hit=True, source="memory")
+                    return registry
+            registry = resolve_registry_urls(fetch_remote_registry(registry_url), registry_url)
+            self.registries[registry_url] = (time.monotonic(), registry)
+            return registry
+
+    def clear(self) -> None:
+        with self.lock:
+            self.registries.clear()
+
+
+_REGISTRY_MEMO = RegistryMemo()
+
+
+def clear_registry_cache() -> None:
+    """
+    Forget the registries that were loaded by this process. The on-disk copies are kept.
+    """
+    _REGISTRY_MEMO.clear()
+    load_packaged_registry.cache_clear()
+
+
+def resolve_registry_urls(registry: Registry, registry_url: str) -> Registry:
+    """
+    Resolve the relative URLs of `registry` against `registry_url`, so that mirrors can be relocated.
+    """
+
+    def resolve(value: T.Any) -> T.Any:
+        if isinstance(value, dict):
+            return {
+                key: (
+                    urllib.parse.urljoin(registry_url, item)
+                    if key in REGISTRY_URL_KEYS and isinstance(item, str)
+                    else resolve(item)
+                )
+                for key, item in value.items()
+            }
+        return value
+
+    resolved: Registry = resolve(registry)
+    return resolved
+
+
+def load_file_registry(registry_url: str) -> Registry:
+    with file_url_to_path(registry_url).open() as fd:
+        registry: Registry = json.load(fd)
+    return registry
+
+
+def load_registry(registry_url: str | None = None) -> Registry:
+    """
+    Return the registry at `registry_url`, or the registry that is shipped with the package.
+
+    `registry_url` may be a `file://` URL. Relative URLs in the registry are resolved against `registry_url`.
+
+    Remote registries are memoized for `SEAREPORT_DATA_REGISTRY_TTL` seconds. The returned dictionary
+    is shared between calls and must not be modified.
+    """
+    with instrument.phase("registry", url=registry_url) as span:
+        if registry_url is None:
+            span.cache_hit = load_packaged_registry.cache_info().currsize > 0
+            return load_packaged_registry()
+        if is_file_url(registry_url):
+            return resolve_registry_urls(load_file_registry(registry_url), registry_url)
+        return _REGISTRY_MEMO.get(registry_url)
@@ -1,11 +1,26 @@
 from __future__ import annotations
 
+import collections.abc
+import dataclasses
+import json
 import logging
+import os
 import pathlib
 import typing as ty
 
 from . import _core as core
+from . import _instrument as instrument
 from ._enforce_literals import enforce_literals
+from ._fetch import fetch_many
+from ._mosaic import open_mosaic
+from ._mosaic import read_grid
+from ._mosaic import TileGrid
+from ._subset import BBox
+from ._subset import intersects
+from ._subset import subset_bbox
+
+if ty.TYPE_CHECKING:
+    import xarray as xr
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +33,180 @@ EMODNET: ty.Literal["EMODnet"] = "EMODnet"
 EMODNET_LATEST_VERSION: EMODnetVersion = ty.get_args(EMODnetVersion)[-1]
 
 
+def get_grid_path(resource: core.Resource) -> pathlib.Path:
+    return core.get_cache_path() / core.EXTENTS / f"{resource.hash}.json"
+
+
+def index_grid(resource: core.Resource, path: os.PathLike[str] | str) -> TileGrid | None:
+    """
+    Return the grid of the tile at `path`, and keep it in the cache, even after the tile is evicted.
+    """
+    try:
+        grid = read_grid(path)
+    except Exception:
+        logger.exception("Failed to read the grid of %s", path)
+        return None
+    grid_path = get_grid_path(resource)
+    grid_path.parent.mkdir(parents=True, exist_ok=True)
+    # Processes that share the cache may index the same tile concurrently
+    tmp_path = grid_path.with_name(f"{grid_path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(dataclasses.asdict(grid)))
+    os.replace(tmp_path, grid_path)
+    return grid
+
+
+def load_grid(resource: core.Resource) -> TileGrid | None:
+    try:
+        return TileGrid.from_dict(json.loads(get_grid_path(resource).read_text()))
+    except (OSError, ValueError, TypeError, KeyError):
+        # Not indexed yet, or indexed by an older version (which only kept the extent)
+        return None
+
+
+def get_registry_grid(resource: core.Resource, record: dict[str, ty.Any]) -> TileGrid | None:
+    data = record.get("grids", {}).get(resource.name)
+    return None if data is None else TileGrid.from_dict(data)
+
+
+def get_grid(resource: core.Resource, record: dict[str, ty.Any]) -> TileGrid | None:
+    """
+    Return the grid of a tile, or None if it isn't recorded in the registry, the tile hasn't been indexed
+    and it isn't in the cache.
+    """
+    if (grid := get_registry_grid(resource, record) or load_grid(resource)) is not None:
+        return grid
+    # The tile was cached before its grid was indexed
+    path = core.get_cache_path() / resource.path
+    cached = path if path.exists() else core.find_in_tiers(resource.path)
+    return None if cached is None else index_grid(resource, cached)
+
+
+def get_extent(resource: core.Resource, record: dict[str, ty.Any]) -> BBox | None:
+    """
+    Return the extent of a tile, i.e. `(lon_min, lat_min, lon_max, lat_max)`, or None if it's unknown.
+
+    The extents (or the grids) are recorded in the registry, or read from the tiles once they are in the cache.
+    """
+    if (extent := record.get("extents", {}).get(resource.name)) is not None:
+        return ty.cast(BBox, tuple(extent))
+    grid = get_grid(resource, record)
+    return None if grid is None else grid.extent
+
+
+def select_tiles(
+    resources: collections.abc.Iterable[core.Resource],
+    record: dict[str, ty.Any],
+    bbox: BBox,
+) -> list[core.Resource]:
+    """
+    Return the tiles that overlap `bbox`, as well as the tiles whose extent is unknown (they can't be ruled out).
+    """
+    if bbox[1] > bbox[3]:
+        raise ValueError(f"lat_min must not be greater than lat_max: {bbox}")
+    selected: list[core.Resource] = []
+    unknown = 0
+    for resource in resources:
+        if (extent := get_extent(resource, record)) is None:
+            unknown += 1
+            selected.append(resource)
+        elif intersects(extent, bbox):
+            selected.append(resource)
+    if unknown:
+        logger.info("The extents of %d EMODnet tiles are unknown, so they are fetched as well", unknown)
+    logger.debug("Selected %d EMODnet tiles for %s", len(selected), bbox)
+    return selected
+
+
+def get_emodnet_resources(
+    registry: core.Registry,
+    version: EMODnetVersion,
+    bbox: BBox | None = None,
+) -> list[core.Resource]:
+    """
+    Return the EMODnet tiles, or only the tiles that overlap `bbox` (see `select_tiles()`).
+    """
+    record = registry[EMODNET][str(version)]
+    base_url = ty.cast(str, record["base_url"])
+    resources: list[core.Resource] = []
+    for filename, expected_hash in record["hashes"].items():
+        assert isinstance(filename, str)
+        assert isinstance(expected_hash, str)
+        resource = core.Resource(
+            dataset=EMODNET,
+            version=version,
+            name=filename,
+            url=f"{base_url}{filename}.zip",
+            path=f"{EMODNET}/{version}/{filename}",
+            hash=expected_hash,
+            compression="zip",
+            archive=f"{filename}.zip",
+            **core.get_upstream_validators(record, f"{filename}.zip"),
+        )
+        resources.append(resource)
+    if bbox is not None:
+        resources = select_tiles(resources, record, bbox)
+    return resources
+
+
+def index_grids(
+    resources: collections.abc.Iterable[core.Resource],
+    paths: collections.abc.Iterable[pathlib.Path],
+    record: dict[str, ty.Any],
+) -> list[TileGrid | None]:
+    """
+    Return the grids of the fetched tiles, indexing the tiles that are neither recorded in the registry
+    nor indexed yet, so that they are read once.
+
+    The tiles that are not in the cache (i.e. with `download=False`) are not indexed.
+    """
+    grids: list[TileGrid | None] = []
+    for resource, path in zip(resources, paths, strict=True):
+        grid = get_registry_grid(resource, record) or load_grid(resource)
+        if grid is None and path.exists():
+            grid = index_grid(resource, path)
+        grids.append(grid)
+    return grids
+
+
+def read_grids(
+    version: EMODnetVersion = EMODNET_LATEST_VERSION,
+    *,
+    registry_url: str | None = None,
+    max_workers: int = 4,
+) -> dict[str, dict[str, ty.Any]]:
+    """
+    Return the grids of the EMODnet tiles, keyed by their name, as they are recorded in the `grids` of the registry.
+
+    The tiles are downloaded if necessary. With the grids in the registry, `bbox` only fetches the tiles
+    that overlap it, even when the cache is empty.
+    """
+    registry = core.load_registry(registry_url=registry_url)
+    resources = get_emodnet_resources(registry, version=version)
+    paths = fetch_tiles(resources, max_workers=max_workers, download=True, check_hash=True)
+    # The grids of the registry are read again from the tiles
+    grids = index_grids(resources, paths, {})
+    if missing := [str(path) for path, grid in zip(paths, grids, strict=True) if grid is None]:
+        raise ValueError(f"Can't read the grids of {missing}")
+    return {
+        resource.name: dataclasses.asdict(ty.cast(TileGrid, grid))
+        for resource, grid in zip(resources, grids, strict=True)
+    }
+
+
+def fetch_tiles(
+    resources: list[core.Resource],
+    *,
+    max_workers: int,
+    download: bool,
+    check_hash: bool,
+) -> list[pathlib.Path]:
+    results = fetch_many(resources, max_workers=max_workers, download=download, check_hash=check_hash)
+    if errors := [result.error for result in results if result.error is not None]:
+        logger.error("Failed to fetch %d EMODnet tiles", len(errors))
+        raise errors[0]
+    return [ty.cast(pathlib.Path, result.path) for result in results]
+
+
 @ty.overload
 def emodnet(
     version: EMODnetVersion = EMODNET_LATEST_VERSION,
@@ -25,6 +214,8 @@ def emodnet(
     download: bool = True,
     check_hash: bool = True,
     registry_url: str | None = None,
+    max_workers: int = 4,
+    bbox: BBox | None = None,
     as_paths: ty.Literal[False] = False,
 ) -> list[str]: ...
 @ty.overload
@@ -34,53 +225,104 @@ def emodnet(
     download: bool = True,
     check_hash: bool = True,
     registry_url: str | None = None,
+    max_workers: int = 4,
+    bbox: BBox | None = None,
     as_paths: ty.Literal[True],
 ) -> list[pathlib.Path]: ...
+@instrument.traced
 def emodnet(
     version: EMODnetVersion = EMODNET_LATEST_VERSION,
     *,
     download: bool = True,
     check_hash: bool = True,
     registry_url: str | None = None,
+    max_workers: int = 4,
+    bbox: BBox | None = None,
     as_paths: bool = False,
 ) -> list[str] | list[pathlib.Path]:
+    """
+    Return the paths to the EMODnet tiles, downloading the tiles if necessary.
+
+    Parameters:
+        version: The EMODnet version to use. Defaults to the latest version available.
+        registry_url: The URL to a registry that provides the dataset metadata.
+            If None, the default registry is used.
+        max_workers: The number of tiles that are downloaded concurrently.
+        bbox: If not None, only the tiles that overlap `(lon_min, lat_min, lon_max, lat_max)` are fetched.
+            The grids of the tiles are recorded in the registry (see `seareport-data index-emodnet`),
+            or read from the tiles once they are in the cache. The tiles whose grid is unknown are fetched as well.
+
+    Returns:
+        list[str]: The paths of the EMODnet tiles in the local cache.
+
+    """
     enforce_literals(emodnet)
     registry = core.load_registry(registry_url=registry_url)
-    record = registry[EMODNET][str(version)]
-    base_url = ty.cast(str, record["base_url"])
-    cache_dir = core.get_cache_path() / EMODNET / version
-    paths: list[pathlib.Path] = []
-    for filename, expected_hash in record["hashes"].items():
-        assert isinstance(filename, str)
-        assert isinstance(expected_hash, str)
-        archive = cache_dir / f"{filename}.zip"
-        path = cache_dir / filename
-        if download and not path.exists():
-            cache_dir.mkdir(parents=True, exist_ok=True)
-            url = f"{base_url}{filename}.zip"
-            core.download(url, archive)
-            core.extract_zip(archive=archive, filename=filename, target_dir=cache_dir)
-            if check_hash:
-                core.check_hash(path, expected_hash)
-            core.lenient_remove(archive)
-        paths.append(path)
+    resources = get_emodnet_resources(registry, version=version, bbox=bbox)
+    paths = fetch_tiles(resources, max_workers=max_workers, download=download, check_hash=check_hash)
+    index_grids(resources, paths, registry[EMODNET][str(version)])
     if as_paths:
         return paths
     else:
         return [str(path) for path in paths]
 
 
-# def emodnet_ds(
-#     version: EMODnetVersion = EMODNET_LATEST_VERSION,
-#     *,
-#     registry_url: str | None = None,
-#     **kwargs: T.Any,
-# ) -> xr.Dataset:
-#     paths = emodnet(
-#         version=version,
-#         registry_url=registry_url,
-#     )
-#     if "engine" not in kwargs:
-#         kwargs["engine"] = "h5netcdf"
-#     ds = xr.open_dataset(paths, **kwargs)
-#     return ds
+@instrument.traced
+def emodnet_ds(
+    version: EMODnetVersion = EMODNET_LATEST_VERSION,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    registry_url: str | None = None,
+    max_workers: int = 4,
+    bbox: BBox | None = None,
+    buffer: float = 0.0,
+    **kwargs: ty.Any,
+) -> xr.Dataset:
+    """
+    Return the EMODnet tiles as a single lazy dataset, downloading the tiles if necessary.
+
+    The tiles are not read, nor even opened, until the chunks that overlap them are computed, so opening
+    the mosaic is instant and computing a region only reads the tiles it overlaps. The cells between
+    the tiles are NaN. Where tiles overlap, the tile that comes first by name wins, unless its cell is missing.
+
+    Parameters:
+        version: The EMODnet version to use. Defaults to the latest version available.
+        registry_url: The URL to a registry that provides the dataset metadata.
+            If None, the default registry is used.
+        max_workers: The number of tiles that are downloaded concurrently.
+        bbox: If not None, only the tiles that overlap `(lon_min, lat_min, lon_max, lat_max)` (extended
+            by `buffer` degrees) are fetched, and the mosaic is subset to the box.
+        kwargs: Passed to `xr.open_dataset()` for each tile, but `chunks`, which are the dask chunks of the mosaic.
+            By default (or with `chunks="native"`), they are whole multiples of the chunks of the tiles.
+
+    Returns:
+        xr.Dataset: The mosaic of the EMODnet tiles, with ascending latitudes and longitudes.
+
+    """
+    enforce_literals(emodnet_ds)
+    registry = core.load_registry(registry_url=registry_url)
+    buffered = (
+        None if bbox is None else (bbox[0] - buffer, bbox[1] - buffer, bbox[2] + buffer, bbox[3] + buffer)
+    )
+    resources = get_emodnet_resources(registry, version=version, bbox=buffered)
+    # The overlaps of the tiles are resolved in the order of their names
+    resources.sort(key=lambda resource: resource.name)
+    if not resources:
+        raise ValueError(f"Can't open EMODnet: no tile overlaps {bbox}")
+    paths = fetch_tiles(resources, max_workers=max_workers, download=download, check_hash=check_hash)
+    if missing := [str(path) for path in paths if not path.exists()]:
+        raise ValueError(
+            f"Can't open EMODnet: {len(missing)} tiles are not in the cache, e.g. {missing[0]}",
+        )
+    grids = index_grids(resources, paths, registry[EMODNET][str(version)])
+    if missing := [str(path) for path, grid in zip(paths, grids, strict=True) if grid is None]:
+        raise ValueError(f"Can't open EMODnet: failed to read the grids of {missing}")
+    if "engine" not in kwargs:
+        kwargs["engine"] = "h5netcdf"
+    with instrument.phase("open"):
+        ds = open_mosaic(paths, ty.cast(list[TileGrid], grids), kwargs)
+    if bbox is not None:
+        with instrument.phase("subset"):
+            ds = subset_bbox(ds, bbox, buffer=buffer)
+    return ds
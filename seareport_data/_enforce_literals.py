@@ -4,6 +4,8 @@
 #
 # mypy: ignore-errors
 # pyright: basic
+import functools
+import inspect
 from collections.abc import Callable
 from sys import _getframe
 from typing import Any
@@ -35,7 +37,25 @@ def _check_value_to_type(kwargs, name, type_):
         _check_value_to_literal(kwargs=kwargs, name=name, literal=type_)
 
 
+@functools.cache
+def _get_annotations(function):
+    # With `from __future__ import annotations`, the annotations are strings, which are evaluated
+    # in the module of the (undecorated) function, like `typing.get_type_hints()` does.
+    # Names that are only imported for type checking (e.g. `xr.Dataset`) can't be evaluated; they are never Literals
+    module_globals = inspect.unwrap(function).__globals__
+    annotations = {}
+    for name, annotation in function.__annotations__.items():
+        if not isinstance(annotation, str):
+            annotations[name] = annotation
+            continue
+        try:
+            annotations[name] = eval(annotation, module_globals)  # noqa: S307
+        except (NameError, AttributeError):
+            continue
+    return annotations
+
+
 def enforce_literals(function: Callable[..., Any]) -> None:
     kwargs = _getframe(1).f_locals
-    for name, type_ in function.__annotations__.items():
+    for name, type_ in _get_annotations(function).items():
         _check_value_to_type(kwargs=kwargs, name=name, type_=type_)
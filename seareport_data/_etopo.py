@@ -4,10 +4,19 @@ import logging
 import pathlib
 import typing as ty
 
-import xarray as xr
-
 from . import _core as core
+from . import _instrument as instrument
 from ._enforce_literals import enforce_literals
+from ._fetch import fetch
+from ._hdf5 import open_dataset
+from ._overview import get_store
+from ._subset import BBox
+from ._subset import subset_bbox
+from ._zarr import Format
+from ._zarr import open_zarr
+
+if ty.TYPE_CHECKING:
+    import xarray as xr
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +36,25 @@ def get_etopo_filename(dataset: ETopoDataset) -> str:
     return filename
 
 
+def get_etopo_resource(
+    registry: core.Registry,
+    dataset: ETopoDataset,
+    resolution: ETopoResolution,
+    version: ETopoVersion,
+) -> core.Resource:
+    record = registry[ETOPO][str(version)][resolution][dataset]
+    filename = str(record["filename"])
+    return core.Resource(
+        dataset=ETOPO,
+        version=version,
+        name=f"{resolution}/{dataset}",
+        url=str(record["url"]),
+        path=f"{ETOPO}/{version}/{filename}",
+        hash=str(record["hash"]),
+        **core.get_upstream_validators(record),
+    )
+
+
 @ty.overload
 def etopo(
     dataset: ETopoDataset,
@@ -49,6 +77,7 @@ def etopo(
     registry_url: str | None = None,
     as_paths: ty.Literal[True],
 ) -> list[pathlib.Path]: ...
+@instrument.traced
 def etopo(
     dataset: ETopoDataset,
     resolution: ETopoResolution = "30sec",
@@ -61,22 +90,15 @@ def etopo(
 ) -> list[str] | list[pathlib.Path]:
     enforce_literals(etopo)
     registry = core.load_registry(registry_url=registry_url)
-    record = registry[ETOPO][str(version)][resolution][dataset]
-    cache_dir = core.get_cache_path() / ETOPO / version
-    filename = str(record["filename"])
-    path = cache_dir / filename
-    if download and not path.exists():
-        cache_dir.mkdir(parents=True, exist_ok=True)
-        url = str(record["url"])
-        core.download(url, path)
-    if check_hash:
-        core.check_hash(path, str(record["hash"]))
+    resource = get_etopo_resource(registry, dataset=dataset, resolution=resolution, version=version)
+    path = fetch(resource, download=download, check_hash=check_hash)
     if as_paths:
         return [pathlib.Path(path)]
     else:
         return [str(path)]
 
 
+@instrument.traced
 def etopo_ds(
     dataset: ETopoDataset,
     resolution: ETopoResolution = "30sec",
@@ -85,6 +107,10 @@ def etopo_ds(
     download: bool = True,
     check_hash: bool = True,
     registry_url: str | None = None,
+    bbox: BBox | None = None,
+    buffer: float = 0.0,
+    format: Format = "netcdf",
+    level: int = 0,
     **kwargs: ty.Any,
 ) -> xr.Dataset:
     path = etopo(
@@ -97,5 +123,12 @@ def etopo_ds(
     )[0]
     if "engine" not in kwargs:
         kwargs["engine"] = "h5netcdf"
-    ds = xr.open_dataset(path, **kwargs)
+    registry = core.load_registry(registry_url=registry_url)
+    resource = get_etopo_resource(registry, dataset=dataset, resolution=resolution, version=version)
+    store_path = get_store(resource, path, format=format, level=level, engine=kwargs.get("engine"))
+    with instrument.phase("open"):
+        ds = open_dataset(path, kwargs) if store_path is None else open_zarr(store_path, kwargs)
+    if bbox is not None:
+        with instrument.phase("subset"):
+            ds = subset_bbox(ds, bbox, buffer=buffer)
     return ds
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import collections.abc
+import concurrent.futures
+import contextlib
+import dataclasses
+import logging
+import pathlib
+import threading
+import time
+import typing as ty
+import urllib.parse
+
+from . import _cache
+from . import _core as core
+from . import _instrument as instrument
+from ._lock import FileLock
+
+if ty.TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def download_resource(
+    resource: core.Resource,
+    path: pathlib.Path,
+    client: httpx.Client | None = None,
+) -> str | None:
+    if resource.compression == "zip":
+        return core.download_zip_member(
+            resource.url,
+            filename=path.name,
+            target_dir=path.parent,
+            archive=resource.archive,
+            client=client,
+        )
+    elif resource.compression == "zstd":
+        return core.download_zstd(resource.url, path, client=client)
+    elif resource.compression == "gzip":
+        return core.download_gzip(resource.url, path, client=client)
+    else:
+        return core.download(resource.url, path, client=client)
+
+
+def locate(relative_path: str) -> pathlib.Path:
+    """
+    Return the path of a file in the cache tiers, or its path in the writable tier if no tier has it.
+
+    If `SEAREPORT_DATA_PROMOTE` is set, files that are found in a read-only tier are hard-linked
+    or copied to the writable tier first.
+    """
+    path = core.get_cache_path() / relative_path
+    if path.exists() or (tier_path := core.find_in_tiers(relative_path)) is None:
+        return path
+    if (mode := core.get_promote_mode()) is None:
+        return tier_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with FileLock(path):
+        if not path.exists():
+            core.promote(tier_path, path, mode=mode)
+    return path
+
+
+def fetch(
+    resource: core.Resource,
+    *,
+    download: bool = True,
+    check_hash: bool = True,
+    client: httpx.Client | None = None,
+) -> pathlib.Path:
+    """
+    Return the path of `resource` in the local cache, downloading it if necessary.
+
+    Only one thread or process (possibly on another host that shares the cache) downloads a resource
+    at any given time; the others wait for it to finish and then use the downloaded file.
+    """
+    with instrument.phase("fetch", resource=resource.key) as span:
+        path = locate(resource.path)
+        digest: str | None = None
+        span.cache_hit = path.exists()
+        if download and not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with FileLock(path):
+                # The file may have been downloaded while we were waiting for the lock
+                if not path.exists():
+                    digest = download_resource(resource, path, client=client)
+                    span.nbytes = path.stat().st_size
+                    _ = _cache.evict(keep=[path])
+        if check_hash:
+            core.check_hash(path, resource.hash, digest=digest)
+        if path.exists():
+            _cache.record_access(path)
+    return path
+
+
+@dataclasses.dataclass
+class FetchResult:
+    """
+    The outcome of fetching a single resource with `fetch_many()`.
+
+    Attributes:
+        resource: The resource that was fetched.
+        path: The path of the resource in the local cache. `None` if fetching failed.
+        error: The exception that was raised while fetching the resource, if any.
+        elapsed: The time it took to fetch the resource, in seconds.
+    """
+
+    resource: core.Resource
+    path: pathlib.Path | None = None
+    error: Exception | None = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class HostLimiter:
+    """
+    Limit the number of concurrent requests per host.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.semaphores: dict[str, threading.BoundedSemaphore] = {}
+
+    def get(self, url: str) -> threading.BoundedSemaphore:
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.limit)
+            return self.semaphores[host]
+
+
+@contextlib.contextmanager
+def pooled_client(
+    client: httpx.Client | None,
+    max_workers: int,
+) -> collections.abc.Iterator[httpx.Client]:
+    import httpx
+
+    if client is not None:
+        yield client
+        return
+    options = core.get_httpx_client_options()
+    if max_workers <= (options["limits"].max_keepalive_connections or 0):
+        yield core.get_httpx_client()
+        return
+    # The shared pool is too small for this many workers. Each worker may use more than one connection
+    # (e.g. for ranged downloads), so we only limit the number of connections that are kept alive.
+    options["limits"] = httpx.Limits(max_connections=None, max_keepalive_connections=max_workers)
+    with httpx.Client(**options) as pooled:
+        yield pooled
+
+
+def _fetch_one(
+    resource: core.Resource,
+    *,
+    download: bool,
+    check_hash: bool,
+    client: httpx.Client,
+    limiter: HostLimiter,
+) -> FetchResult:
+    result = FetchResult(resource=resource)
+    start = time.perf_counter()
+    try:
+        with limiter.get(resource.url):
+            result.path = fetch(resource, download=download, check_hash=check_hash, client=client)
+    except Exception as exc:
+        logger.error("Failed to fetch %s: %s", resource.key, exc)
+        result.error = exc
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+@instrument.traced
+def fetch_many(
+    resources: collections.abc.Iterable[core.Resource],
+    *,
+    max_workers: int = 4,
+    per_host_limit: int | None = None,
+    download: bool = True,
+    check_hash: bool = True,
+    client: httpx.Client | None = None,
+    callback: collections.abc.Callable[[FetchResult], None] | None = None,
+) -> list[FetchResult]:
+    """
+    Download, extract and verify many resources concurrently.
+
+    Parameters:
+        resources: The resources to fetch.
+        max_workers: The maximum number of resources that are fetched at the same time.
+        per_host_limit: The maximum number of resources that are fetched from the same host at the same time.
+            If None, `max_workers` is used.
+        download: Whether to download the resources that are not in the cache.
+        check_hash: Whether to check the hashes of the resources.
+        client: The client used for the requests. If None, the shared client is used, unless its connection
+            pool is too small for `max_workers`, in which case a dedicated client is created.
+        callback: A function that is called with the result of each resource, as soon as it is fetched.
+
+    Returns:
+        The results in the same order as `resources`. Errors are not raised; they are reported in the results.
+    """
+    resources = list(resources)
+    limiter = HostLimiter(per_host_limit or max_workers)
+    with (
+        pooled_client(client, max_workers) as client_,
+        instrument.progress_task("Resources", total=len(resources)) as overall,
+    ):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                instrument.run_in_context(
+                    executor,
+                    _fetch_one,
+                    resource,
+                    download=download,
+                    check_hash=check_hash,
+                    client=client_,
+                    limiter=limiter,
+                ): index
+                for index, resource in enumerate(resources)
+            }
+            results: dict[int, FetchResult] = {}
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                overall.update(advance=1)
+                if callback is not None:
+                    callback(result)
+    return [results[index] for index in range(len(resources))]
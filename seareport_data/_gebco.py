@@ -1,11 +1,22 @@
+from __future__ import annotations
+
 import logging
 import pathlib
 import typing as ty
 
-import xarray as xr
-
 from . import _core as core
+from . import _instrument as instrument
 from ._enforce_literals import enforce_literals
+from ._fetch import fetch
+from ._hdf5 import open_dataset
+from ._overview import get_store
+from ._subset import BBox
+from ._subset import subset_bbox
+from ._zarr import Format
+from ._zarr import open_zarr
+
+if ty.TYPE_CHECKING:
+    import xarray as xr
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +38,26 @@ class GEBCORecord(ty.TypedDict):
     hash: str
 
 
+def get_gebco_resource(
+    registry: core.Registry,
+    dataset: GEBCODatasets,
+    version: GEBCOVersion,
+) -> core.Resource:
+    version_str = str(version)
+    record = registry[GEBCO][version_str][dataset]
+    return core.Resource(
+        dataset=GEBCO,
+        version=version_str,
+        name=dataset,
+        url=record["url"],
+        path=f"{GEBCO}/{version_str}/{dataset}/{record['filename']}",
+        hash=record["hash"],
+        compression="zip" if "archive" in record else None,
+        archive=record.get("archive"),
+        **core.get_upstream_validators(record),
+    )
+
+
 @ty.overload
 def gebco(
     dataset: GEBCODatasets,
@@ -47,6 +78,7 @@ def gebco(
     registry_url: str | None = None,
     as_paths: ty.Literal[True],
 ) -> list[pathlib.Path]: ...
+@instrument.traced
 def gebco(
     dataset: GEBCODatasets,
     version: GEBCOVersion = GEBCO_LATEST_VERSION,
@@ -71,27 +103,15 @@ def gebco(
     """
     enforce_literals(gebco)
     registry = core.load_registry(registry_url=registry_url)
-    version_str = str(version)
-    record = registry[GEBCO][version_str][dataset]
-    cache_dir = core.get_cache_path() / GEBCO / version_str / dataset
-    file_path = cache_dir / record["filename"]
-    if download and not file_path.exists():
-        cache_dir.mkdir(parents=True, exist_ok=True)
-        if "archive" in record:
-            archive_path = cache_dir / record["archive"]
-            core.download(record["url"], archive_path)
-            core.extract_zip(archive_path, record["filename"], cache_dir)
-            core.lenient_remove(archive_path)
-        else:
-            core.download(record["url"], file_path)
-    if check_hash:
-        core.check_hash(file_path, record["hash"])
+    resource = get_gebco_resource(registry, dataset=dataset, version=version)
+    file_path = fetch(resource, download=download, check_hash=check_hash)
     if as_paths:
         return [pathlib.Path(file_path)]
     else:
         return [str(file_path)]
 
 
+@instrument.traced
 def gebco_ds(
     dataset: GEBCODatasets,
     version: GEBCOVersion = GEBCO_LATEST_VERSION,
@@ -99,6 +119,10 @@ def gebco_ds(
     download: bool = True,
     check_hash: bool = True,
     registry_url: str | None = None,
+    bbox: BBox | None = None,
+    buffer: float = 0.0,
+    format: Format = "netcdf",
+    level: int = 0,
     **kwargs: ty.Any,
 ) -> xr.Dataset:
     path = gebco(
@@ -110,5 +134,12 @@ def gebco_ds(
     )[0]
     if "engine" not in kwargs:
         kwargs["engine"] = "h5netcdf"
-    ds = xr.open_dataset(path, **kwargs)
+    registry = core.load_registry(registry_url=registry_url)
+    resource = get_gebco_resource(registry, dataset=dataset, version=version)
+    store_path = get_store(resource, path, format=format, level=level, engine=kwargs.get("engine"))
+    with instrument.phase("open"):
+        ds = open_dataset(path, kwargs) if store_path is None else open_zarr(store_path, kwargs)
+    if bbox is not None:
+        with instrument.phase("subset"):
+            ds = subset_bbox(ds, bbox, buffer=buffer)
     return ds
@@ -4,10 +4,13 @@ import logging
 import pathlib
 import typing as ty
 
-import geopandas as gpd
-
 from . import _core as core
+from . import _instrument as instrument
 from ._enforce_literals import enforce_literals
+from ._fetch import fetch
+
+if ty.TYPE_CHECKING:
+    import geopandas as gpd
 
 logger = logging.getLogger(__name__)
 
@@ -66,6 +69,26 @@ def get_gshhg_filename(
     return f"gshhg_{long_resolution}_l{shoreline}.gpkg"
 
 
+def get_gshhg_resource(
+    registry: core.Registry,
+    resolution: GSHHGResolution,
+    shoreline: GSHHGShoreline,
+    version: GSHHGVersion,
+) -> core.Resource:
+    record = registry[GSHHG][version]
+    filename = get_gshhg_filename(resolution=resolution, shoreline=shoreline)
+    long_resolution = SHORT_TO_LONG_GSHHG_RESOLUTIONS[resolution[0].lower()]
+    return core.Resource(
+        dataset=GSHHG,
+        version=version,
+        name=f"{long_resolution}/{shoreline}",
+        url=record["base_url"] + filename,
+        path=f"{GSHHG}/{version}/{filename}",
+        hash=record["hashes"][filename],
+        **core.get_upstream_validators(record, filename),
+    )
+
+
 @ty.overload
 def gshhg(
     resolution: GSHHGResolution,
@@ -88,6 +111,7 @@ def gshhg(
     registry_url: str | None = None,
     as_paths: ty.Literal[True],
 ) -> list[pathlib.Path]: ...
+@instrument.traced
 def gshhg(
     resolution: GSHHGResolution,
     shoreline: GSHHGShoreline,
@@ -100,22 +124,15 @@ def gshhg(
 ) -> list[str] | list[pathlib.Path]:
     enforce_literals(gshhg)
     registry = core.load_registry(registry_url=registry_url)
-    record = registry[GSHHG][version]
-    cache_dir = core.get_cache_path() / GSHHG / version
-    filename = get_gshhg_filename(resolution=resolution, shoreline=shoreline)
-    path = cache_dir / filename
-    if download and not path.exists():
-        cache_dir.mkdir(parents=True, exist_ok=True)
-        url = record["base_url"] + filename
-        core.download(url, path)
-    if check_hash:
-        core.check_hash(path, record["hashes"][filename])
+    resource = get_gshhg_resource(registry, resolution=resolution, shoreline=shoreline, version=version)
+    path = fetch(resource, download=download, check_hash=check_hash)
     if as_paths:
         return [pathlib.Path(path)]
     else:
         return [str(path)]
 
 
+@instrument.traced
 def gshhg_df(
     resolution: GSHHGResolution,
     shoreline: GSHHGShoreline,
@@ -126,6 +143,8 @@ def gshhg_df(
     registry_url: str | None = None,
     **kwargs: ty.Any,
 ) -> gpd.GeoDataFrame:
+    import geopandas as gpd
+
     path = gshhg(
         resolution=resolution,
         shoreline=shoreline,
@@ -134,5 +153,6 @@ def gshhg_df(
         check_hash=check_hash,
         registry_url=registry_url,
     )[0]
-    gdf: gpd.GeoDataFrame = gpd.read_file(path, **kwargs)
+    with instrument.phase("open"):
+        gdf: gpd.GeoDataFrame = gpd.read_file(path, **kwargs)
     return gdf
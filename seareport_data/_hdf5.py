@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import copyreg
+import dataclasses
+import functools
+import logging
+import math
+import os
+import typing as T
+
+from ._cache import parse_size
+
+if T.TYPE_CHECKING:
+    import xarray as xr
+
+logger = logging.getLogger(__name__)
+
+# Constants
+# The defaults of HDF5
+DEFAULT_RDCC_NBYTES = 2**20
+# HDF5 recommends a prime number of hash slots, about 100 times the number of chunks that fit in the cache
+SLOTS_PER_CHUNK = 100
+DEFAULT_CHUNK_CACHE = "64M"
+RDCC_KEYS = ("rdcc_nbytes", "rdcc_nslots", "rdcc_w0")
+# The keyword of `open_dataset()` that enables `PinnedVariables`
+PIN_CHUNK_CACHE = "pin_chunk_cache"
+
+
+@dataclasses.dataclass(frozen=True)
+class ChunkedVariable:
+    """
+    The on-disk layout of a chunked variable of a netCDF4/HDF5 file.
+    """
+
+    name: str
+    dims: tuple[str, ...]
+    shape: tuple[int, ...]
+    chunks: tuple[int, ...]
+    itemsize: int
+
+    @property
+    def nbytes(self) -> int:
+        return math.prod(self.shape) * self.itemsize
+
+    @property
+    def chunk_nbytes(self) -> int:
+        return math.prod(self.chunks) * self.itemsize
+
+
+# The modification time and the size of the file are only part of the key of the cache
+@functools.lru_cache(maxsize=32)
+def _read_chunk_layout(path: str, _mtime_ns: int, _size: int) -> tuple[ChunkedVariable, ...]:
+    import h5netcdf
+    import h5py
+
+    if not h5py.is_hdf5(path):
+        return ()
+    with h5netcdf.File(path, "r") as nc:
+        variables = [
+            ChunkedVariable(
+                name=name,
+                dims=tuple(var.dimensions),
+                shape=tuple(var.shape),
+                chunks=tuple(var.chunks),
+                itemsize=var.dtype.itemsize,
+            )
+            for name, var in nc.variables.items()
+            if var.chunks is not None and var.ndim
+        ]
+    return tuple(sorted(variables, key=lambda var: var.nbytes, reverse=True))
+
+
+def read_chunk_layout(path: os.PathLike[str] | str) -> tuple[ChunkedVariable, ...]:
+    """
+    Return the chunked variables of a netCDF4/HDF5 file, largest first. Other files have none.
+
+    The layout is memoized as long as the file is not modified.
+    """
+    stat = os.stat(path)
+    return _read_chunk_layout(os.fspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def grow_chunks(variable: ChunkedVariable, target_nbytes: int) -> tuple[int, ...]:
+    """
+    Return the largest chunks of at most `target_nbytes` that are made of whole on-disk chunks.
+
+    The chunks are doubled along their smallest dimension first, so they stay about square,
+    which suits reading tiles as well as rows.
+    """
+    sizes = list(variable.chunks)
+    while growable := [axis for axis, size in enumerate(sizes) if size < variable.shape[axis]]:
+        axis = min(growable, key=lambda axis: sizes[axis])
+        grown = min(2 * sizes[axis], variable.shape[axis])
+        if math.prod(sizes) // sizes[axis] * grown * variable.itemsize > target_nbytes:
+            break
+        sizes[axis] = grown
+    return tuple(sizes)
+
+
+def get_dask_chunk_size() -> int:
+    import dask
+    from dask.utils import parse_bytes
+
+    chunk_size: int = parse_bytes(dask.config.get("array.chunk-size"))
+    return chunk_size
+
+
+def get_native_chunks(
+    variables: T.Sequence[ChunkedVariable],
+    target_nbytes: int | None = None,
+) -> dict[str, int]:
+    """
+    Return dask chunks that are whole multiples of the on-disk chunks, of about `target_nbytes`
+    (by default dask's `array.chunk-size`). Each on-disk chunk is then decompressed by a single task.
+
+    Dimensions that are shared by variables with different layouts follow the largest variable.
+    """
+    if target_nbytes is None:
+        target_nbytes = get_dask_chunk_size()
+    chunks: dict[str, int] = {}
+    for variable in variables:
+        for dim, size in zip(variable.dims, grow_chunks(variable, target_nbytes), strict=True):
+            _ = chunks.setdefault(dim, size)
+    return chunks
+
+
+def get_chunk_cache_budget(budget: int | None = None) -> int:
+    if budget is None:
+        budget = parse_size(os.environ.get("SEAREPORT_DATA_HDF5_CHUNK_CACHE", DEFAULT_CHUNK_CACHE))
+    return budget
+
+
+def next_prime(n: int) -> int:
+    def is_prime(k: int) -> bool:
+        return k > 1 and all(k % d for d in range(2, math.isqrt(k) + 1))
+
+    while not is_prime(n):
+        n += 1
+    return n
+
+
+def get_chunk_cache_options(variables: T.Sequence[ChunkedVariable], budget: int) -> dict[str, T.Any]:
+    """
+    Return the options of the raw chunk cache of HDF5 (`rdcc_nbytes`, `rdcc_nslots` and `rdcc_w0`).
+
+    The default cache of HDF5 (1 MiB) is smaller than a single chunk of many grids, in which case a chunk
+    is decompressed again for every read that overlaps it. The cache is sized to hold a row of chunks
+    of the largest variable, up to `budget` bytes, so that reading a grid by rows or by tiles
+    decompresses each chunk about once.
+    """
+    if not variables or budget <= DEFAULT_RDCC_NBYTES:
+        return {}
+    variable = variables[0]
+    row_nbytes = math.ceil(variable.shape[-1] / variable.chunks[-1]) * variable.chunk_nbytes
+    nbytes = min(max(row_nbytes, DEFAULT_RDCC_NBYTES), budget)
+    n_chunks = max(1, nbytes // variable.chunk_nbytes)
+    # Chunks are evicted once they have been read entirely, which is what tiled reads do
+    return {"rdcc_nbytes": nbytes, "rdcc_nslots": next_prime(SLOTS_PER_CHUNK * n_chunks), "rdcc_w0": 1.0}
+
+
+def get_open_kwargs(path: os.PathLike[str] | str, kwargs: dict[str, T.Any]) -> dict[str, T.Any]:
+    """
+    Resolve the arguments of `xr.open_dataset()` that depend on the layout of the file at `path`.
+
+    - `chunks="native"` is replaced by dask chunks that are whole multiples of the on-disk chunks.
+      Files without chunked variables (e.g. netCDF3) use `chunks="auto"` instead.
+    - `rdcc_nbytes`, `rdcc_nslots` and `rdcc_w0` configure the raw chunk cache of HDF5. With the `h5netcdf` engine,
+      the cache is otherwise sized for the layout, within `SEAREPORT_DATA_HDF5_CHUNK_CACHE` bytes (default `64M`;
+      `0` keeps the default of HDF5). The cache only outlives a read with `pin_chunk_cache=True` (see `open_dataset()`).
+    """
+    kwargs = dict(kwargs)
+    driver_kwds = dict(kwargs.pop("driver_kwds", None) or {})
+    for key in RDCC_KEYS:
+        if key in kwargs:
+            driver_kwds[key] = kwargs.pop(key)
+    is_native = isinstance(kwargs.get("chunks"), str) and kwargs["chunks"] == "native"
+    is_h5netcdf = kwargs.get("engine") == "h5netcdf"
+    if not is_native and not is_h5netcdf:
+        if driver_kwds:
+            kwargs["driver_kwds"] = driver_kwds
+        return kwargs
+    variables = read_chunk_layout(path)
+    if is_native:
+        kwargs["chunks"] = get_native_chunks(variables) or "auto"
+        logger.debug("Native chunks of %s: %s", path, kwargs["chunks"])
+    if is_h5netcdf and not any(key in driver_kwds for key in RDCC_KEYS):
+        driver_kwds.update(get_chunk_cache_options(variables, get_chunk_cache_budget()))
+    if driver_kwds:
+        kwargs["driver_kwds"] = driver_kwds
+    return kwargs
+
+
+class PinnedVariables:
+    """
+    Keep the chunked variables of `path` open until called, which closes them and then calls `close`.
+
+    h5netcdf opens the HDF5 dataset anew for every read, and HDF5 drops the chunk cache of a dataset as soon as
+    it is closed, so the cache would never outlive a read. HDF5 shares the datasets that are open in the same file,
+    so a second handle on them keeps the cache of the reads of xarray. Unpickling (e.g. in a dask worker or in
+    a process pool) pins the variables again, in the new process.
+    """
+
+    def __init__(
+        self,
+        path: os.PathLike[str] | str,
+        rdcc: dict[str, T.Any],
+        close: T.Callable[[], None] | None,
+    ) -> None:
+        import h5py
+
+        self.path = path
+        self.rdcc = rdcc
+        self.close = close
+        self.h5file = h5py.File(path, "r", **rdcc)
+        self.pinned = [self.h5file[variable.name] for variable in read_chunk_layout(path)]
+
+    def __call__(self) -> None:
+        self.pinned.clear()
+        self.h5file.close()
+        if self.close is not None:
+            self.close()
+
+
+def reduce_pinned(pinned: PinnedVariables) -> tuple[T.Any, ...]:
+    return (PinnedVariables, (pinned.path, pinned.rdcc, pinned.close))
+
+
+copyreg.pickle(PinnedVariables, reduce_pinned)
+
+
+def pin_variables(ds: xr.Dataset, path: os.PathLike[str] | str, rdcc: dict[str, T.Any]) -> xr.Dataset:
+    """
+    Return `ds`, keeping the chunked variables of `path` open until it (or any dataset derived from it) is closed.
+
+    The result is a shallow copy whose closer releases the pinned variables and then closes `ds`.
+    """
+    pinned: xr.Dataset = ds.copy(deep=False)
+    pinned.set_close(PinnedVariables(path, rdcc, ds.close))
+    return pinned
+
+
+def open_dataset(path: os.PathLike[str] | str, kwargs: dict[str, T.Any]) -> xr.Dataset:
+    """
+    Open `path` with `xr.open_dataset()`, after resolving the arguments that depend on its layout (see `get_open_kwargs()`).
+
+    With `pin_chunk_cache=True` and the `h5netcdf` engine, the chunk cache of HDF5 is kept between reads
+    (see `PinnedVariables`), which is what makes a large cache useful for reads by windows.
+    """
+    import xarray as xr
+
+    kwargs = dict(kwargs)
+    pin = bool(kwargs.pop(PIN_CHUNK_CACHE, False))
+    kwargs = get_open_kwargs(path, kwargs)
+    ds = xr.open_dataset(path, **kwargs)
+    rdcc = {key: value for key, value in kwargs.get("driver_kwds", {}).items() if key in RDCC_KEYS}
+    if pin and kwargs.get("engine") == "h5netcdf" and rdcc:
+        ds = pin_variables(ds, path, rdcc)
+    return ds
@@ -0,0 +1,536 @@
+"""
+Structured events about the phases of the accessor calls, and the sinks that consume them.
+
+Every accessor call is split into phases (loading the registry, waiting for the lock, downloading,
+extracting, hashing and opening the files). When a phase ends, an `Event` is sent to every registered sink.
+Transfers additionally report their progress as tasks, which is how the progress bar is drawn.
+"""
+
+from __future__ import annotations
+
+import collections.abc
+import concurrent.futures
+import contextlib
+import contextvars
+import dataclasses
+import functools
+import inspect
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+import typing as T
+
+if T.TYPE_CHECKING:
+    from rich.progress import Progress
+    from rich.progress import TaskID
+
+logger = logging.getLogger(__name__)
+
+# Types
+P = T.ParamSpec("P")
+R = T.TypeVar("R")
+
+# Constants
+SIZE_UNITS = ("B", "KiB", "MiB", "GiB", "TiB")
+
+
+def format_size(size: float) -> str:
+    for unit in SIZE_UNITS[:-1]:
+        if abs(size) < 1024:  # noqa: PLR2004
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} {SIZE_UNITS[-1]}"
+
+
+@dataclasses.dataclass(frozen=True)
+class Event:
+    """
+    A phase of an accessor call that ended, e.g. downloading or hashing a file.
+
+    Attributes:
+        phase: The name of the phase: `registry`, `fetch`, `lock`, `download`, `extract`, `promote`, `hash`
+            or `open`. The outermost phase of a call is named after the function, e.g. `gebco_ds`.
+        resource: The key of the resource, e.g. `GEBCO/2024/ice`. Inner phases inherit it from their parent.
+        duration: The wall-clock duration of the phase, in seconds.
+        started_at: When the phase started, as a POSIX timestamp.
+        nbytes: The number of bytes the phase downloaded, wrote or hashed, if it handled a file.
+        cache_hit: Whether the phase was served from a cache: for `fetch`, the file was already in the cache;
+            for `hash`, the hash was not computed again; for `registry`, the registry was not downloaded.
+        error: The name of the exception that interrupted the phase, if any.
+        call_id: The identifier of the outermost call, which is shared by all the phases of the call.
+        depth: How deeply the phase is nested; the outermost phase of a call has a depth of 0.
+        attributes: Other details, e.g. the URL of a download.
+    """
+
+    phase: str
+    resource: str | None
+    duration: float
+    started_at: float
+    nbytes: int | None = None
+    cache_hit: bool | None = None
+    error: str | None = None
+    call_id: int = 0
+    depth: int = 0
+    attributes: dict[str, T.Any] = dataclasses.field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float | None:
+        """
+        The number of bytes per second, if the phase handled bytes.
+        """
+        if not self.nbytes or self.duration <= 0:
+            return None
+        return self.nbytes / self.duration
+
+
+@dataclasses.dataclass
+class Span:
+    """
+    A phase that is running. The code of the phase records its outcome on it.
+    """
+
+    phase: str
+    resource: str | None
+    call_id: int
+    depth: int
+    nbytes: int | None = None
+    cache_hit: bool | None = None
+    attributes: dict[str, T.Any] = dataclasses.field(default_factory=dict)
+
+
+class Task:
+    """
+    The progress of a transfer, e.g. the number of bytes of a file that were downloaded so far.
+
+    Unlike phases, tasks may be updated from many threads, e.g. by the connections of a ranged download.
+    """
+
+    def __init__(self, description: str, total: int | None = None, completed: int = 0) -> None:
+        self.id = next(_TASK_IDS)
+        self.description = description
+        self.total = total
+        self.completed = completed
+        self.lock = threading.Lock()
+
+    def update(self, *, total: int | None = None, advance: int = 0, completed: int | None = None) -> None:
+        with self.lock:
+            if total is not None:
+                self.total = total
+            if completed is not None:
+                self.completed = completed
+            self.completed += advance
+        notify("update_task", self)
+
+
+class Sink(T.Protocol):
+    """
+    A consumer of events. `emit()` is called when a phase ends.
+
+    Sinks that show the progress of the transfers can also define `start_task(task)`, `update_task(task)`
+    and `stop_task(task)`, like `ProgressSink`. The methods may be called concurrently from many threads.
+    Their exceptions are logged and otherwise ignored.
+    """
+
+    def emit(self, event: Event) -> None: ...
+
+
+def format_event(event: Event) -> str:
+    parts = [f"{event.duration:.3f}s"]
+    if event.nbytes is not None:
+        parts.append(format_size(event.nbytes))
+    if (throughput := event.throughput) is not None:
+        parts.append(f"{format_size(throughput)}/s")
+    if event.cache_hit is not None:
+        parts.append("cache hit" if event.cache_hit else "cache miss")
+    if event.error is not None:
+        parts.append(f"failed with {event.error}")
+    subject = f"{event.phase} {event.resource}" if event.resource else event.phase
+    return f"{subject}: {', '.join(parts)}"
+
+
+class LoggingSink:
+    """
+    Log every event, e.g. `download GEBCO/2024/ice: 80.100s, 7.5 GiB, 95.3 MiB/s`.
+    """
+
+    def __init__(self, logger: logging.Logger | None = None, level: int = logging.DEBUG) -> None:
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        self.level = level
+
+    def emit(self, event: Event) -> None:
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%s", format_event(event))
+
+
+class MemorySink:
+    """
+    Keep the events in memory, e.g. to check them in tests.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.events: list[Event] = []
+
+    def emit(self, event: Event) -> None:
+        with self.lock:
+            self.events.append(event)
+
+    def phases(self, phase: str) -> list[Event]:
+        """
+        Return the events of the phases named `phase`.
+        """
+        with self.lock:
+            return [event for event in self.events if event.phase == phase]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.events.clear()
+
+
+class OpenTelemetrySink:
+    """
+    Record the events as OpenTelemetry metrics.
+
+    The duration of the phases is recorded in the `seareport_data.phase.duration` histogram and the bytes
+    they handled in the `seareport_data.phase.bytes` counter. Their attributes are the phase, the resource,
+    whether it was a cache hit and the error, if any. The metrics can be exported to Prometheus with
+    the Prometheus exporter of OpenTelemetry.
+
+    Requires `opentelemetry-api`. If `meter` is None, the meter of the global meter provider is used.
+    """
+
+    def __init__(self, meter: T.Any = None) -> None:
+        from opentelemetry import metrics
+
+        if meter is None:
+            meter = metrics.get_meter("seareport_data")
+        self.duration = meter.create_histogram(
+            "seareport_data.phase.duration",
+            unit="s",
+            description="The duration of the phases of the accessor calls.",
+        )
+        self.nbytes = meter.create_counter(
+            "seareport_data.phase.bytes",
+            unit="By",
+            description="The bytes transferred, written or hashed by the phases of the accessor calls.",
+        )
+
+    def emit(self, event: Event) -> None:
+        attributes: dict[str, str | bool] = {"phase": event.phase}
+        if event.resource is not None:
+            attributes["resource"] = event.resource
+        if event.cache_hit is not None:
+            attributes["cache_hit"] = event.cache_hit
+        if event.error is not None:
+            attributes["error"] = event.error
+        self.duration.record(event.duration, attributes)
+        if event.nbytes:
+            self.nbytes.add(event.nbytes, attributes)
+
+
+def get_progress() -> Progress:
+    from rich.progress import BarColumn
+    from rich.progress import DownloadColumn
+    from rich.progress import Progress
+    from rich.progress import TextColumn
+    from rich.progress import TimeRemainingColumn
+    from rich.progress import TransferSpeedColumn
+
+    return Progress(
+        TextColumn("[bold blue]{task.description}"),
+        BarColumn(),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn(),
+    )
+
+
+def is_progress_enabled() -> bool:
+    """
+    Return whether the progress bar is shown: by default, only on terminals and in Jupyter.
+
+    `SEAREPORT_DATA_PROGRESS` can be set to `1` or `0` to always or never show it.
+    """
+    if (enabled := os.environ.get("SEAREPORT_DATA_PROGRESS")) is not None:
+        return enabled == "1"
+    from rich import get_console
+
+    console = get_console()
+    return console.is_terminal or console.is_jupyter
+
+
+class ProgressSink:
+    """
+    Show the tasks in a rich progress display.
+
+    Only one rich display can be active at any given time, so when files are downloaded concurrently
+    (e.g. by `fetch_many()` or from different threads or coroutines), their tasks are added to the
+    same display, which is stopped when its last task ends.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.progress: Progress | None = None
+        self.task_ids: dict[int, TaskID] = {}
+
+    def emit(self, event: Event) -> None:
+        pass
+
+    def start_task(self, task: Task) -> None:
+        with self.lock:
+            if self.progress is None:
+                if not is_progress_enabled():
+                    return
+                self.progress = get_progress()
+                self.progress.start()
+            task_id = self.progress.add_task(task.description, total=task.total, completed=task.completed)
+            self.task_ids[task.id] = task_id
+
+    def update_task(self, task: Task) -> None:
+        progress = self.progress
+        task_id = self.task_ids.get(task.id)
+        if progress is not None and task_id is not None:
+            progress.update(task_id, total=task.total, completed=task.completed)
+
+    def stop_task(self, task: Task) -> None:
+        with self.lock:
+            task_id = self.task_ids.pop(task.id, None)
+            if self.progress is None or task_id is None:
+                return
+            if self.task_ids:
+                # Remove finished tasks while other downloads are still using the display
+                self.progress.remove_task(task_id)
+            else:
+                self.progress.stop()
+                self.progress = None
+
+
+def is_profile_enabled() -> bool:
+    return os.environ.get("SEAREPORT_DATA_PROFILE", "0") == "1"
+
+
+def format_profile(events: list[Event]) -> str:
+    """
+    Return a table with the number of calls, the duration, the bytes and the cache hits of each phase of a call.
+
+    The phases are indented by their depth, so the inner phases of e.g. `fetch` are listed below it.
+    Their durations are included in the duration of their parent.
+    """
+    root = events[-1]
+    rows: dict[tuple[int, str], list[Event]] = {}
+    for event in sorted(events[:-1], key=lambda event: event.started_at):
+        rows.setdefault((event.depth, event.phase), []).append(event)
+    lines = [
+        f"seareport_data profile: {format_event(root)}",
+        f"  {'phase':<24} {'calls':>5} {'seconds':>9} {'bytes':>11} {'throughput':>13}  cache hits",
+    ]
+    for (depth, phase), group in rows.items():
+        duration = sum(event.duration for event in group)
+        nbytes = sum(event.nbytes or 0 for event in group)
+        hits = [event.cache_hit for event in group if event.cache_hit is not None]
+        size = format_size(nbytes) if nbytes else ""
+        throughput = f"{format_size(nbytes / duration)}/s" if nbytes and duration > 0 else ""
+        cache = f"{sum(hits)}/{len(hits)}" if hits else ""
+        name = "  " * (depth - 1) + phase
+        row = f"  {name:<24} {len(group):>5} {duration:>9.3f} {size:>11} {throughput:>13}  {cache}"
+        lines.append(row.rstrip())
+    return "\n".join(lines) + "\n"
+
+
+class ProfileSink:
+    """
+    If `SEAREPORT_DATA_PROFILE` is `1`, print a breakdown of each call by phase to stderr when the call ends.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.calls: dict[int, list[Event]] = {}
+
+    def emit(self, event: Event) -> None:
+        if not is_profile_enabled():
+            return
+        with self.lock:
+            events = self.calls.setdefault(event.call_id, [])
+            events.append(event)
+            if event.depth:
+                return
+            del self.calls[event.call_id]
+        sys.stderr.write(format_profile(events))
+
+
+class Sinks:
+    """
+    The registered sinks. The tuple is replaced when a sink is added or removed,
+    so that events can be dispatched without taking a lock.
+    """
+
+    def __init__(self, sinks: collections.abc.Iterable[Sink]) -> None:
+        self.lock = threading.Lock()
+        self.sinks = tuple(sinks)
+
+    def add(self, sink: Sink) -> None:
+        with self.lock:
+            self.sinks = (*self.sinks, sink)
+
+    def remove(self, sink: Sink) -> None:
+        with self.lock:
+            self.sinks = tuple(item for item in self.sinks if item is not sink)
+
+
+_TASK_IDS = itertools.count()
+_CALL_IDS = itertools.count(1)
+_CURRENT_SPAN: contextvars.ContextVar[Span | None] = contextvars.ContextVar("span", default=None)
+_SINKS = Sinks([ProgressSink(), ProfileSink(), LoggingSink()])
+
+
+def add_sink(sink: Sink) -> None:
+    """
+    Send the events and the tasks to `sink`, in addition to the progress bar, the profile and the log.
+    """
+    _SINKS.add(sink)
+
+
+def remove_sink(sink: Sink) -> None:
+    _SINKS.remove(sink)
+
+
+def get_sinks() -> tuple[Sink, ...]:
+    return _SINKS.sinks
+
+
+@contextlib.contextmanager
+def collect_events() -> collections.abc.Iterator[MemorySink]:
+    """
+    Collect the events of the phases that end within the block, e.g.
+
+        with collect_events() as sink:
+            gebco_ds("ice")
+        [(event.phase, event.duration) for event in sink.events]
+    """
+    sink = MemorySink()
+    add_sink(sink)
+    try:
+        yield sink
+    finally:
+        remove_sink(sink)
+
+
+def notify(method: str, item: Event | Task) -> None:
+    for sink in _SINKS.sinks:
+        if (callback := getattr(sink, method, None)) is None:
+            continue
+        try:
+            callback(item)
+        except Exception:
+            logger.exception("Sink %r failed", sink)
+
+
+@contextlib.contextmanager
+def phase(name: str, resource: str | None = None, **attributes: T.Any) -> collections.abc.Iterator[Span]:
+    """
+    Time the block as the phase `name` and emit its event when the block ends.
+
+    Phases that start while another phase is running on the same thread (or coroutine) are nested in it.
+    """
+    parent = _CURRENT_SPAN.get()
+    if parent is None:
+        span = Span(phase=name, resource=resource, call_id=next(_CALL_IDS), depth=0, attributes=attributes)
+    else:
+        span = Span(
+            phase=name,
+            resource=resource if resource is not None else parent.resource,
+            call_id=parent.call_id,
+            depth=parent.depth + 1,
+            attributes=attributes,
+        )
+    token = _CURRENT_SPAN.set(span)
+    started_at = time.time()
+    start = time.perf_counter()
+    error: str | None = None
+    try:
+        yield span
+    except BaseException as exc:
+        error = type(exc).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _CURRENT_SPAN.reset(token)
+        event = Event(
+            phase=span.phase,
+            resource=span.resource,
+            duration=duration,
+            started_at=started_at,
+            nbytes=span.nbytes,
+            cache_hit=span.cache_hit,
+            error=error,
+            call_id=span.call_id,
+            depth=span.depth,
+            attributes=span.attributes,
+        )
+        notify("emit", event)
+
+
+def annotate(*, nbytes: int | None = None, cache_hit: bool | None = None, **attributes: T.Any) -> None:
+    """
+    Record the outcome of the current phase from code that doesn't own it. Does nothing outside of phases.
+    """
+    if (span := _CURRENT_SPAN.get()) is None:
+        return
+    if nbytes is not None:
+        span.nbytes = nbytes
+    if cache_hit is not None:
+        span.cache_hit = cache_hit
+    span.attributes.update(attributes)
+
+
+def traced(func: collections.abc.Callable[P, R]) -> collections.abc.Callable[P, R]:
+    """
+    Run every call of `func` (a function or a coroutine function) in a phase that is named after it.
+    """
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args: T.Any, **kwargs: T.Any) -> T.Any:
+            with phase(func.__name__):
+                return await T.cast(collections.abc.Awaitable[T.Any], func(*args, **kwargs))
+
+        return T.cast(collections.abc.Callable[P, R], async_wrapper)
+
+    @functools.wraps(func)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        with phase(func.__name__):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def progress_task(
+    description: str,
+    total: int | None = None,
+    completed: int = 0,
+) -> collections.abc.Iterator[Task]:
+    """
+    Report the progress of a transfer to the sinks, e.g. to the progress bar.
+    """
+    task = Task(description, total=total, completed=completed)
+    notify("start_task", task)
+    try:
+        yield task
+    finally:
+        notify("stop_task", task)
+
+
+def run_in_context(
+    executor: concurrent.futures.Executor,
+    func: collections.abc.Callable[..., R],
+    *args: T.Any,
+    **kwargs: T.Any,
+) -> concurrent.futures.Future[R]:
+    """
+    Submit `func` to `executor`, so that the phases it runs are nested in the current phase.
+    """
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import collections.abc
+import contextlib
+import json
+import logging
+import os
+import pathlib
+import socket
+import threading
+import time
+import typing as T
+import uuid
+
+from . import _instrument as instrument
+
+logger = logging.getLogger(__name__)
+
+# Constants
+MAX_POLL_INTERVAL = 5.0
+
+
+class LockTimeoutError(TimeoutError):
+    """
+    Raised when a lock can't be acquired within the configured timeout.
+    """
+
+
+def get_lock_path(path: os.PathLike[str] | str) -> pathlib.Path:
+    return pathlib.Path(f"{os.fspath(path)}.lock")
+
+
+def get_lock_stale_after(stale_after: float | None = None) -> float:
+    if stale_after is None:
+        stale_after = float(os.environ.get("SEAREPORT_DATA_LOCK_STALE_AFTER", "120"))
+    return stale_after
+
+
+def get_lock_timeout(timeout: float | None = None) -> float | None:
+    if timeout is None and (value := os.environ.get("SEAREPORT_DATA_LOCK_TIMEOUT")):
+        timeout = float(value)
+    return timeout
+
+
+def pid_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_owner(lock_path: pathlib.Path) -> dict[str, T.Any] | None:
+    try:
+        owner: dict[str, T.Any] = json.loads(lock_path.read_text())
+    except (OSError, ValueError):
+        # Missing, or created but not written yet
+        return None
+    return owner
+
+
+def get_token(owner: dict[str, T.Any] | None) -> str | None:
+    # Locks that were created but not written yet have no owner
+    return None if owner is None else owner.get("token")
+
+
+class FileLock:
+    """
+    An exclusive lock on `path` that works across threads, processes and hosts.
+
+    The lock is a `<path>.lock` file that is created with `O_CREAT | O_EXCL`, which is atomic
+    on local filesystems as well as on network filesystems like NFS and Lustre.
+
+    While the lock is held, a background thread refreshes the modification time of the lock file
+    every `stale_after / 4` seconds. A waiter considers the lock stale (e.g. because its holder was killed)
+    if its modification time does not change for `stale_after` seconds, as measured by the waiter's own clock,
+    so that clock differences between hosts don't matter. Locks held by dead processes of the same host
+    are considered stale immediately. Stale locks are broken.
+    """
+
+    def __init__(
+        self,
+        path: os.PathLike[str] | str,
+        *,
+        stale_after: float | None = None,
+        timeout: float | None = None,
+        poll_interval: float = 0.2,
+    ) -> None:
+        self.path = get_lock_path(path)
+        self.stale_after = get_lock_stale_after(stale_after)
+        self.timeout = get_lock_timeout(timeout)
+        self.poll_interval = poll_interval
+        self.hostname = socket.gethostname()
+        self.owner = {
+            "token": uuid.uuid4().hex,
+            "host": self.hostname,
+            "pid": os.getpid(),
+        }
+        self.stopped = threading.Event()
+        self.heartbeat: threading.Thread | None = None
+        # The modification time of the lock we are waiting for and when we noticed it
+        self.observed: tuple[int, float] | None = None
+        self.is_waiting = False
+
+    def create(self) -> bool:
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            json.dump({**self.owner, "created_at": time.time()}, f)
+        return True
+
+    def is_stale(self, owner: dict[str, T.Any] | None, mtime_ns: int) -> bool:
+        if owner is not None and owner.get("host") == self.hostname and not pid_exists(owner["pid"]):
+            return True
+        now = time.monotonic()
+        if self.observed is None or self.observed[0] != mtime_ns:
+            self.observed = (mtime_ns, now)
+            return False
+        return now - self.observed[1] > self.stale_after
+
+    def break_stale(self) -> None:
+        try:
+            mtime_ns = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        owner = read_owner(self.path)
+        if not self.is_stale(owner, mtime_ns):
+            if not self.is_waiting:
+                logger.info("Waiting for %s, which is held by: %s", self.path, owner)
+                self.is_waiting = True
+            return
+        token = get_token(owner)
+        # Another waiter may have broken the lock already, and a new holder may have created it again
+        if get_token(read_owner(self.path)) != token:
+            return
+        logger.warning("Breaking stale lock %s, which was held by: %s", self.path, owner)
+        # Renaming is atomic, so only one of the waiters breaks the lock
+        stale_path = self.path.with_name(f"{self.path.name}.{uuid.uuid4().hex}.stale")
+        try:
+            os.rename(self.path, stale_path)
+        except FileNotFoundError:
+            return
+        if get_token(read_owner(stale_path)) != token:
+            # The lock was replaced by a new holder after we checked it: put it back and retry later.
+            # If yet another lock was created meanwhile, the new holder notices that it lost its lock.
+            try:
+                os.link(stale_path, self.path)
+            except OSError:
+                logger.warning(
+                    "Failed to restore the lock %s, which was moved to: %s",
+                    self.path,
+                    stale_path,
+                )
+                return
+        with contextlib.suppress(OSError):
+            stale_path.unlink()
+        self.observed = None
+
+    def poll(self) -> bool:
+        """
+        Try to acquire the lock once, breaking it if it is stale. Return whether the lock was acquired.
+        """
+        if not self.create():
+            self.break_stale()
+            return False
+        self.stopped.clear()
+        self.heartbeat = threading.Thread(
+            target=self.refresh,
+            name=f"heartbeat-{self.path.name}",
+            daemon=True,
+        )
+        self.heartbeat.start()
+        logger.debug("Acquired lock: %s", self.path)
+        return True
+
+    def iter_waits(self) -> collections.abc.Iterator[float]:
+        """
+        Yield the intervals to wait between polls. Raise `LockTimeoutError` when the timeout expires.
+        """
+        start = time.monotonic()
+        interval = self.poll_interval
+        while True:
+            if self.timeout is not None and time.monotonic() - start > self.timeout:
+                raise LockTimeoutError(f"Timed out after {self.timeout}s waiting for: {self.path}")
+            yield interval
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+    def refresh(self) -> None:
+        while not self.stopped.wait(self.stale_after / 4):
+            if not self.holds():
+                logger.warning("Lost lock: %s", self.path)
+                return
+            with contextlib.suppress(OSError):
+                os.utime(self.path)
+
+    def holds(self) -> bool:
+        owner = read_owner(self.path)
+        return owner is not None and owner.get("token") == self.owner["token"]
+
+    def acquire(self) -> None:
+        with instrument.phase("lock") as span:
+            for waits, interval in enumerate(self.iter_waits()):
+                if self.poll():
+                    # i.e. whether another thread or process was holding the lock
+                    span.attributes["contended"] = waits > 0
+                    return
+                time.sleep(interval)
+
+    def release(self) -> None:
+        if self.heartbeat is None:
+            return
+        self.stopped.set()
+        self.heartbeat.join()
+        self.heartbeat = None
+        if self.holds():
+            with contextlib.suppress(FileNotFoundError):
+                self.path.unlink()
+        logger.debug("Released lock: %s", self.path)
+
+    def __enter__(self) -> FileLock:
+        self.acquire()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.release()
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import copyreg
+import dataclasses
+import logging
+import os
+import pathlib
+import threading
+import typing as T
+
+from . import _hdf5 as hdf5
+from ._subset import BBox
+from ._subset import get_coordinate
+from ._subset import LAT_NAMES
+from ._subset import LON_NAMES
+
+if T.TYPE_CHECKING:
+    import numpy as np
+    import xarray as xr
+
+logger = logging.getLogger(__name__)
+
+# Types
+Array: T.TypeAlias = "np.ndarray[T.Any, T.Any]"
+
+# Constants
+# The cells of the tiles of a mosaic must be within this fraction of a cell of the cells of the mosaic
+ALIGNMENT_TOLERANCE = 0.01
+
+
+@dataclasses.dataclass(frozen=True)
+class TileGrid:
+    """
+    The grid of a tile: the center of its first cell, the size of its cells (negative along descending axes),
+    its shape (i.e. `(n_lat, n_lon)`) and the names of the variables on the grid.
+    """
+
+    lon: float
+    lat: float
+    lon_step: float
+    lat_step: float
+    shape: tuple[int, int]
+    variables: tuple[str, ...]
+
+    @property
+    def extent(self) -> BBox:
+        lons = (self.lon, self.lon + self.lon_step * (self.shape[1] - 1))
+        lats = (self.lat, self.lat + self.lat_step * (self.shape[0] - 1))
+        lon_half, lat_half = abs(self.lon_step) / 2, abs(self.lat_step) / 2
+        return (min(lons) - lon_half, min(lats) - lat_half, max(lons) + lon_half, max(lats) + lat_half)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, T.Any]) -> TileGrid:
+        return cls(**{**data, "shape": tuple(data["shape"]), "variables": tuple(data["variables"])})
+
+
+def get_step(values: Array) -> float:
+    return float(values[-1] - values[0]) / (values.size - 1) if values.size > 1 else 0.0
+
+
+def get_grid_variable(ds: xr.Dataset, name: str) -> xr.DataArray:
+    """
+    Return the variable `name` of `ds` with its latitudes and longitudes as rows and columns.
+    """
+    lat_dim = ds[get_coordinate(ds, LAT_NAMES)].dims[0]
+    lon_dim = ds[get_coordinate(ds, LON_NAMES)].dims[0]
+    var: xr.DataArray = ds[name].transpose(lat_dim, lon_dim)
+    return var
+
+
+def read_grid(path: os.PathLike[str] | str) -> TileGrid:
+    """
+    Return the grid of the NetCDF file at `path`, which only reads its coordinates.
+    """
+    import xarray as xr
+
+    with xr.open_dataset(path) as ds:
+        lon_name, lat_name = get_coordinate(ds, LON_NAMES), get_coordinate(ds, LAT_NAMES)
+        lon, lat = ds[lon_name].values, ds[lat_name].values
+        dims = {ds[lat_name].dims[0], ds[lon_name].dims[0]}
+        variables = tuple(str(name) for name, var in ds.data_vars.items() if set(var.dims) == dims)
+    return TileGrid(
+        lon=float(lon[0]),
+        lat=float(lat[0]),
+        lon_step=get_step(lon),
+        lat_step=get_step(lat),
+        shape=(lat.size, lon.size),
+        variables=variables,
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class Tile:
+    """
+    A tile of a mosaic: `row` and `col` are the cells of the mosaic of its southern and western cells.
+    """
+
+    path: pathlib.Path
+    grid: TileGrid
+    row: int
+    col: int
+
+    @property
+    def ascending(self) -> tuple[slice, slice]:
+        """
+        The index that makes the rows and the columns of the tile ascending, like the ones of the mosaic.
+        """
+        rows = slice(None, None, -1 if self.grid.lat_step < 0 else 1)
+        cols = slice(None, None, -1 if self.grid.lon_step < 0 else 1)
+        return rows, cols
+
+    def get_window(self, rows: slice, cols: slice) -> tuple[slice, slice, slice, slice] | None:
+        """
+        Return the rows and the columns of the tile that are in the cells `rows` and `cols` of the mosaic,
+        and their position among the latter, or None if the tile doesn't overlap them.
+        """
+        row_overlap = get_overlap(rows, self.row, self.grid.shape[0], descending=self.grid.lat_step < 0)
+        col_overlap = get_overlap(cols, self.col, self.grid.shape[1], descending=self.grid.lon_step < 0)
+        if row_overlap is None or col_overlap is None:
+            return None
+        return row_overlap[0], col_overlap[0], row_overlap[1], col_overlap[1]
+
+
+def get_overlap(cells: slice, first: int, size: int, *, descending: bool) -> tuple[slice, slice] | None:
+    """
+    Return the cells of a tile (whose first cell is the cell `first` of the mosaic) that are in the `cells`
+    of the mosaic, and their position among the latter. The cells of descending tiles are reversed.
+    """
+    lo, hi = max(cells.start, first), min(cells.stop, first + size)
+    if lo >= hi:
+        return None
+    target = slice(lo - cells.start, hi - cells.start)
+    if descending:
+        return slice(first + size - hi, first + size - lo), target
+    return slice(lo - first, hi - first), target
+
+
+class Mosaic:
+    """
+    The tiles of a mosaic, in the order of their priority. The tiles are opened on first read.
+    """
+
+    def __init__(self, tiles: list[Tile], kwargs: dict[str, T.Any]) -> None:
+        self.tiles = tiles
+        self.kwargs = kwargs
+        self.datasets: dict[pathlib.Path, xr.Dataset] = {}
+        # The chunks are read by the threads of dask, which must not open a tile twice
+        self.lock = threading.Lock()
+
+    def open(self, tile: Tile) -> xr.Dataset:
+        with self.lock:
+            if (ds := self.datasets.get(tile.path)) is None:
+                ds = self.datasets[tile.path] = hdf5.open_dataset(tile.path, dict(self.kwargs))
+        return ds
+
+    def close(self) -> None:
+        with self.lock:
+            for ds in self.datasets.values():
+                ds.close()
+            self.datasets.clear()
+
+    def read(self, name: str, rows: slice, cols: slice, dtype: np.dtype[T.Any]) -> Array:
+        """
+        Return the cells `rows` and `cols` of the variable `name` of the mosaic, reading only the tiles they overlap.
+
+        Cells that are missing in every tile (or that are outside every tile) are NaN.
+        Where tiles overlap, the first tile that has a value wins.
+        """
+        import numpy as np
+
+        values = np.full((rows.stop - rows.start, cols.stop - cols.start), np.nan, dtype=dtype)
+        for tile in self.tiles:
+            if name not in tile.grid.variables or (window := tile.get_window(rows, cols)) is None:
+                continue
+            tile_rows, tile_cols, target_rows, target_cols = window
+            var = get_grid_variable(self.open(tile), name)
+            tile_values = var[tile_rows, tile_cols].values
+            tile_values = tile_values[tile.ascending]
+            target = values[target_rows, target_cols]
+            np.copyto(target, tile_values, where=np.isnan(target), casting="unsafe")
+        return values
+
+
+# The tiles are reopened by the processes that unpickle a mosaic (e.g. the workers of dask.distributed)
+def reduce_mosaic(mosaic: Mosaic) -> tuple[T.Any, ...]:
+    return (Mosaic, (mosaic.tiles, mosaic.kwargs))
+
+
+copyreg.pickle(Mosaic, reduce_mosaic)
+
+
+class MosaicArray:
+    """
+    A variable of a mosaic, which dask reads chunk by chunk (see `dask.array.from_array()`).
+    """
+
+    def __init__(self, mosaic: Mosaic, name: str, shape: tuple[int, int], dtype: np.dtype[T.Any]) -> None:
+        self.mosaic = mosaic
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+        self.ndim = len(shape)
+
+    def __getitem__(self, key: tuple[slice | int, ...]) -> Array:
+        # Dask reads whole chunks, i.e. slices without steps, but other keys work as they do with numpy
+        bounds: list[slice] = []
+        index: list[slice | int] = []
+        for size, item in zip(self.shape, key, strict=True):
+            cells = range(size)[item]
+            if isinstance(cells, int):
+                bounds.append(slice(cells, cells + 1))
+                index.append(0)
+            elif not cells:
+                bounds.append(slice(0, 0))
+                index.append(slice(None))
+            else:
+                lo = min(cells[0], cells[-1])
+                bounds.append(slice(lo, max(cells[0], cells[-1]) + 1))
+                index.append(slice(cells[0] - lo, None, cells.step))
+        values = self.mosaic.read(self.name, bounds[0], bounds[1], self.dtype)
+        subset: Array = values[tuple(index)]
+        return subset
+
+
+def place_tiles(paths: list[pathlib.Path], grids: list[TileGrid]) -> tuple[list[Tile], Array, Array]:
+    """
+    Return the tiles on the grid of the mosaic, and the latitudes and the longitudes of the mosaic.
+
+    The mosaic has the cells of the first tile, and its latitudes and longitudes are ascending.
+    """
+    import numpy as np
+
+    lat_step, lon_step = abs(grids[0].lat_step), abs(grids[0].lon_step)
+    south = min(grid.extent[1] for grid in grids) + lat_step / 2
+    west = min(grid.extent[0] for grid in grids) + lon_step / 2
+    tiles: list[Tile] = []
+    for path, grid in zip(paths, grids, strict=True):
+        row = (grid.extent[1] + lat_step / 2 - south) / lat_step
+        col = (grid.extent[0] + lon_step / 2 - west) / lon_step
+        # The steps of the tiles may only differ by a fraction of a cell over their whole width
+        steps = (abs(grid.lat_step) or lat_step, abs(grid.lon_step) or lon_step)
+        tolerance = ALIGNMENT_TOLERANCE / max(grid.shape)
+        is_aligned = np.allclose((row, col), (round(row), round(col)), rtol=0, atol=ALIGNMENT_TOLERANCE)
+        if not is_aligned or not np.allclose(steps, (lat_step, lon_step), rtol=tolerance):
+            raise ValueError(f"Can't mosaic: {path} is not on the grid of {paths[0]}")
+        tiles.append(Tile(path=path, grid=grid, row=round(row), col=round(col)))
+    n_rows = max(tile.row + tile.grid.shape[0] for tile in tiles)
+    n_cols = max(tile.col + tile.grid.shape[1] for tile in tiles)
+    return tiles, south + lat_step * np.arange(n_rows), west + lon_step * np.arange(n_cols)
+
+
+def open_mosaic(paths: list[pathlib.Path], grids: list[TileGrid], kwargs: dict[str, T.Any]) -> xr.Dataset:
+    """
+    Return a lazy mosaic of the tiles at `paths`, which is backed by dask.
+
+    Opening the mosaic only opens the first tile, for its metadata. Computing a chunk of the mosaic only reads
+    the tiles it overlaps, so memory is proportional to the chunks that are computed, not to the number of tiles.
+    Where tiles overlap, the first tile (in the order of `paths`) that has a value wins. Cells outside every
+    tile are NaN, so integer variables are floats. `kwargs` are passed to `xr.open_dataset()` for the tiles,
+    but `chunks`, which are the chunks of the mosaic. `chunks="native"` (the default) gives chunks that are
+    whole multiples of the chunks of the first tile.
+    """
+    import dask.array as da
+    import numpy as np
+    import xarray as xr
+    from dask.base import tokenize
+
+    kwargs = dict(kwargs)
+    chunks = kwargs.pop("chunks", None) or "native"
+    tiles, lat, lon = place_tiles(paths, grids)
+    mosaic = Mosaic(tiles, kwargs)
+    first = mosaic.open(tiles[0])
+    lat_name, lon_name = get_coordinate(first, LAT_NAMES), get_coordinate(first, LON_NAMES)
+    dims = (first[lat_name].dims[0], first[lon_name].dims[0])
+    if isinstance(chunks, str) and chunks == "native":
+        chunks = hdf5.get_native_chunks(hdf5.read_chunk_layout(tiles[0].path)) or "auto"
+    if isinstance(chunks, dict):
+        chunks = tuple(chunks.get(dim, "auto") for dim in dims)
+    token = tokenize([(os.fspath(tile.path), tile.grid) for tile in tiles])
+    variables: dict[str, xr.DataArray] = {}
+    for name in tiles[0].grid.variables:
+        var = get_grid_variable(first, name)
+        dtype = np.result_type(var.dtype, np.float32)
+        array = MosaicArray(mosaic, name, (len(lat), len(lon)), dtype)
+        data = da.from_array(  # type: ignore[no-untyped-call]
+            array,
+            chunks=chunks,
+            name=f"mosaic-{name}-{token}",
+            meta=np.empty((0, 0), dtype=dtype),
+            fancy=False,
+            lock=False,
+        )
+        variables[name] = xr.DataArray(data, dims=dims, attrs=var.attrs)
+    coords = {
+        lat_name: xr.Variable(dims[0], lat, first[lat_name].attrs),
+        lon_name: xr.Variable(dims[1], lon, first[lon_name].attrs),
+    }
+    ds = xr.Dataset(variables, coords=coords, attrs=first.attrs)
+    ds.set_close(mosaic.close)
+    logger.debug("Opened a mosaic of %d tiles: %s", len(tiles), dict(ds.sizes))
+    return ds
@@ -6,11 +6,13 @@ import os
 import pathlib
 import typing as ty
 
-import geopandas as gpd
-import pyogrio
-
 from . import _core as core
+from . import _instrument as instrument
 from ._enforce_literals import enforce_literals
+from ._fetch import fetch
+
+if ty.TYPE_CHECKING:
+    import geopandas as gpd
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +31,9 @@ def read_file(
     layer: str | None = None,
     **kwargs: ty.Any,
 ) -> gpd.GeoDataFrame:
+    import geopandas as gpd
+    import pyogrio
+
     info = pyogrio.read_info(filename, layer=layer, **kwargs)
     gdf = ty.cast(gpd.GeoDataFrame, gpd.read_file(filename, engine="pyogrio", layer=layer, **kwargs))
     if layer_metadata := info["layer_metadata"]:
@@ -42,6 +47,23 @@ def get_osm_filename(dataset: OSMDataset) -> str:
     return filename
 
 
+def get_osm_resource(registry: core.Registry, dataset: OSMDataset, version: OSMVersion) -> core.Resource:
+    record = registry[OSM][str(version)][dataset]
+    logger.debug("Record: %s", record)
+    filename = str(record["filename"])
+    return core.Resource(
+        dataset=OSM,
+        version=version,
+        name=dataset,
+        url=str(record["url"]),
+        path=f"{OSM}/{version}/{filename}",
+        hash=str(record["hash"]),
+        compression="zstd",
+        archive=str(record["archive"]),
+        **core.get_upstream_validators(record),
+    )
+
+
 @ty.overload
 def osm(
     dataset: OSMDataset = "land",
@@ -62,6 +84,7 @@ def osm(
     registry_url: str | None = None,
     as_paths: ty.Literal[True],
 ) -> list[pathlib.Path]: ...
+@instrument.traced
 def osm(
     dataset: OSMDataset = "land",
     version: OSMVersion = OSM_LATEST_VERSION,
@@ -73,26 +96,15 @@ def osm(
 ) -> list[str] | list[pathlib.Path]:
     enforce_literals(osm)
     registry = core.load_registry(registry_url=registry_url)
-    record = registry[OSM][str(version)][dataset]
-    logger.debug("Record: %s", record)
-    cache_dir = core.get_cache_path() / OSM / version
-    filename = str(record["filename"])
-    path = cache_dir / filename
-    if download and not path.exists():
-        cache_dir.mkdir(parents=True, exist_ok=True)
-        archive_path = cache_dir / record["archive"]
-        url = str(record["url"])
-        core.download(url, archive_path)
-        core.extract_zstd(archive_path, path)
-        core.lenient_remove(archive_path)
-    if check_hash:
-        core.check_hash(path, str(record["hash"]))
+    resource = get_osm_resource(registry, dataset=dataset, version=version)
+    path = fetch(resource, download=download, check_hash=check_hash)
     if as_paths:
         return [pathlib.Path(path)]
     else:
         return [str(path)]
 
 
+@instrument.traced
 def osm_df(
     dataset: OSMDataset = "land",
     version: OSMVersion = OSM_LATEST_VERSION,
@@ -109,5 +121,6 @@ def osm_df(
         check_hash=check_hash,
         registry_url=registry_url,
     )[0]
-    gdf: gpd.GeoDataFrame = read_file(path, **kwargs)
+    with instrument.phase("open"):
+        gdf: gpd.GeoDataFrame = read_file(path, **kwargs)
     return gdf
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import collections.abc
+import functools
+import itertools
+import logging
+import os
+import pathlib
+import typing as T
+
+from . import _core as core
+from ._subset import get_coordinate
+from ._subset import LAT_NAMES
+from ._subset import LON_NAMES
+from ._zarr import BLOCK_CHUNKS
+from ._zarr import Format
+from ._zarr import get_or_create_store
+from ._zarr import get_transcode_chunks
+from ._zarr import open_zarr
+from ._zarr import transcode
+from ._zarr import write_store
+from ._zarr import ZARR_CHUNK
+from ._zarr import ZARR_SUFFIX
+
+if T.TYPE_CHECKING:
+    import numpy as np
+    import xarray as xr
+
+logger = logging.getLogger(__name__)
+
+# Types
+Array: T.TypeAlias = "np.ndarray[T.Any, T.Any]"
+
+# Constants
+# Each level has blocks of 2 by 2 cells of the level below
+FACTOR = 2
+# The suffixes of the variables that hold the minima and maxima of the blocks; the means keep their name
+STATISTICS = ("min", "max")
+# The suffix of the variables that hold the number of cells of the file with a value in each block
+COUNT = "count"
+
+
+def get_overview_path(resource: core.Resource, level: int) -> str:
+    """
+    Return the path of the overview of `resource` at `level`, relative to the cache directory.
+
+    Like the Zarr stores of the files, overviews are keyed by the hash of the file.
+    """
+    return f"{resource.path}.{resource.hash}.overview{level}{ZARR_SUFFIX}"
+
+
+def get_corners(block: Array, axes: tuple[int, ...]) -> list[Array]:
+    """
+    Return the cells of the blocks of `block` as strided views, e.g. the 4 corners of the blocks of 2 by 2 cells.
+    """
+    corners: list[Array] = []
+    for offsets in itertools.product(range(FACTOR), repeat=len(axes)):
+        index = [slice(None)] * block.ndim
+        for axis, offset in zip(axes, offsets, strict=True):
+            index[axis] = slice(offset, None, FACTOR)
+        corners.append(block[tuple(index)])
+    return corners
+
+
+# The reductions operate on the corners of the blocks, which is much faster than reducing reshaped
+# blocks along their strided axes
+def block_mean(block: Array, axes: tuple[int, ...]) -> Array:
+    import numpy as np
+
+    corners = get_corners(block, axes)
+    total = corners[0].astype(np.float32)
+    if not np.issubdtype(block.dtype, np.floating):
+        for corner in corners[1:]:
+            total += corner
+        mean: Array = total / len(corners)
+        return mean
+    # Missing values (e.g. masked cells) are skipped, like xarray does, and blocks without values are missing
+    count = np.zeros(total.shape, dtype=np.uint8)
+    total[:] = 0
+    for corner in corners:
+        valid = ~np.isnan(corner)
+        total += np.where(valid, corner, 0)
+        count += valid
+    with np.errstate(invalid="ignore"):
+        mean = total / count
+    return mean
+
+
+def block_min(block: Array, axes: tuple[int, ...]) -> Array:
+    import numpy as np
+
+    # Unlike `np.nanmin()`, `fmin` skips missing values without warning about blocks without values
+    minimum: Array = functools.reduce(np.fmin, get_corners(block, axes)).astype(np.float32)
+    return minimum
+
+
+def block_max(block: Array, axes: tuple[int, ...]) -> Array:
+    import numpy as np
+
+    maximum: Array = functools.reduce(np.fmax, get_corners(block, axes)).astype(np.float32)
+    return maximum
+
+
+def block_count(block: Array, axes: tuple[int, ...]) -> Array:
+    import numpy as np
+
+    corners = get_corners(block, axes)
+    count = np.zeros(corners[0].shape, dtype=np.float32)
+    for corner in corners:
+        count += ~np.isnan(corner)
+    return count
+
+
+def block_sum(block: Array, axes: tuple[int, ...]) -> Array:
+    import numpy as np
+
+    total: Array = functools.reduce(np.add, (np.nan_to_num(corner) for corner in get_corners(block, axes)))
+    return total.astype(np.float32)
+
+
+def block_weighted_mean(block: Array, counts: Array, axes: tuple[int, ...]) -> Array:
+    """
+    Return the mean of the means of the blocks of `block`, weighted by their `counts`.
+
+    The mean of means is only the mean of the cells below them if every block is full, which isn't the case
+    at the edges of masks (e.g. land) and of grids with an odd size.
+    """
+    import numpy as np
+
+    corners = get_corners(block, axes)
+    total = np.zeros(corners[0].shape, dtype=np.float64)
+    weight = np.zeros(total.shape, dtype=np.float64)
+    for corner, count in zip(corners, get_corners(counts, axes), strict=True):
+        # The blocks without values have no weight; padding has a NaN count
+        valid = count > 0
+        total += np.where(valid, corner * count, 0)
+        weight += np.where(valid, count, 0)
+    with np.errstate(invalid="ignore"):
+        mean: Array = (total / weight).astype(np.float32)
+    return mean
+
+
+REDUCTIONS = {"mean": block_mean, "min": block_min, "max": block_max, COUNT: block_count, "sum": block_sum}
+
+
+def get_blocks(var: xr.DataArray, axes: tuple[int, ...]) -> T.Any:
+    """
+    Return the data of `var` as a dask array whose chunks are made of whole blocks along `axes`.
+    """
+    import dask.array as da
+    import numpy as np
+
+    data = var.chunk().data
+    # The last row (or column) of grids with an odd size is padded with missing values, like `coarsen(boundary="pad")`
+    padding = [(0, size % FACTOR if axis in axes else 0) for axis, size in enumerate(var.shape)]
+    if any(after for _, after in padding):
+        data = da.pad(data.astype(np.float32), padding, mode="constant", constant_values=np.nan)
+    if any(size % FACTOR for axis in axes for size in data.chunks[axis]):
+        data = data.rechunk(dict.fromkeys(axes, BLOCK_CHUNKS * ZARR_CHUNK))
+    return data
+
+
+def reduce_blocks(
+    var: xr.DataArray,
+    windows: collections.abc.Collection[collections.abc.Hashable],
+    statistic: str,
+    *,
+    counts: xr.DataArray | None = None,
+) -> xr.DataArray:
+    """
+    Return the `statistic` (`mean`, `min`, `max`, `count` or `sum`) of the blocks of `var` along `windows` as float32,
+    chunk by chunk.
+
+    If `counts` is not None, `var` holds means of `counts` cells, and the means are weighted by them.
+    """
+    import numpy as np
+    import xarray as xr
+
+    axes = tuple(var.get_axis_num(dim) for dim in windows)
+    data = get_blocks(var, axes)
+    chunks = tuple(
+        tuple(size // FACTOR for size in sizes) if axis in axes else sizes
+        for axis, sizes in enumerate(data.chunks)
+    )
+    if counts is None:
+        reduced = data.map_blocks(REDUCTIONS[statistic], axes=axes, chunks=chunks, dtype=np.float32)
+    else:
+        weights = get_blocks(counts, axes).rechunk(data.chunks)
+        reduced = data.map_blocks(block_weighted_mean, weights, axes=axes, chunks=chunks, dtype=np.float32)
+    coords = {}
+    for name, coord in var.coords.items():
+        if coord_windows := {dim: FACTOR for dim in coord.dims if dim in windows}:
+            coords[name] = coord.coarsen(coord_windows, boundary="pad").mean()
+    return xr.DataArray(reduced, dims=var.dims, coords={**var.coords, **coords}, attrs=var.attrs)
+
+
+def coarsen(ds: xr.Dataset, *, is_overview: bool) -> xr.Dataset:
+    """
+    Return the mean, the minimum and the maximum of the blocks of 2 by 2 cells of the grids of `ds`.
+
+    The means keep the name of their variable, while the minima and maxima are `<name>_min` and `<name>_max`,
+    and `<name>_count` is the number of cells with a value in each block. An overview (`is_overview`) is reduced
+    to the next level, i.e. to the mean of its means weighted by their counts, the minimum of its minima,
+    the maximum of its maxima and the sum of its counts, so that each level matches
+    `coarsen(2**level, boundary="pad")` of the file. The coordinates are the centers of the blocks. The blocks
+    at the edges of grids with an odd size are partial. Variables that are not on the grid (e.g. `crs`) are kept
+    as they are.
+    """
+    import xarray as xr
+
+    names = (get_coordinate(ds, LAT_NAMES), get_coordinate(ds, LON_NAMES))
+    windows = [ds[name].dims[0] for name in names]
+    suffixes = tuple(f"_{statistic}" for statistic in (*STATISTICS, COUNT))
+    variables: dict[str, xr.DataArray] = {}
+    for key, var in ds.data_vars.items():
+        name = str(key)
+        if not set(windows) <= set(var.dims):
+            variables[name] = var
+            continue
+        if is_overview and name.endswith(suffixes):
+            continue
+        if is_overview:
+            counts = ds[f"{name}_{COUNT}"]
+            variables[name] = reduce_blocks(var, windows, "mean", counts=counts)
+            variables[f"{name}_{COUNT}"] = reduce_blocks(counts, windows, "sum")
+        else:
+            variables[name] = reduce_blocks(var, windows, "mean")
+            variables[f"{name}_{COUNT}"] = reduce_blocks(var, windows, COUNT)
+        for statistic in STATISTICS:
+            source = ds[f"{name}_{statistic}"] if is_overview else var
+            variables[f"{name}_{statistic}"] = reduce_blocks(source, windows, statistic)
+    return xr.Dataset(variables, attrs=ds.attrs)
+
+
+def overview(
+    resource: core.Resource,
+    path: os.PathLike[str] | str,
+    level: int,
+    *,
+    engine: str | None = None,
+) -> pathlib.Path:
+    """
+    Return the path of the overview of `resource` at `level`, computing it (and the levels below it) on first use.
+
+    The cells of level `k` are `2**k` times as large as the cells of the file at `path`, e.g. level 3 of
+    a 15 arc second grid has 2 arc minute cells. Level 1 is computed from the file, which is read once,
+    and each of the next levels from the level below, which is much smaller.
+    """
+    if level < 1:
+        raise ValueError(f"The level of an overview must be positive, not: {level}")
+
+    def create(store_path: pathlib.Path) -> None:
+        import xarray as xr
+
+        if level == 1:
+            source_path: os.PathLike[str] | str = path
+            source = xr.open_dataset(path, engine=engine)
+        else:
+            source_path = overview(resource, path, level - 1, engine=engine)
+            source = open_zarr(source_path, {})
+        with source:
+            chunked = source.chunk(get_transcode_chunks(source_path, source, ZARR_CHUNK))
+            write_store(coarsen(chunked, is_overview=level > 1), store_path)
+        logger.info("Computed level %d of the overviews of %s", level, resource.key)
+
+    relative_path = get_overview_path(resource, level)
+    return get_or_create_store(relative_path, create, phase="overview", resource=resource, keep=[path])
+
+
+def get_store(
+    resource: core.Resource,
+    path: os.PathLike[str] | str,
+    *,
+    format: Format,
+    level: int,
+    engine: str | None = None,
+) -> pathlib.Path | None:
+    """
+    Return the Zarr store to read instead of the NetCDF file at `path`, if any.
+
+    Overviews (i.e. `level > 0`) are always Zarr stores.
+    """
+    if level:
+        return overview(resource, path, level, engine=engine)
+    if format == "zarr":
+        return transcode(resource, path, engine=engine)
+    return None
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import collections.abc
+import itertools
+import typing as ty
+
+from . import _core as core
+from ._emodnet import EMODnetVersion
+from ._emodnet import get_emodnet_resources
+from ._etopo import ETopoDataset
+from ._etopo import ETopoResolution
+from ._etopo import ETopoVersion
+from ._etopo import get_etopo_resource
+from ._gebco import GEBCODatasets
+from ._gebco import GEBCOVersion
+from ._gebco import get_gebco_resource
+from ._gshhg import CRUDE
+from ._gshhg import FULL
+from ._gshhg import get_gshhg_resource
+from ._gshhg import GSHHGResolution
+from ._gshhg import GSHHGShoreline
+from ._gshhg import GSHHGVersion
+from ._gshhg import HIGH
+from ._gshhg import INTERMEDIATE
+from ._gshhg import LOW
+from ._osm import get_osm_resource
+from ._osm import OSM
+from ._osm import OSMDataset
+from ._osm import OSMVersion
+from ._rtopo import get_rtopo_resource
+from ._rtopo import RTopoDataset
+from ._rtopo import RTopoVersion
+from ._srtm15p import get_srtm15p_resource
+from ._srtm15p import SRTM15PVersion
+
+
+def iter_resources(registry_url: str | None = None) -> collections.abc.Iterator[core.Resource]:
+    """
+    Yield all the resources of the registry that can be downloaded.
+
+    Copernicus is not included, since it is not downloaded from a URL.
+    """
+    registry = core.load_registry(registry_url=registry_url)
+    for gebco_version, gebco_dataset in itertools.product(
+        reversed(ty.get_args(GEBCOVersion)),
+        ty.get_args(GEBCODatasets),
+    ):
+        yield get_gebco_resource(registry, dataset=gebco_dataset, version=gebco_version)
+    for etopo_version, etopo_resolution, etopo_dataset in itertools.product(
+        ty.get_args(ETopoVersion),
+        ty.get_args(ETopoResolution),
+        ty.get_args(ETopoDataset),
+    ):
+        yield get_etopo_resource(
+            registry,
+            dataset=etopo_dataset,
+            resolution=etopo_resolution,
+            version=etopo_version,
+        )
+    for srtm15p_version in ty.get_args(SRTM15PVersion):
+        yield get_srtm15p_resource(registry, version=srtm15p_version)
+    for rtopo_version, rtopo_dataset in itertools.product(
+        ty.get_args(RTopoVersion),
+        ty.get_args(RTopoDataset),
+    ):
+        yield get_rtopo_resource(registry, dataset=rtopo_dataset, version=rtopo_version)
+    gshhg_resolutions: tuple[GSHHGResolution, ...] = (CRUDE, LOW, INTERMEDIATE, HIGH, FULL)
+    for gshhg_version, gshhg_resolution, gshhg_shoreline in itertools.product(
+        ty.get_args(GSHHGVersion),
+        gshhg_resolutions,
+        ty.get_args(GSHHGShoreline),
+    ):
+        yield get_gshhg_resource(
+            registry,
+            resolution=gshhg_resolution,
+            shoreline=gshhg_shoreline,
+            version=gshhg_version,
+        )
+    for osm_version, osm_dataset in itertools.product(
+        reversed(ty.get_args(OSMVersion)),
+        ty.get_args(OSMDataset),
+    ):
+        # Not all the datasets are available for all the versions
+        if osm_dataset in registry[OSM][osm_version]:
+            yield get_osm_resource(registry, dataset=osm_dataset, version=osm_version)
+    for emodnet_version in ty.get_args(EMODnetVersion):
+        yield from get_emodnet_resources(registry, version=emodnet_version)
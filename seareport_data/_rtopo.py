@@ -4,10 +4,19 @@ import logging
 import pathlib
 import typing as ty
 
-import xarray as xr
-
 from . import _core as core
+from . import _instrument as instrument
 from ._enforce_literals import enforce_literals
+from ._fetch import fetch
+from ._hdf5 import open_dataset
+from ._overview import get_store
+from ._subset import BBox
+from ._subset import subset_bbox
+from ._zarr import Format
+from ._zarr import open_zarr
+
+if ty.TYPE_CHECKING:
+    import xarray as xr
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +38,24 @@ def get_rtopo_filename(dataset: RTopoDataset, version: RTopoVersion) -> str:
     return filename
 
 
+def get_rtopo_resource(
+    registry: core.Registry,
+    dataset: RTopoDataset,
+    version: RTopoVersion,
+) -> core.Resource:
+    record = registry[RTOPO][version]
+    filename = get_rtopo_filename(dataset=dataset, version=version)
+    return core.Resource(
+        dataset=RTOPO,
+        version=version,
+        name=dataset,
+        url=record["base_url"] + filename,
+        path=f"{RTOPO}/{version}/{filename}",
+        hash=record["hashes"][filename],
+        **core.get_upstream_validators(record, filename),
+    )
+
+
 @ty.overload
 def rtopo(
     dataset: RTopoDataset,
@@ -49,6 +76,7 @@ def rtopo(
     registry_url: str | None = None,
     as_paths: ty.Literal[True],
 ) -> list[pathlib.Path]: ...
+@instrument.traced
 def rtopo(
     dataset: RTopoDataset,
     version: RTopoVersion = RTOPO_LATEST_VERSION,
@@ -60,22 +88,15 @@ def rtopo(
 ) -> list[str] | list[pathlib.Path]:
     enforce_literals(rtopo)
     registry = core.load_registry(registry_url=registry_url)
-    record = registry[RTOPO][version]
-    cache_dir = core.get_cache_path() / RTOPO / version
-    filename = get_rtopo_filename(dataset=dataset, version=version)
-    path = cache_dir / filename
-    if download and not path.exists():
-        cache_dir.mkdir(parents=True, exist_ok=True)
-        url = record["base_url"] + filename
-        core.download(url, path)
-    if check_hash:
-        core.check_hash(path, record["hashes"][filename])
+    resource = get_rtopo_resource(registry, dataset=dataset, version=version)
+    path = fetch(resource, download=download, check_hash=check_hash)
     if as_paths:
         return [pathlib.Path(path)]
     else:
         return [str(path)]
 
 
+@instrument.traced
 def rtopo_ds(
     dataset: RTopoDataset,
     version: RTopoVersion = RTOPO_LATEST_VERSION,
@@ -84,6 +105,10 @@ def rtopo_ds(
     check_hash: bool = True,
     registry_url: str | None = None,
     normalize: bool = True,
+    bbox: BBox | None = None,
+    buffer: float = 0.0,
+    format: Format = "netcdf",
+    level: int = 0,
     **kwargs: ty.Any,
 ) -> xr.Dataset:
     path = rtopo(
@@ -95,7 +120,11 @@ def rtopo_ds(
     )[0]
     if "engine" in kwargs and kwargs["engine"] == "h5netcdf":
         raise ValueError("RTopo is in netcdf classic format, which is not supported by `h5netcdf` engine.")
-    ds = xr.open_dataset(path, **kwargs)
+    registry = core.load_registry(registry_url=registry_url)
+    resource = get_rtopo_resource(registry, dataset=dataset, version=version)
+    store_path = get_store(resource, path, format=format, level=level, engine=kwargs.get("engine"))
+    with instrument.phase("open"):
+        ds = open_dataset(path, kwargs) if store_path is None else open_zarr(store_path, kwargs)
     if normalize:
         ds = ds.swap_dims({"londim": "lon", "latdim": "lat"})
         ds = ds.rename_vars({next(iter(ds.data_vars)): "z"})
@@ -119,4 +148,7 @@ def rtopo_ds(
             ds.z.attrs["title"] = f"RTopo {ds.z.attrs['title']}"
         else:
             ds.z.attrs["title"] = "RTopo - ice_thickness"
+    if bbox is not None:
+        with instrument.phase("subset"):
+            ds = subset_bbox(ds, bbox, buffer=buffer)
     return ds
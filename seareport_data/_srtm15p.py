@@ -4,10 +4,19 @@ import logging
 import pathlib
 import typing as ty
 
-import xarray as xr
-
 from . import _core as core
+from . import _instrument as instrument
 from ._enforce_literals import enforce_literals
+from ._fetch import fetch
+from ._hdf5 import open_dataset
+from ._overview import get_store
+from ._subset import BBox
+from ._subset import subset_bbox
+from ._zarr import Format
+from ._zarr import open_zarr
+
+if ty.TYPE_CHECKING:
+    import xarray as xr
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +36,19 @@ class SRTM15PRecord(ty.TypedDict):
     hash: str
 
 
+def get_srtm15p_resource(registry: core.Registry, version: SRTM15PVersion) -> core.Resource:
+    record = registry[SRTM15P][version]
+    return core.Resource(
+        dataset=SRTM15P,
+        version=version,
+        name="",
+        url=record["url"],
+        path=f"{SRTM15P}/{version}/{record['filename']}",
+        hash=record["hash"],
+        **core.get_upstream_validators(record),
+    )
+
+
 @ty.overload
 def srtm15p(
     version: SRTM15PVersion = SRTM15P_LATEST_VERSION,
@@ -45,6 +67,7 @@ def srtm15p(
     registry_url: str | None = None,
     as_paths: ty.Literal[True],
 ) -> list[pathlib.Path]: ...
+@instrument.traced
 def srtm15p(
     version: SRTM15PVersion = SRTM15P_LATEST_VERSION,
     *,
@@ -67,26 +90,25 @@ def srtm15p(
     """
     enforce_literals(srtm15p)
     registry = core.load_registry(registry_url=registry_url)
-    record = registry[SRTM15P][version]
-    cache_dir = core.get_cache_path() / SRTM15P / version
-    file_path = cache_dir / record["filename"]
-    if download and not file_path.exists():
-        cache_dir.mkdir(parents=True, exist_ok=True)
-        core.download(record["url"], file_path)
-    if check_hash:
-        core.check_hash(file_path, record["hash"])
+    resource = get_srtm15p_resource(registry, version=version)
+    file_path = fetch(resource, download=download, check_hash=check_hash)
     if as_paths:
         return [pathlib.Path(file_path)]
     else:
         return [str(file_path)]
 
 
+@instrument.traced
 def srtm15p_ds(
     version: SRTM15PVersion = SRTM15P_LATEST_VERSION,
     *,
     download: bool = True,
     check_hash: bool = True,
     registry_url: str | None = None,
+    bbox: BBox | None = None,
+    buffer: float = 0.0,
+    format: Format = "netcdf",
+    level: int = 0,
     **kwargs: ty.Any,
 ) -> xr.Dataset:
     path = srtm15p(
@@ -97,5 +119,12 @@ def srtm15p_ds(
     )[0]
     if "engine" not in kwargs:
         kwargs["engine"] = "h5netcdf"
-    ds = xr.open_dataset(path, **kwargs)
+    registry = core.load_registry(registry_url=registry_url)
+    resource = get_srtm15p_resource(registry, version=version)
+    store_path = get_store(resource, path, format=format, level=level, engine=kwargs.get("engine"))
+    with instrument.phase("open"):
+        ds = open_dataset(path, kwargs) if store_path is None else open_zarr(store_path, kwargs)
+    if bbox is not None:
+        with instrument.phase("subset"):
+            ds = subset_bbox(ds, bbox, buffer=buffer)
     return ds
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import bz2
+import collections.abc
+import logging
+import struct
+import typing as T
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Types
+Chunks: T.TypeAlias = collections.abc.Iterator[bytes]
+
+# Constants
+# https://pkware.cachefly.net/webdocs/casestudies/APPNOTE.TXT
+ZIP_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+ZIP_DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+# The records that follow the last member: the central directory, or the end of central directory records
+# of archives without members
+ZIP_CENTRAL_DIRECTORY_SIGNATURES = (b"PK\x01\x02", b"PK\x05\x06", b"PK\x06\x06", b"PK\x05\x05")
+ZIP_LOCAL_HEADER = struct.Struct("<HHHHHIIIHH")
+ZIP64_EXTRA_ID = 0x0001
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_FLAG_ENCRYPTED = 0x0001
+ZIP_FLAG_DATA_DESCRIPTOR = 0x0008
+ZIP_FLAG_UTF8 = 0x0800
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+ZIP_BZIP2 = 12
+
+
+class UnsupportedArchiveError(ValueError):
+    """
+    Raised when an archive can't be decompressed while it is being streamed.
+    """
+
+
+class Decompressor(T.Protocol):
+    @property
+    def eof(self) -> bool: ...
+    @property
+    def unused_data(self) -> bytes: ...
+    def decompress(self, data: bytes, /) -> bytes: ...
+
+
+class ChunkReader:
+    """
+    Read exact amounts of bytes from an iterator of byte chunks of arbitrary size.
+    """
+
+    def __init__(self, chunks: collections.abc.Iterable[bytes]) -> None:
+        self.chunks = iter(chunks)
+        self.buffer = b""
+
+    def next_chunk(self) -> bytes:
+        if self.buffer:
+            chunk, self.buffer = self.buffer, b""
+            return chunk
+        return next(self.chunks, b"")
+
+    def unread(self, data: bytes) -> None:
+        self.buffer = data + self.buffer
+
+    def read_exact(self, size: int) -> bytes:
+        parts: list[bytes] = []
+        while size > 0:
+            chunk = self.next_chunk()
+            if not chunk:
+                raise EOFError("Unexpected end of stream")
+            parts.append(chunk[:size])
+            self.unread(chunk[size:])
+            size -= len(parts[-1])
+        return b"".join(parts)
+
+    def iter_exact(self, size: int) -> Chunks:
+        while size > 0:
+            chunk = self.next_chunk()
+            if not chunk:
+                raise EOFError("Unexpected end of stream")
+            self.unread(chunk[size:])
+            chunk = chunk[:size]
+            size -= len(chunk)
+            yield chunk
+
+    def iter_decompressed(self, decompressor: Decompressor) -> Chunks:
+        """Feed the stream to `decompressor` until it reaches the end of its data."""
+        while not decompressor.eof:
+            chunk = self.next_chunk()
+            if not chunk:
+                raise EOFError("Unexpected end of stream")
+            if data := decompressor.decompress(chunk):
+                yield data
+        self.unread(decompressor.unused_data)
+
+
+def iter_zstd(chunks: collections.abc.Iterable[bytes]) -> Chunks:
+    import zstandard
+
+    reader = ChunkReader(chunks)
+    while chunk := reader.next_chunk():
+        reader.unread(chunk)
+        yield from reader.iter_decompressed(zstandard.ZstdDecompressor().decompressobj())
+
+
+def iter_gzip(chunks: collections.abc.Iterable[bytes]) -> Chunks:
+    reader = ChunkReader(chunks)
+    # A gzip file may consist of multiple members
+    while chunk := reader.next_chunk():
+        reader.unread(chunk)
+        yield from reader.iter_decompressed(zlib.decompressobj(wbits=16 + zlib.MAX_WBITS))
+
+
+def get_zip64_extra(extra: bytes) -> tuple[int, ...] | None:
+    """
+    Return the values of the zip64 extra field, or None if there is none.
+    """
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, size = struct.unpack_from("<HH", extra, offset)
+        if header_id == ZIP64_EXTRA_ID:
+            return struct.unpack_from(f"<{size // 8}Q", extra, offset + 4)
+        offset += 4 + size
+    return None
+
+
+def parse_zip64_extra(
+    values: tuple[int, ...],
+    compressed_size: int,
+    uncompressed_size: int,
+) -> tuple[int, int]:
+    # The extra field only has the values whose field in the header is full
+    remaining = iter(values)
+    if uncompressed_size == ZIP64_LIMIT:
+        uncompressed_size = next(remaining)
+    if compressed_size == ZIP64_LIMIT:
+        compressed_size = next(remaining)
+    return compressed_size, uncompressed_size
+
+
+def get_zip_decompressor(method: int) -> Decompressor:
+    if method == ZIP_DEFLATED:
+        return zlib.decompressobj(wbits=-zlib.MAX_WBITS)
+    if method == ZIP_BZIP2:
+        return bz2.BZ2Decompressor()
+    raise UnsupportedArchiveError(f"Unsupported zip compression method: {method}")
+
+
+class ZipMember(T.NamedTuple):
+    name: str
+    flags: int
+    method: int
+    crc: int
+    compressed_size: int
+    is_zip64: bool
+
+    @property
+    def has_data_descriptor(self) -> bool:
+        return bool(self.flags & ZIP_FLAG_DATA_DESCRIPTOR)
+
+
+def read_zip_local_header(reader: ChunkReader) -> ZipMember | None:
+    signature = reader.read_exact(4)
+    if signature in ZIP_CENTRAL_DIRECTORY_SIGNATURES:
+        return None
+    if signature != ZIP_LOCAL_HEADER_SIGNATURE:
+        # E.g. the previous member ended elsewhere than where its header said
+        raise UnsupportedArchiveError(f"Unexpected signature in the zip archive: {signature!r}")
+    (
+        _version,
+        flags,
+        method,
+        _time,
+        _date,
+        crc,
+        compressed_size,
+        uncompressed_size,
+        name_length,
+        extra_length,
+    ) = ZIP_LOCAL_HEADER.unpack(reader.read_exact(ZIP_LOCAL_HEADER.size))
+    name = reader.read_exact(name_length).decode("utf-8" if flags & ZIP_FLAG_UTF8 else "cp437")
+    extra = reader.read_exact(extra_length)
+    # Streaming writers (e.g. `zip -fz` or Java) write a zip64 extra field with sizes of 0 in the header,
+    # and 8 byte sizes in the data descriptor
+    zip64_extra = get_zip64_extra(extra)
+    is_zip64 = zip64_extra is not None
+    if zip64_extra is not None:
+        compressed_size, _ = parse_zip64_extra(zip64_extra, compressed_size, uncompressed_size)
+    return ZipMember(
+        name=name,
+        flags=flags,
+        method=method,
+        crc=crc,
+        compressed_size=compressed_size,
+        is_zip64=is_zip64,
+    )
+
+
+def iter_zip_member_data(reader: ChunkReader, member: ZipMember) -> Chunks:
+    if member.flags & ZIP_FLAG_ENCRYPTED:
+        raise UnsupportedArchiveError(f"Encrypted zip members are not supported: {member.name}")
+    if member.method == ZIP_STORED:
+        if member.has_data_descriptor:
+            raise UnsupportedArchiveError(f"Stored zip member without size information: {member.name}")
+        yield from reader.iter_exact(member.compressed_size)
+    elif member.has_data_descriptor:
+        # The compressed size is unknown, so the member ends where the compressed stream ends
+        yield from reader.iter_decompressed(get_zip_decompressor(member.method))
+    else:
+        remaining = reader.iter_exact(member.compressed_size)
+        yield from ChunkReader(remaining).iter_decompressed(get_zip_decompressor(member.method))
+        for _ in remaining:
+            pass
+
+
+def read_zip_data_descriptor(reader: ChunkReader, member: ZipMember) -> int:
+    signature = reader.read_exact(4)
+    if signature != ZIP_DATA_DESCRIPTOR_SIGNATURE:
+        reader.unread(signature)
+    crc: int = struct.unpack("<I", reader.read_exact(4))[0]
+    _ = reader.read_exact(16 if member.is_zip64 else 8)
+    return crc
+
+
+def iter_zip_member(chunks: collections.abc.Iterable[bytes], filename: str) -> Chunks:
+    """
+    Yield the decompressed contents of the `filename` member of a zip archive that is being streamed.
+
+    The archive is parsed sequentially using the local file headers, i.e. without the central
+    directory at the end of the file. The members that precede `filename` are skipped.
+    """
+    reader = ChunkReader(chunks)
+    while (member := read_zip_local_header(reader)) is not None:
+        is_target = member.name == filename
+        logger.debug("Zip member: %s (method=%d, target=%s)", member.name, member.method, is_target)
+        if not is_target and not member.has_data_descriptor:
+            for _ in reader.iter_exact(member.compressed_size):
+                pass
+            continue
+        crc = 0
+        for chunk in iter_zip_member_data(reader, member):
+            if is_target:
+                crc = zlib.crc32(chunk, crc)
+                yield chunk
+        expected_crc = (
+            read_zip_data_descriptor(reader, member) if member.has_data_descriptor else member.crc
+        )
+        if is_target:
+            if crc != expected_crc:
+                raise ValueError(f"CRC mismatch for zip member: {filename}")
+            return
+    raise ValueError(f"Member not found in zip archive: {filename}")
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import logging
+import typing as T
+
+# numpy and xarray are only imported when a dataset is subset, so that the accessors stay fast to import
+if T.TYPE_CHECKING:
+    import numpy as np
+    import xarray as xr
+
+logger = logging.getLogger(__name__)
+
+# Types
+# (lon_min, lat_min, lon_max, lat_max), like the `bbox` of `geopandas.read_file()`
+BBox: T.TypeAlias = tuple[float, float, float, float]
+
+# Constants
+LON_NAMES = ("lon", "longitude", "x")
+LAT_NAMES = ("lat", "latitude", "y")
+FULL_CIRCLE = 360.0
+# Tolerance for comparing coordinates, in degrees
+EPSILON = 1e-9
+
+
+def get_coordinate(ds: xr.Dataset | xr.DataArray, names: tuple[str, ...]) -> str:
+    for name in names:
+        if name in ds.coords and ds[name].ndim == 1:
+            return name
+    raise ValueError(f"Can't subset: the dataset has no 1D coordinate named any of: {names}")
+
+
+def get_half_step(values: np.ndarray[T.Any, T.Any]) -> float:
+    return abs(float(values[1] - values[0])) / 2 if len(values) > 1 else 0.0
+
+
+def get_index_range(values: np.ndarray[T.Any, T.Any], lo: float, hi: float) -> slice:
+    """
+    Return the slice of the ascending `values` that are within `[lo, hi]`.
+    """
+    import numpy as np
+
+    start = int(np.searchsorted(values, lo - EPSILON, side="left"))
+    stop = int(np.searchsorted(values, hi + EPSILON, side="right"))
+    return slice(start, stop)
+
+
+def make_ascending(ds: xr.Dataset, name: str) -> xr.Dataset:
+    values = ds[name].values
+    if len(values) > 1 and values[0] > values[-1]:
+        # Reversing is lazy, so only the selected hyperslab is read later on
+        ds = ds.isel({ds[name].dims[0]: slice(None, None, -1)})
+    return ds
+
+
+def subset_lat(ds: xr.Dataset, name: str, lat_min: float, lat_max: float) -> xr.Dataset:
+    values = ds[name].values
+    half = get_half_step(values)
+    index = get_index_range(values, lat_min - half, lat_max + half)
+    subset: xr.Dataset = ds.isel({ds[name].dims[0]: index})
+    return subset
+
+
+def subset_lon(ds: xr.Dataset, name: str, lon_min: float, lon_max: float) -> xr.Dataset:
+    import numpy as np
+    import xarray as xr
+
+    values = ds[name].values
+    dim = ds[name].dims[0]
+    half = get_half_step(values)
+    west_edge = float(values[0]) - half
+    is_global = float(values[-1]) + half - west_edge >= FULL_CIRCLE - EPSILON
+    width = get_lon_width(lon_min, lon_max)
+    if width + 2 * half >= FULL_CIRCLE:
+        return ds
+    # Move the box to the longitude convention of the grid, e.g. [-180, 180) or [0, 360)
+    lo = west_edge + (lon_min - half - west_edge) % FULL_CIRCLE
+    hi = lo + width + 2 * half
+    east: xr.Dataset = ds.isel({dim: get_index_range(values, lo, hi)})
+    if hi <= west_edge + FULL_CIRCLE:
+        return east
+    # The box wraps around the western edge of the grid
+    west: xr.Dataset = ds.isel({dim: get_index_range(values, -np.inf, hi - FULL_CIRCLE)})
+    if not is_global:
+        if east.sizes[dim] and west.sizes[dim]:
+            raise ValueError(
+                f"Can't subset: the box ({lon_min}, {lon_max}) overlaps both ends of a grid that isn't global",
+            )
+        return east if east.sizes[dim] else west
+    # Stitch the eastern end of the grid and its western start, and shift the longitudes of the latter
+    # by 360 degrees, so that they keep increasing
+    west = west.assign_coords({name: west[name] + FULL_CIRCLE})
+    if east.sizes[dim] and west.sizes[dim]:
+        # Grids that include both -180 and 180 would otherwise repeat that meridian
+        duplicates = int(np.count_nonzero(west[name].values <= east[name].values[-1] + EPSILON))
+        west = west.isel({dim: slice(duplicates, None)})
+    subset: xr.Dataset = xr.concat(
+        [east, west],
+        dim=dim,
+        data_vars="minimal",
+        coords="minimal",
+        compat="override",
+    )
+    return subset
+
+
+def get_lon_width(lon_min: float, lon_max: float) -> float:
+    # A box whose western bound is east of its eastern bound crosses the antimeridian
+    return lon_max - lon_min if lon_min <= lon_max else lon_max - lon_min + FULL_CIRCLE
+
+
+def intersects(extent: BBox, bbox: BBox) -> bool:
+    """
+    Return whether the boxes `extent` and `bbox` overlap (or touch).
+
+    Like in `subset_bbox()`, boxes may cross the antimeridian, e.g. `(170, -20, -170, 20)` or `(170, -20, 190, 20)`.
+    """
+    if bbox[1] > extent[3] + EPSILON or bbox[3] < extent[1] - EPSILON:
+        return False
+    extent_width = get_lon_width(extent[0], extent[2])
+    bbox_width = get_lon_width(bbox[0], bbox[2])
+    if extent_width + bbox_width >= FULL_CIRCLE:
+        return True
+    offset = (bbox[0] - extent[0]) % FULL_CIRCLE
+    return offset <= extent_width + EPSILON or offset >= FULL_CIRCLE - bbox_width - EPSILON
+
+
+def subset_bbox(ds: xr.Dataset, bbox: BBox, buffer: float = 0.0) -> xr.Dataset:
+    """
+    Return the cells of a regular lat/lon grid that overlap (or touch) `bbox`, i.e. `(lon_min, lat_min, lon_max, lat_max)`.
+
+    The cells are selected by index, so only the hyperslab that overlaps the box is read from disk.
+    The box is extended by `buffer` degrees on every side. Boxes may cross the antimeridian, either as
+    e.g. `(170, -20, -170, 20)` or `(170, -20, 190, 20)`; the two parts of the grid are then stitched
+    together and their longitudes keep increasing (e.g. from 170 to 190). Regional grids are subset
+    whatever their longitude convention, but a box that overlaps both of their ends is a `ValueError`,
+    since the result wouldn't be a regular grid. The result always has ascending latitudes and longitudes,
+    whatever the order of the file.
+
+    Stitching concatenates the two parts, which reads them, unless the dataset is backed by dask.
+    """
+    lon_min, lat_min, lon_max, lat_max = bbox
+    if lat_min > lat_max:
+        raise ValueError(f"lat_min must not be greater than lat_max: {bbox}")
+    lon_name = get_coordinate(ds, LON_NAMES)
+    lat_name = get_coordinate(ds, LAT_NAMES)
+    ds = make_ascending(make_ascending(ds, lon_name), lat_name)
+    ds = subset_lat(ds, lat_name, max(lat_min - buffer, -90.0), min(lat_max + buffer, 90.0))
+    ds = subset_lon(ds, lon_name, lon_min - buffer, lon_max + buffer)
+    logger.debug("Subset to %s: %s", bbox, dict(ds.sizes))
+    return ds
@@ -0,0 +1,140 @@
+"""
+A local HTTP server for the tests and the benchmarks.
+"""
+
+from __future__ import annotations
+
+import collections.abc
+import contextlib
+import functools
+import http.server
+import os
+import pathlib
+import re
+import threading
+import time
+import typing as T
+
+# Constants
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+COPY_CHUNK_SIZE = 2**20
+
+
+class RangeRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    A static file handler that supports single byte ranges, `If-Range`, `If-None-Match` and ETags, like the
+    servers of the datasets.
+
+    If `server.honour_ranges` is False, it ignores `Range` and doesn't advertise `Accept-Ranges`,
+    like some mirrors do. Like some servers, it rejects HEAD requests if `server.head_allowed` is False.
+    GET requests take `server.delay` more seconds, e.g. to count how many of them are served at the same time.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # The headers and the body are sent separately, which would otherwise add the delayed ACK timeout to requests
+    disable_nagle_algorithm = True
+    server: RangeServer
+
+    def log_message(self, format: str, *args: object) -> None:  # type: ignore[explicit-override]
+        pass
+
+    def do_HEAD(self) -> None:  # type: ignore[explicit-override]
+        if not self.server.head_allowed:
+            self.send_error(405)
+            return
+        super().do_HEAD()
+
+    def do_GET(self) -> None:  # type: ignore[explicit-override]
+        with self.server.count_active():
+            time.sleep(self.server.delay)
+            super().do_GET()
+
+    def send_head(self) -> T.BinaryIO | None:  # type: ignore[explicit-override]
+        self.server.requests.append((self.command, self.path, dict(self.headers.items())))
+        path = pathlib.Path(self.translate_path(self.path))
+        if not path.is_file():
+            self.send_error(404)
+            return None
+        stat = path.stat()
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return None
+        start, end = 0, stat.st_size - 1
+        match = RANGE_PATTERN.match(self.headers.get("Range", ""))
+        is_fresh = self.headers.get("If-Range", etag) == etag
+        if self.server.honour_ranges and match and is_fresh:
+            first, last = match.groups()
+            if first:
+                start, end = int(first), min(int(last or end), end)
+            else:
+                start = max(0, stat.st_size - int(last))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{stat.st_size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        if self.server.honour_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.end_headers()
+        fd = open(path, "rb")
+        fd.seek(start)
+        self.remaining = end - start + 1
+        return fd
+
+    def copyfile(self, source: T.BinaryIO, outputfile: T.BinaryIO) -> None:  # type: ignore[override,explicit-override]
+        while self.remaining > 0 and (chunk := source.read(min(self.remaining, COPY_CHUNK_SIZE))):
+            outputfile.write(chunk)
+            self.remaining -= len(chunk)
+
+
+class RangeServer(http.server.ThreadingHTTPServer):
+    """
+    Serve `directory` over HTTP on localhost, and record the requests.
+    """
+
+    daemon_threads = True
+    honour_ranges = True
+    head_allowed = True
+    delay = 0.0
+
+    def __init__(self, directory: os.PathLike[str] | str) -> None:
+        handler = functools.partial(RangeRequestHandler, directory=os.fspath(directory))
+        super().__init__(("127.0.0.1", 0), handler)
+        self.directory = pathlib.Path(directory)
+        self.url = f"http://127.0.0.1:{self.server_port}/"
+        self.requests: list[tuple[str, str, dict[str, str]]] = []
+        # The number of GET requests that are being served, and its maximum
+        self.active = 0
+        self.max_active = 0
+        self.active_lock = threading.Lock()
+
+    def get_requests(self, command: str) -> list[dict[str, str]]:
+        return [headers for method, _, headers in self.requests if method == command]
+
+    @contextlib.contextmanager
+    def count_active(self) -> collections.abc.Iterator[None]:
+        with self.active_lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            yield
+        finally:
+            with self.active_lock:
+                self.active -= 1
+
+    def start(self) -> RangeServer:
+        """
+        Serve from a background thread.
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import collections.abc
+import logging
+import os
+import pathlib
+import typing as T
+import warnings
+
+from . import _cache
+from . import _core as core
+from . import _hdf5 as hdf5
+from . import _instrument as instrument
+from ._lock import FileLock
+
+if T.TYPE_CHECKING:
+    import xarray as xr
+
+logger = logging.getLogger(__name__)
+
+# Types
+Format: T.TypeAlias = T.Literal["netcdf", "zarr"]
+
+# Constants
+ZARR_SUFFIX = ".zarr"
+# The chunks of the stores are square: e.g. about 2 by 2 degrees for a 15 arc second grid (512 KiB for int16)
+ZARR_CHUNK = 512
+# Without on-disk chunks to follow, the files are transcoded in blocks of 8 by 8 chunks
+BLOCK_CHUNKS = 8
+# The options of `xr.open_dataset()` that only apply to NetCDF files
+NETCDF_KWARGS = ("engine", "driver_kwds", hdf5.PIN_CHUNK_CACHE, *hdf5.RDCC_KEYS)
+
+
+def get_zarr_path(resource: core.Resource) -> str:
+    """
+    Return the path of the Zarr store of `resource`, relative to the cache directory.
+
+    The store is next to the file and is keyed by its hash, so a new version of the file gets a new store.
+    """
+    return f"{resource.path}.{resource.hash}{ZARR_SUFFIX}"
+
+
+def get_tree_size(path: pathlib.Path) -> int:
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+def get_transcode_chunks(path: os.PathLike[str] | str, ds: xr.Dataset, chunk: int) -> dict[str, int]:
+    """
+    Return the dask chunks for transcoding `ds`: whole Zarr chunks, so that each task writes its own
+    chunks, and about as large as the native chunks of `path`, so that each of them is decompressed about once.
+    """
+    native = hdf5.get_native_chunks(hdf5.read_chunk_layout(path))
+    chunks: dict[str, int] = {}
+    for dim in ds.dims:
+        block = native.get(str(dim), BLOCK_CHUNKS * chunk)
+        chunks[str(dim)] = max(chunk, round(block / chunk) * chunk)
+    return chunks
+
+
+def align_chunks(ds: xr.Dataset, chunk: int) -> xr.Dataset:
+    """
+    Rechunk the dimensions whose dask chunks are not made of whole Zarr chunks, so that each task writes its own chunks.
+    """
+    chunks = {
+        str(dim): BLOCK_CHUNKS * chunk
+        for dim, sizes in ds.chunksizes.items()
+        if any(size % chunk for size in sizes[:-1])
+    }
+    return ds.chunk(chunks) if chunks else ds
+
+
+def write_store(ds: xr.Dataset, store_path: pathlib.Path, chunk: int = ZARR_CHUNK) -> None:
+    """
+    Write `ds` to a Zarr store with square chunks that are compressed with zstd.
+
+    The chunks are written in parallel by dask, to a temporary directory that is renamed once it is complete.
+    """
+    from zarr.codecs import BloscCodec
+
+    tmp_path = store_path.with_name(f"{store_path.name}.tmp")
+    if tmp_path.exists():
+        # Left over by a process that was interrupted while writing
+        core.lenient_remove_tree(tmp_path)
+    compressor = BloscCodec(cname="zstd", clevel=3, shuffle="shuffle")
+    ds = align_chunks(ds, chunk)
+    encoding = {
+        name: {
+            "chunks": tuple(min(chunk, ds.sizes[dim]) for dim in var.dims),
+            "compressors": (compressor,),
+        }
+        for name, var in ds.data_vars.items()
+    }
+    with warnings.catch_warnings():
+        # The stores are only read by xarray, which supports consolidated metadata in Zarr v3
+        warnings.filterwarnings("ignore", message="Consolidated metadata", category=UserWarning)
+        ds.to_zarr(tmp_path, mode="w", zarr_format=3, consolidated=True, encoding=encoding)
+    os.replace(tmp_path, store_path)
+
+
+def write_zarr(
+    path: os.PathLike[str] | str,
+    store_path: pathlib.Path,
+    *,
+    engine: str | None = None,
+    chunk: int = ZARR_CHUNK,
+) -> None:
+    """
+    Transcode the NetCDF file at `path` to a Zarr store.
+    """
+    import xarray as xr
+
+    with xr.open_dataset(path, engine=engine) as source:
+        write_store(source.chunk(get_transcode_chunks(path, source, chunk)), store_path, chunk=chunk)
+    logger.info("Transcoded %s to %s", path, store_path)
+
+
+def get_or_create_store(
+    relative_path: str,
+    create: collections.abc.Callable[[pathlib.Path], None],
+    *,
+    phase: str,
+    resource: core.Resource,
+    keep: collections.abc.Collection[os.PathLike[str] | str] = (),
+) -> pathlib.Path:
+    """
+    Return the path of the store at `relative_path` in the cache, calling `create(store_path)` if it doesn't exist.
+
+    Like downloads, only one thread or process creates a store at any given time. Stores that are found
+    in a read-only cache tier are used in place. Stores are cache entries of their own (i.e. they can be
+    evicted independently of the file they are derived from).
+    """
+    store_path = core.get_cache_path() / relative_path
+    if not store_path.exists() and (tier_path := core.find_in_tiers(relative_path)) is not None:
+        return tier_path
+    with instrument.phase(phase, resource=resource.key) as span:
+        span.cache_hit = store_path.exists()
+        if not store_path.exists():
+            store_path.parent.mkdir(parents=True, exist_ok=True)
+            with FileLock(store_path):
+                # The store may have been created while we were waiting for the lock
+                if not store_path.exists():
+                    create(store_path)
+                    span.nbytes = get_tree_size(store_path)
+                    _ = _cache.evict(keep=[store_path, *keep])
+        _cache.record_access(store_path)
+    return store_path
+
+
+def transcode(
+    resource: core.Resource,
+    path: os.PathLike[str] | str,
+    *,
+    engine: str | None = None,
+    chunk: int = ZARR_CHUNK,
+) -> pathlib.Path:
+    """
+    Return the path of the Zarr store of `resource`, transcoding its file at `path` on first use.
+    """
+
+    def create(store_path: pathlib.Path) -> None:
+        write_zarr(path, store_path, engine=engine, chunk=chunk)
+
+    relative_path = get_zarr_path(resource)
+    return get_or_create_store(relative_path, create, phase="transcode", resource=resource, keep=[path])
+
+
+def read_zarr_layout(store_path: os.PathLike[str] | str) -> tuple[hdf5.ChunkedVariable, ...]:
+    import zarr
+
+    group = zarr.open_consolidated(store_path, mode="r")
+    variables: list[hdf5.ChunkedVariable] = []
+    for name, array in group.arrays():
+        # Zarr v3 has dimension names, while xarray stores them as an attribute in Zarr v2
+        dims: T.Any = getattr(array.metadata, "dimension_names", None) or array.attrs["_ARRAY_DIMENSIONS"]
+        if array.ndim:
+            variables.append(
+                hdf5.ChunkedVariable(
+                    name=name,
+                    dims=tuple(dims),
+                    shape=array.shape,
+                    chunks=array.chunks,
+                    itemsize=array.dtype.itemsize,
+                ),
+            )
+    return tuple(sorted(variables, key=lambda var: var.nbytes, reverse=True))
+
+
+def open_zarr(store_path: os.PathLike[str] | str, kwargs: dict[str, T.Any]) -> xr.Dataset:
+    """
+    Open a Zarr store that was written by `write_store()` with its consolidated metadata.
+
+    The options that only apply to NetCDF files (e.g. `engine`) are ignored. `chunks="native"`
+    gives dask chunks that are whole multiples of the chunks of the store.
+    """
+    import xarray as xr
+
+    kwargs = {key: value for key, value in kwargs.items() if key not in NETCDF_KWARGS}
+    if isinstance(kwargs.get("chunks"), str) and kwargs["chunks"] == "native":
+        kwargs["chunks"] = hdf5.get_native_chunks(read_zarr_layout(store_path))
+    ds: xr.Dataset = xr.open_dataset(store_path, engine="zarr", consolidated=True, **kwargs)
+    return ds
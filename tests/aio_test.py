@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import gzip
+import io
+import os
+import pathlib
+import typing as T
+import zipfile
+import zlib
+
+import httpx
+import pytest
+import zstandard
+
+from seareport_data import _aio as aio
+from seareport_data import _core as core
+from seareport_data import _stream
+from seareport_data._lock import FileLock
+
+if T.TYPE_CHECKING:
+    from seareport_data._testing import RangeServer
+
+# Constants
+SIZE = 2**20
+# More downloads than threads in the default executor
+DOWNLOADS = 6
+EXECUTOR_THREADS = 2
+# A hung download fails the test instead of hanging the suite
+TIMEOUT = 30
+
+
+@pytest.fixture
+def payload() -> bytes:
+    # Compressible, but not too much, so that the downloads take several chunks
+    return os.urandom(SIZE // 2) * 2
+
+
+def run(coroutine: T.Coroutine[T.Any, T.Any, T.Any]) -> T.Any:
+    async def main() -> T.Any:
+        # A small executor makes thread starvation (i.e. a deadlock) show up with a few downloads
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(max_workers=EXECUTOR_THREADS))
+        return await asyncio.wait_for(coroutine, TIMEOUT)
+
+    return asyncio.run(main())
+
+
+def test_adownload_resumes_part(server: RangeServer, payload: bytes, tmp_path: pathlib.Path) -> None:
+    (server.directory / "data.bin").write_bytes(payload)
+    url = f"{server.url}data.bin"
+    etag = httpx.head(url).headers["ETag"]
+    target = tmp_path / "data.bin"
+    core.get_part_path(target).write_bytes(payload[:1000])
+    core.save_part_meta(target, {"url": url, "validators": {"etag": etag}})
+    digest = run(aio.adownload(url, target))
+    assert target.read_bytes() == payload
+    assert digest == core.hash_file(target)
+    (headers,) = server.get_requests("GET")
+    assert headers["Range"] == "bytes=1000-"
+
+
+@pytest.mark.parametrize(
+    ("compress", "decoder"),
+    [
+        pytest.param(gzip.compress, _stream.iter_gzip, id="gzip"),
+        pytest.param(zstandard.compress, _stream.iter_zstd, id="zstd"),
+    ],
+)
+def test_concurrent_decompressed_downloads(
+    server: RangeServer,
+    payload: bytes,
+    tmp_path: pathlib.Path,
+    compress: T.Callable[[bytes], bytes],
+    decoder: aio.Decoder,
+) -> None:
+    (server.directory / "data.bin.z").write_bytes(compress(payload))
+    targets = [tmp_path / f"data{index}.bin" for index in range(DOWNLOADS)]
+
+    async def download_all() -> list[str]:
+        return await asyncio.gather(
+            *(aio.adownload_decompressed(f"{server.url}data.bin.z", target, decoder) for target in targets),
+        )
+
+    digests = run(download_all())
+    for target, digest in zip(targets, digests, strict=True):
+        assert target.read_bytes() == payload
+        assert digest == core.hash_file(target)
+
+
+def test_decoder_error_stops_the_download(
+    server: RangeServer,
+    payload: bytes,
+    tmp_path: pathlib.Path,
+) -> None:
+    (server.directory / "data.bin.gz").write_bytes(payload)
+    target = tmp_path / "data.bin"
+    with pytest.raises(zlib.error):
+        run(aio.adownload_decompressed(f"{server.url}data.bin.gz", target, _stream.iter_gzip))
+    assert not target.exists()
+
+
+def test_afetch_zip_member(server: RangeServer, payload: bytes, cache_dir: pathlib.Path) -> None:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("data.bin", payload)
+    (server.directory / "data.zip").write_bytes(buffer.getvalue())
+    resource = core.Resource(
+        dataset="TEST",
+        version="1",
+        name="data",
+        url=f"{server.url}data.zip",
+        path="TEST/1/data.bin",
+        hash="",
+        compression="zip",
+    )
+    path = run(aio.afetch(resource, check_hash=False))
+    assert path == cache_dir / "TEST/1/data.bin"
+    assert path.read_bytes() == payload
+    # The second call is served from the cache
+    assert run(aio.afetch(resource, check_hash=False)) == path
+    assert len(server.get_requests("GET")) == 1
+
+
+def test_cancelled_alock_does_not_leak_the_lock(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "data.bin"
+
+    async def wait_and_cancel() -> None:
+        holder = FileLock(path)
+        holder.acquire()
+        waiter = asyncio.ensure_future(aio.alock(path).__aenter__())
+        await asyncio.sleep(0.2)
+        _ = waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        holder.release()
+        async with aio.alock(path):
+            pass
+
+    run(wait_and_cancel())
+    assert not FileLock(path).path.exists()
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import typing as T
+
+import pytest
+
+import seareport_data as D
+from seareport_data import _core as core
+from seareport_data._srtm15p import get_srtm15p_resource
+
+if T.TYPE_CHECKING:
+    from seareport_data._testing import RangeServer
+
+
+@pytest.fixture
+def registry_url(server: RangeServer) -> str:
+    path = server.directory / "srtm.nc"
+    path.write_bytes(os.urandom(4096))
+    registry = {"SRTM15+": {"2.6": {"url": "srtm.nc", "filename": "srtm.nc", "hash": core.hash_file(path)}}}
+    (server.directory / "registry.json").write_text(json.dumps(registry))
+    return f"{server.url}registry.json"
+
+
+def test_bundle_keeps_original_urls_and_works_offline(
+    server: RangeServer,
+    registry_url: str,
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    resources = [get_srtm15p_resource(core.load_registry(registry_url), "2.6")]
+    bundle_path = D.export_bundle(resources, tmp_path / "bundle.tar", registry_url=registry_url)
+    # Import the bundle into the cache of a machine that can't reach the server
+    server.shutdown()
+    server.server_close()
+    monkeypatch.setenv("SEAREPORT_DATA_DIR", os.fspath(tmp_path / "offline"))
+    core.clear_registry_cache()
+    registry_path = tmp_path / "registry.json"
+    (path,) = D.import_bundle(bundle_path, registry_path=registry_path)
+    assert path.read_bytes() == (server.directory / "srtm.nc").read_bytes()
+    registry = json.loads(registry_path.read_text())
+    assert registry["SRTM15+"]["2.6"]["url"] == f"{server.url}srtm.nc"
+    assert D.srtm15p(registry_url=registry_path.as_uri(), as_paths=True) == [path]
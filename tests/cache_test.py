@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import time
+import typing as T
+
+import pytest
+
+import seareport_data as D
+from seareport_data import _cache
+from seareport_data import _core as core
+from seareport_data._lock import get_lock_path
+
+if T.TYPE_CHECKING:
+    from seareport_data._testing import RangeServer
+
+# Constants
+SIZE = 1000
+DAY = 86400
+
+
+def write_file(path: pathlib.Path, age: float, size: int = SIZE) -> pathlib.Path:
+    """
+    Write a file that was last used `age` days ago, with a hash stamp.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(os.urandom(size))
+    core.write_stamp(path, core.hash_file(path))
+    _cache.record_access(path)
+    timestamp = time.time() - age * DAY
+    os.utime(_cache.get_access_path(path), (timestamp, timestamp))
+    return path
+
+
+@pytest.fixture
+def files(cache_dir: pathlib.Path) -> dict[str, pathlib.Path]:
+    # From the least to the most recently used
+    return {
+        "old": write_file(cache_dir / "A" / "1" / "old.nc", age=3),
+        "middle": write_file(cache_dir / "A" / "2" / "middle.nc", age=2),
+        "new": write_file(cache_dir / "B" / "1" / "new.nc", age=1),
+    }
+
+
+@pytest.mark.parametrize(
+    ("size", "expected"),
+    [("500", 500), ("500M", 500 * 2**20), ("1.5GiB", 3 * 2**29), (" 2 tb ", 2 * 2**40)],
+)
+def test_parse_size(size: str, expected: int) -> None:
+    assert _cache.parse_size(size) == expected
+
+
+def test_parse_invalid_size() -> None:
+    with pytest.raises(ValueError, match="Invalid size"):
+        _cache.parse_size("5 apples")
+
+
+def test_list_cache(files: dict[str, pathlib.Path], cache_dir: pathlib.Path) -> None:
+    # Metadata, sidecars and partial downloads are not entries
+    (cache_dir / "registries").mkdir()
+    (cache_dir / "registries" / "registry.json").write_text("{}")
+    core.get_part_path(cache_dir / "A" / "1" / "partial.nc").write_bytes(b"partial")
+    store = cache_dir / "B" / "1" / "grid.zarr"
+    (store / "z").mkdir(parents=True)
+    (store / "z" / "0.0").write_bytes(bytes(SIZE))
+    (store / "zarr.json").write_bytes(bytes(SIZE))
+    os.utime(store, (0, 0))
+    entries = D.list_cache()
+    assert [entry.path for entry in entries] == [store, files["old"], files["middle"], files["new"]]
+    assert [(entry.dataset, entry.version) for entry in entries] == [
+        ("B", "1"),
+        ("A", "1"),
+        ("A", "2"),
+        ("B", "1"),
+    ]
+    assert [entry.size for entry in entries] == [2 * SIZE, SIZE, SIZE, SIZE]
+    assert D.cache_usage() == {"A": {"1": SIZE, "2": SIZE}, "B": {"1": 3 * SIZE}}
+
+
+def test_evict_least_recently_used(files: dict[str, pathlib.Path], cache_dir: pathlib.Path) -> None:
+    assert [entry.path for entry in D.evict(2 * SIZE, dry_run=True)] == [files["old"]]
+    assert files["old"].exists()
+    evicted = D.evict(SIZE)
+    assert [entry.path for entry in evicted] == [files["old"], files["middle"]]
+    assert [entry.path for entry in D.list_cache()] == [files["new"]]
+    # The sidecars and the directories that are left empty are removed too
+    assert not (cache_dir / "A" / "1").exists()
+    assert not (cache_dir / "A" / "2").exists()
+    assert not core.get_stamp_path(files["old"]).exists()
+
+
+def test_evict_skips_pinned_kept_and_locked_files(files: dict[str, pathlib.Path]) -> None:
+    D.pin(files["old"])
+    get_lock_path(files["middle"]).touch()
+    evicted = D.evict(0, keep=[files["new"]])
+    assert not evicted
+    assert all(path.exists() for path in files.values())
+    # The budget can't be met, and unpinning makes the file evictable again
+    D.unpin(files["old"])
+    assert [entry.path for entry in D.evict(0, keep=[files["new"]])] == [files["old"]]
+
+
+def test_evict_by_age(files: dict[str, pathlib.Path]) -> None:
+    evicted = D.evict(max_age=1.5 * DAY)
+    assert [entry.path for entry in evicted] == [files["old"], files["middle"]]
+    assert not D.evict()
+
+
+def test_recording_an_access_makes_a_file_recent(files: dict[str, pathlib.Path]) -> None:
+    _cache.record_access(files["old"])
+    assert [entry.path for entry in D.evict(SIZE)] == [files["middle"], files["new"]]
+
+
+def test_fetch_keeps_the_cache_within_its_budget(
+    server: RangeServer,
+    files: dict[str, pathlib.Path],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("SEAREPORT_DATA_CACHE_BUDGET", str(2 * SIZE))
+    path = server.directory / "data.bin"
+    path.write_bytes(os.urandom(SIZE))
+    resource = core.Resource(
+        dataset="C",
+        version="1",
+        name="data",
+        url=f"{server.url}data.bin",
+        path="C/1/data.bin",
+        hash=core.hash_file(path),
+    )
+    (result,) = D.fetch_many([resource])
+    # The least recently used files make room for the download
+    assert [entry.path for entry in D.list_cache()] == [files["new"], result.path]
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import typing as T
+
+import pytest
+import stamina
+
+from seareport_data import _cache
+from seareport_data import _cli
+from seareport_data import _core as core
+
+if T.TYPE_CHECKING:
+    from seareport_data._testing import RangeServer
+
+# Constants
+SIZE = 4096
+VERSION = "2.3.7.1"
+FILENAMES = ("gshhg_crude_l5.gpkg", "gshhg_crude_l6.gpkg")
+PATTERN = "GSHHG/*/crude"
+
+
+@pytest.fixture
+def registry_url(server: RangeServer, tmp_path: pathlib.Path) -> str:
+    # The packaged registry, with the crude GSHHG files served by the test server
+    registry = json.loads((pathlib.Path(core.__file__).parent / "registry.json").read_text())
+    record = registry["GSHHG"][VERSION]
+    record["base_url"] = server.url
+    for filename in FILENAMES:
+        path = server.directory / filename
+        path.write_bytes(os.urandom(SIZE))
+        record["hashes"][filename] = core.hash_file(path)
+    path = tmp_path / "registry.json"
+    path.write_text(json.dumps(registry))
+    return path.as_uri()
+
+
+def get_cached(cache_dir: pathlib.Path) -> list[pathlib.Path]:
+    return [cache_dir / "GSHHG" / VERSION / filename for filename in FILENAMES]
+
+
+def get_status(capsys: pytest.CaptureFixture[str]) -> dict[str, T.Any]:
+    _ = capsys.readouterr()
+    assert _cli.main(["status", "--json"]) == 0
+    status: dict[str, T.Any] = json.loads(capsys.readouterr().out)
+    return status
+
+
+def test_prefetch(
+    registry_url: str,
+    cache_dir: pathlib.Path,
+    server: RangeServer,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    assert _cli.main(["prefetch", PATTERN, "--registry-url", registry_url, "--dry-run"]) == 0
+    assert capsys.readouterr().out.split() == [f"GSHHG/{VERSION}/crude/5", f"GSHHG/{VERSION}/crude/6"]
+    assert not server.get_requests("GET")
+    assert _cli.main(["prefetch", PATTERN, "--registry-url", registry_url, "-j", "2"]) == 0
+    for path in get_cached(cache_dir):
+        assert path.read_bytes() == (server.directory / path.name).read_bytes()
+    # A failed download fails the command
+    (server.directory / FILENAMES[0]).unlink()
+    get_cached(cache_dir)[0].unlink()
+    with stamina.set_testing(True):
+        assert _cli.main(["prefetch", PATTERN, "--registry-url", registry_url]) == 1
+    assert "Failed: GSHHG" in capsys.readouterr().err
+
+
+def test_verify(
+    registry_url: str,
+    cache_dir: pathlib.Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    assert _cli.main(["prefetch", PATTERN, "--registry-url", registry_url]) == 0
+    corrupted, intact = get_cached(cache_dir)
+    corrupted.write_bytes(os.urandom(SIZE))
+    core.get_stamp_path(intact).unlink()
+    assert _cli.main(["verify", PATTERN, "--registry-url", registry_url, "-j", "2"]) == 1
+    assert "MISMATCH" in capsys.readouterr().err
+    assert corrupted.exists()
+    assert _cli.main(["verify", PATTERN, "--registry-url", registry_url, "--remove"]) == 1
+    assert not corrupted.exists()
+    assert not core.get_stamp_path(corrupted).exists()
+    assert not _cache.get_access_path(corrupted).exists()
+    states = {record["path"]: record["state"] for record in get_status(capsys)["files"]}
+    assert states == {os.fspath(intact.relative_to(cache_dir)): "verified"}
+
+
+def test_verify_does_not_touch_read_only_tiers(
+    registry_url: str,
+    cache_dir: pathlib.Path,
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    tier = tmp_path / "tier"
+    for path in get_cached(tier):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(os.urandom(SIZE))
+    monkeypatch.setenv("SEAREPORT_DATA_DIRS", os.pathsep.join([os.fspath(tier), os.fspath(cache_dir)]))
+    assert _cli.main(["verify", PATTERN, "--registry-url", registry_url, "--remove"]) == 1
+    assert capsys.readouterr().err.count("read-only tier") == len(FILENAMES)
+    for path in get_cached(tier):
+        assert path.exists()
+        assert core.read_stamp(path) is None
+    assert sorted(path.name for path in tier.rglob("*")) == sorted(["GSHHG", VERSION, *FILENAMES])
+
+
+def test_status(
+    registry_url: str,
+    cache_dir: pathlib.Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    assert _cli.main(["prefetch", PATTERN, "--registry-url", registry_url]) == 0
+    _cache.pin(get_cached(cache_dir)[0])
+    status = get_status(capsys)
+    assert status["cache_dirs"] == [os.fspath(cache_dir)]
+    records = {record["path"]: record for record in status["files"]}
+    assert set(records) == {os.fspath(path.relative_to(cache_dir)) for path in get_cached(cache_dir)}
+    assert [record["pinned"] for record in records.values()].count(True) == 1
+    assert {record["size"] for record in records.values()} == {SIZE}
+    # The hashes were checked by the download
+    assert {record["state"] for record in records.values()} == {"verified"}
+    assert _cli.main(["status"]) == 0
+    assert "2 files" in capsys.readouterr().out
+
+
+def test_prune(
+    registry_url: str,
+    cache_dir: pathlib.Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    assert _cli.main(["prune"]) == 2  # noqa: PLR2004
+    assert _cli.main(["prefetch", PATTERN, "--registry-url", registry_url]) == 0
+    older, newer = get_cached(cache_dir)
+    os.utime(_cache.get_access_path(older), (0, 0))
+    assert _cli.main(["prune", "--max-bytes", str(SIZE), "--dry-run"]) == 0
+    assert "Would remove 1 files" in capsys.readouterr().out
+    assert older.exists()
+    assert _cli.main(["prune", "--max-bytes", str(SIZE)]) == 0
+    assert not older.exists()
+    assert newer.exists()
+    # Pinned files are kept, whatever their age
+    _cache.pin(newer)
+    assert _cli.main(["prune", "--older-than", "0"]) == 0
+    assert newer.exists()
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import collections.abc
+import os
+import pathlib
+
+import pytest
+
+from seareport_data import _core as core
+from seareport_data._testing import RangeServer
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    cache = tmp_path / "cache"
+    monkeypatch.delenv("SEAREPORT_DATA_DIRS", raising=False)
+    monkeypatch.setenv("SEAREPORT_DATA_DIR", os.fspath(cache))
+    monkeypatch.setenv("SEAREPORT_DATA_PROGRESS", "0")
+    core.clear_registry_cache()
+    return cache
+
+
+@pytest.fixture
+def server(tmp_path: pathlib.Path) -> collections.abc.Iterator[RangeServer]:
+    directory = tmp_path / "www"
+    directory.mkdir()
+    httpd = RangeServer(directory).start()
+    yield httpd
+    httpd.close()
+    core.close_httpx_client()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import typing as T
+
+import pytest
+
+from seareport_data import _core as core
+
+if T.TYPE_CHECKING:
+    from seareport_data._testing import RangeServer
+
+# Constants
+SIZE = 4096
+
+
+@pytest.fixture
+def payload(server: RangeServer) -> bytes:
+    data = os.urandom(SIZE)
+    (server.directory / "data.bin").write_bytes(data)
+    return data
+
+
+def get_etag(server: RangeServer) -> str:
+    response = core.get_httpx_client().head(f"{server.url}data.bin")
+    return response.headers["ETag"]
+
+
+def test_download_stream(server: RangeServer, payload: bytes, tmp_path: pathlib.Path) -> None:
+    target = tmp_path / "data.bin"
+    digest = core.download(f"{server.url}data.bin", target)
+    assert target.read_bytes() == payload
+    assert digest == core.hash_file(target)
+    assert not core.get_part_path(target).exists()
+
+
+def test_download_stream_resumes_part(server: RangeServer, payload: bytes, tmp_path: pathlib.Path) -> None:
+    url = f"{server.url}data.bin"
+    target = tmp_path / "data.bin"
+    core.get_part_path(target).write_bytes(payload[:1000])
+    core.save_part_meta(target, {"url": url, "validators": {"etag": get_etag(server)}})
+    digest = core.download(url, target)
+    assert target.read_bytes() == payload
+    assert digest == core.hash_file(target)
+    (headers,) = server.get_requests("GET")
+    assert headers["Range"] == "bytes=1000-"
+    assert headers["If-Range"] == get_etag(server)
+
+
+def test_download_stream_restarts_if_resource_changed(
+    server: RangeServer,
+    payload: bytes,
+    tmp_path: pathlib.Path,
+) -> None:
+    url = f"{server.url}data.bin"
+    target = tmp_path / "data.bin"
+    core.get_part_path(target).write_bytes(b"stale" * 100)
+    core.save_part_meta(target, {"url": url, "validators": {"etag": '"stale"'}})
+    digest = core.download(url, target)
+    assert target.read_bytes() == payload
+    assert digest == core.hash_file(target)
+
+
+def test_download_stream_restarts_if_range_is_ignored(
+    server: RangeServer,
+    payload: bytes,
+    tmp_path: pathlib.Path,
+) -> None:
+    server.honour_ranges = False
+    url = f"{server.url}data.bin"
+    target = tmp_path / "data.bin"
+    core.get_part_path(target).write_bytes(payload[:1000])
+    core.save_part_meta(target, {"url": url, "validators": {"etag": get_etag(server)}})
+    digest = core.download(url, target)
+    assert target.read_bytes() == payload
+    assert digest == core.hash_file(target)
+    (headers,) = server.get_requests("GET")
+    assert "Range" in headers
+
+
+@pytest.fixture
+def small_parts(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(core, "MIN_PART_SIZE", SIZE // 8)
+
+
+@pytest.mark.usefixtures("small_parts")
+def test_download_ranges(server: RangeServer, payload: bytes, tmp_path: pathlib.Path) -> None:
+    target = tmp_path / "data.bin"
+    digest = core.download(f"{server.url}data.bin", target, connections=4)
+    assert digest is None
+    assert target.read_bytes() == payload
+    ranges = sorted(headers["Range"] for headers in server.get_requests("GET"))
+    assert ranges == ["bytes=0-1023", "bytes=1024-2047", "bytes=2048-3071", "bytes=3072-4095"]
+    assert not core.get_part_meta_path(target).exists()
+
+
+@pytest.mark.usefixtures("small_parts")
+def test_download_ranges_resumes_part(server: RangeServer, payload: bytes, tmp_path: pathlib.Path) -> None:
+    url = f"{server.url}data.bin"
+    target = tmp_path / "data.bin"
+    # The first range is complete and the second one is half done; the rest of the file is garbage
+    part = bytearray(SIZE)
+    part[:1536] = payload[:1536]
+    core.get_part_path(target).write_bytes(part)
+    meta = {
+        "url": url,
+        "total": SIZE,
+        "validators": {"etag": get_etag(server)},
+        "ranges": [[1024, 1023], [1536, 2047], [2048, 3071], [3072, 4095]],
+    }
+    core.save_part_meta(target, meta)
+    _ = core.download(url, target, connections=4)
+    assert target.read_bytes() == payload
+    ranges = sorted(headers["Range"] for headers in server.get_requests("GET"))
+    assert ranges == ["bytes=1536-2047", "bytes=2048-3071", "bytes=3072-4095"]
+    assert all(headers["If-Range"] == get_etag(server) for headers in server.get_requests("GET"))
+
+
+@pytest.mark.usefixtures("small_parts")
+def test_download_ranges_falls_back_to_stream(
+    server: RangeServer,
+    payload: bytes,
+    tmp_path: pathlib.Path,
+) -> None:
+    server.honour_ranges = False
+    target = tmp_path / "data.bin"
+    digest = core.download(f"{server.url}data.bin", target, connections=4)
+    assert target.read_bytes() == payload
+    assert digest == core.hash_file(target)
+    (headers,) = server.get_requests("GET")
+    assert "Range" not in headers
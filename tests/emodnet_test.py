@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import json
+import logging
+import pathlib
+import pickle
+import shutil
+import typing as T
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+import xarray as xr
+
+import seareport_data as D
+from seareport_data import _cli
+from seareport_data import _core as core
+from seareport_data import _emodnet as emodnet
+
+# Constants
+TILES = ("A1_2022.nc", "A2_2022.nc", "B1_2022.nc")
+A1_VALUE = 1
+A2_VALUE = 2
+
+
+def write_tile(
+    path: pathlib.Path,
+    lon: float,
+    lat: float,
+    values: npt.NDArray[np.float32] | None = None,
+    *,
+    descending: bool = False,
+) -> xr.Dataset:
+    coords = {"lat": lat + np.arange(4) / 4, "lon": lon + np.arange(8) / 4}
+    if values is None:
+        values = np.zeros((4, 8), dtype=np.float32)
+    ds = xr.Dataset({"elevation": (("lat", "lon"), values)}, coords=coords)
+    if descending:
+        ds = ds.isel(lat=slice(None, None, -1), lon=slice(None, None, -1))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ds.to_netcdf(path, engine="h5netcdf")
+    return ds
+
+
+def write_registry(tmp_path: pathlib.Path, names: T.Iterable[str]) -> str:
+    record = {"base_url": "http://127.0.0.1:1/", "hashes": {name: f"hash-{name}" for name in names}}
+    path = tmp_path / "registry.json"
+    path.write_text(json.dumps({"EMODnet": {"2022": record}}))
+    return path.as_uri()
+
+
+@pytest.fixture
+def registry_url(tmp_path: pathlib.Path, cache_dir: pathlib.Path) -> str:
+    # Only the first tile is in the cache
+    _ = write_tile(cache_dir / "EMODnet" / "2022" / TILES[0], lon=0, lat=50)
+    return write_registry(tmp_path, TILES)
+
+
+def test_tiles_that_are_not_cached_are_not_indexed(
+    registry_url: str,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    with caplog.at_level(logging.INFO):
+        paths = D.emodnet(registry_url=registry_url, download=False, check_hash=False, as_paths=True)
+    assert [path.name for path in paths] == list(TILES)
+    assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
+    resources = emodnet.get_emodnet_resources(core.load_registry(registry_url), "2022")
+    assert [emodnet.load_grid(resource) is not None for resource in resources] == [True, False, False]
+
+
+def test_mosaic_of_tiles_that_are_not_cached(registry_url: str) -> None:
+    with pytest.raises(ValueError, match="2 tiles are not in the cache"):
+        D.emodnet_ds(registry_url=registry_url, download=False, check_hash=False)
+
+
+def test_tiles_are_selected_by_the_grids_of_the_registry(
+    tmp_path: pathlib.Path,
+    cache_dir: pathlib.Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    hashes = {}
+    for index, name in enumerate(TILES):
+        path = cache_dir / "EMODnet" / "2022" / name
+        _ = write_tile(path, lon=10 * index, lat=50)
+        hashes[name] = core.hash_file(path)
+    registry_path = tmp_path / "registry.json"
+    registry_path.write_text(json.dumps({"EMODnet": {"2022": {"base_url": "tiles/", "hashes": hashes}}}))
+    assert _cli.main(["index-emodnet", str(registry_path)]) == 0
+    registry = json.loads(registry_path.read_text())
+    assert registry["EMODnet"]["2022"]["base_url"] == "tiles/"
+    assert set(registry["EMODnet"]["2022"]["grids"]) == set(TILES)
+    # Without the tiles nor their index, the grids of the registry still select the tiles
+    shutil.rmtree(cache_dir)
+    with caplog.at_level(logging.INFO):
+        paths = D.emodnet(
+            registry_url=registry_path.as_uri(),
+            download=False,
+            check_hash=False,
+            bbox=(10.5, 50, 11, 50.5),
+            as_paths=True,
+        )
+    assert [path.name for path in paths] == [TILES[1]]
+    assert "unknown" not in caplog.text
+
+
+@pytest.fixture
+def tiles(cache_dir: pathlib.Path) -> dict[str, xr.Dataset]:
+    # A2 overlaps the eastern half of A1, whose overlap has a missing cell, and a gap separates them from B1,
+    # whose latitudes and longitudes are descending
+    directory = cache_dir / "EMODnet" / "2022"
+    a1 = np.full((4, 8), A1_VALUE, dtype=np.float32)
+    a1[1, 5] = np.nan
+    b1 = np.arange(32, dtype=np.float32).reshape(4, 8)
+    return {
+        "A1_2022.nc": write_tile(directory / "A1_2022.nc", lon=0, lat=50, values=a1),
+        "A2_2022.nc": write_tile(
+            directory / "A2_2022.nc",
+            lon=1,
+            lat=50,
+            values=np.full((4, 8), 2, dtype=np.float32),
+        ),
+        "B1_2022.nc": write_tile(directory / "B1_2022.nc", lon=3, lat=51, values=b1, descending=True),
+    }
+
+
+def open_mosaic(tmp_path: pathlib.Path, names: T.Iterable[str], **kwargs: T.Any) -> xr.Dataset:
+    registry_url = write_registry(tmp_path, names)
+    return D.emodnet_ds(registry_url=registry_url, download=False, check_hash=False, **kwargs)
+
+
+def test_mosaic_values(tmp_path: pathlib.Path, tiles: dict[str, xr.Dataset]) -> None:
+    # Chunks that don't match the tiles, so that most chunks are read from several tiles
+    ds = open_mosaic(tmp_path, reversed(list(tiles)), chunks={"lat": 3, "lon": 5})
+    assert len(ds.elevation.data.chunks[1]) > 1
+    np.testing.assert_array_equal(ds.lat, 50 + np.arange(8) / 4)
+    np.testing.assert_array_equal(ds.lon, np.arange(20) / 4)
+    elevation = ds.elevation.compute()
+    # The tiles are in place, whatever the order of their axes
+    b1 = tiles["B1_2022.nc"].elevation
+    xr.testing.assert_equal(elevation.sel(lat=b1.lat, lon=b1.lon), b1.astype(np.float32))
+    assert (elevation.sel(lat=slice(None, 50.75), lon=slice(None, 0.75)) == A1_VALUE).all()
+    assert (elevation.sel(lat=slice(None, 50.75), lon=slice(2, 2.75)) == A2_VALUE).all()
+    # A1 comes first by name, whatever the order of the registry, but its missing cells are taken from A2
+    overlap = elevation.sel(lat=slice(None, 50.75), lon=slice(1, 1.75))
+    assert int((overlap == A2_VALUE).sum()) == 1
+    assert overlap.sel(lat=50.25, lon=1.25) == A2_VALUE
+    assert int((overlap == A1_VALUE).sum()) == overlap.size - 1
+    # The cells outside every tile are missing
+    assert elevation.sel(lat=slice(None, 50.75), lon=slice(3, None)).isnull().all()
+    assert elevation.sel(lat=slice(51, None), lon=slice(None, 2.75)).isnull().all()
+    # A1 and A2 span 12 columns
+    assert int(elevation.notnull().sum()) == 4 * 12 + 32
+    # Subsets read the same values
+    subset = ds.elevation.isel(lat=slice(2, 7), lon=slice(4, 17)).values
+    np.testing.assert_array_equal(subset, elevation.isel(lat=slice(2, 7), lon=slice(4, 17)).values)
+    ds.close()
+
+
+def test_mosaic_subset(tmp_path: pathlib.Path, tiles: dict[str, xr.Dataset]) -> None:
+    ds = open_mosaic(tmp_path, tiles, bbox=(3.2, 51.2, 4, 51.5))
+    b1 = tiles["B1_2022.nc"].elevation
+    xr.testing.assert_equal(ds.elevation.compute(), b1.sel(lat=ds.lat, lon=ds.lon).astype(np.float32))
+
+
+def test_mosaic_is_picklable(tmp_path: pathlib.Path, tiles: dict[str, xr.Dataset]) -> None:
+    ds = open_mosaic(tmp_path, tiles, chunks={"lat": 3, "lon": 5})
+    expected = ds.elevation.compute()
+    # The copy reopens the tiles, even when the original mosaic is closed
+    copy = pickle.loads(pickle.dumps(ds))  # noqa: S301
+    ds.close()
+    xr.testing.assert_identical(copy.elevation.compute(), expected)
+    copy.close()
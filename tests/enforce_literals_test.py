@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import asyncio
+import collections.abc
+import typing as T
+
+import pytest
+
+import seareport_data as D
+
+
+@pytest.mark.parametrize(
+    ("accessor", "args"),
+    [
+        pytest.param(D.gebco, ("bogus",), id="gebco"),
+        pytest.param(D.gebco_ds, ("ice", "1999"), id="gebco_ds"),
+        pytest.param(D.etopo, ("bedrock", "1sec"), id="etopo"),
+        pytest.param(D.copernicus, ("bogus",), id="copernicus"),
+        pytest.param(D.gshhg, ("low", "9"), id="gshhg"),
+        pytest.param(D.osm, ("bogus",), id="osm"),
+        pytest.param(D.srtm15p, ("1.0",), id="srtm15p"),
+        pytest.param(D.emodnet, ("1999",), id="emodnet"),
+    ],
+)
+def test_invalid_literal(accessor: collections.abc.Callable[..., T.Any], args: tuple[str, ...]) -> None:
+    with pytest.raises(AssertionError, match="is not in"):
+        accessor(*args, download=False)
+
+
+def test_invalid_literal_async() -> None:
+    with pytest.raises(AssertionError, match="is not in"):
+        asyncio.run(D.agebco(T.cast(T.Any, "bogus"), download=False))
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import dataclasses
+import os
+import typing as T
+
+import httpx
+import pytest
+import stamina
+
+import seareport_data as D
+from seareport_data import _core as core
+from seareport_data._fetch import HostLimiter
+
+if T.TYPE_CHECKING:
+    from seareport_data._testing import RangeServer
+
+# Constants
+SIZE = 4096
+FILES = 6
+WORKERS = 3
+DELAY = 0.2
+
+
+def get_resources(server: RangeServer, count: int = FILES, host: str = "127.0.0.1") -> list[core.Resource]:
+    resources = []
+    for index in range(count):
+        path = server.directory / f"{index}.bin"
+        if not path.exists():
+            path.write_bytes(os.urandom(SIZE))
+        resource = core.Resource(
+            dataset="TEST",
+            version="1",
+            name=str(index),
+            url=f"http://{host}:{server.server_port}/{path.name}",
+            path=f"TEST/1/{path.name}",
+            hash=core.hash_file(path),
+        )
+        resources.append(resource)
+    return resources
+
+
+def test_fetch_many(server: RangeServer) -> None:
+    server.delay = DELAY
+    resources = get_resources(server)
+    called: list[D.FetchResult] = []
+    results = D.fetch_many(resources, max_workers=WORKERS, callback=called.append)
+    assert [result.resource for result in results] == resources
+    for result in results:
+        assert result.ok, result.error
+        assert result.path is not None
+        assert result.path.read_bytes() == (server.directory / result.path.name).read_bytes()
+        assert result.elapsed >= DELAY
+    assert sorted(id(result) for result in called) == sorted(id(result) for result in results)
+    # The resources are fetched concurrently, but by no more than `max_workers` at a time
+    assert 1 < server.max_active <= WORKERS
+    # The cached resources are not downloaded again
+    assert all(result.ok for result in D.fetch_many(resources, max_workers=WORKERS))
+    assert len(server.get_requests("GET")) == FILES
+
+
+def test_fetch_many_limits_the_requests_per_host(server: RangeServer) -> None:
+    server.delay = DELAY
+    resources = get_resources(server)
+    results = D.fetch_many(resources, max_workers=WORKERS, per_host_limit=1)
+    assert all(result.ok for result in results)
+    assert server.max_active == 1
+    # The same server is another host by name
+    server.max_active = 0
+    resources = get_resources(server, host="127.0.0.1") + get_resources(server, host="localhost")
+    resources = [
+        dataclasses.replace(resource, path=f"TEST/2/{index}") for index, resource in enumerate(resources)
+    ]
+    results = D.fetch_many(resources, max_workers=WORKERS, per_host_limit=1)
+    assert all(result.ok for result in results)
+    assert server.max_active == 2  # noqa: PLR2004
+
+
+def test_fetch_many_shares_the_limit_of_a_host_only() -> None:
+    limiter = HostLimiter(2)
+    assert limiter.get("http://example.com/a") is limiter.get("http://example.com/b?c=d")
+    assert limiter.get("http://example.com/a") is not limiter.get("http://example.org/a")
+    assert limiter.get("http://example.com:8080/a") is not limiter.get("http://example.com/a")
+
+
+def test_fetch_many_downloads_shared_files_once(server: RangeServer) -> None:
+    (resource,) = get_resources(server, count=1)
+    results = D.fetch_many([resource] * WORKERS, max_workers=WORKERS)
+    assert all(result.ok for result in results)
+    assert len({result.path for result in results}) == 1
+    assert len(server.get_requests("GET")) == 1
+
+
+def test_fetch_many_reports_errors(server: RangeServer) -> None:
+    missing, corrupted, intact = get_resources(server, count=3)
+    (server.directory / missing.url.rpartition("/")[2]).unlink()
+    corrupted = dataclasses.replace(corrupted, hash="0" * 32)
+    with stamina.set_testing(True):
+        results = D.fetch_many([missing, corrupted, intact], max_workers=WORKERS)
+    assert [result.ok for result in results] == [False, False, True]
+    assert isinstance(results[0].error, httpx.HTTPStatusError)
+    assert results[0].path is None
+    assert isinstance(results[1].error, ValueError)
+    assert results[2].path is not None
+    assert results[2].path.exists()
+
+
+@pytest.mark.parametrize("workers", [1, WORKERS])
+def test_fetch_many_without_resources(workers: int) -> None:
+    assert D.fetch_many([], max_workers=workers) == []
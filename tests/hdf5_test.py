@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import pathlib
+import pickle
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from seareport_data import _hdf5 as hdf5
+
+
+@pytest.fixture
+def path(tmp_path: pathlib.Path) -> pathlib.Path:
+    path = tmp_path / "tiled.nc"
+    ds = xr.Dataset({"z": (("lat", "lon"), np.arange(10000.0).reshape(100, 100))})
+    ds.to_netcdf(path, engine="h5netcdf", encoding={"z": {"chunksizes": (10, 10), "zlib": True}})
+    return path
+
+
+def test_variables_are_not_pinned_by_default(path: pathlib.Path) -> None:
+    with hdf5.open_dataset(path, {"engine": "h5netcdf"}) as ds:
+        assert not isinstance(ds._close, hdf5.PinnedVariables)
+
+
+def test_pinned_variables(path: pathlib.Path) -> None:
+    with hdf5.open_dataset(path, {"engine": "h5netcdf", "pin_chunk_cache": True}) as ds:
+        pinned = ds._close
+        assert isinstance(pinned, hdf5.PinnedVariables)
+        assert pinned.h5file.id.valid
+        # The datasets derived from it and its copies in other processes keep the variables pinned
+        assert isinstance(ds.isel(lat=slice(0, 5))._close, hdf5.PinnedVariables)
+        with pickle.loads(pickle.dumps(ds)) as copy:  # noqa: S301
+            assert isinstance(copy._close, hdf5.PinnedVariables)
+            assert float(copy.z.sum()) == float(ds.z.sum())
+    assert not pinned.h5file.id.valid
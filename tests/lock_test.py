@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import pathlib
+import socket
+import subprocess
+import sys
+import time
+import typing as T
+
+import pytest
+
+from seareport_data import _lock
+from seareport_data._lock import FileLock
+from seareport_data._lock import get_lock_path
+from seareport_data._lock import LockTimeoutError
+
+# Constants
+PROCESSES = 4
+ITERATIONS = 20
+STALE_AFTER = 0.3
+
+
+def hold(path: str, marker: str, iterations: int, dead_pid: int) -> int:
+    """
+    Acquire the lock `iterations` times, and return how many times another process was holding it too.
+
+    Every other time, the lock is left behind as if the process had been killed, so that the other
+    processes race to break it.
+    """
+    overlaps = 0
+    for iteration in range(iterations):
+        lock = FileLock(path, poll_interval=0.01, timeout=60)
+        lock.acquire()
+        try:
+            fd = os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            overlaps += 1
+        else:
+            os.close(fd)
+            time.sleep(0.002)
+            os.remove(marker)
+        if iteration % 2 == 0:
+            write_lock(pathlib.Path(path), f"{lock.owner['token']}-dead", dead_pid)
+        lock.release()
+    return overlaps
+
+
+def write_lock(path: pathlib.Path, token: str, pid: int) -> None:
+    owner = {"token": token, "host": socket.gethostname(), "pid": pid}
+    get_lock_path(path).write_text(json.dumps(owner))
+
+
+def get_dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    _ = process.wait()
+    return process.pid
+
+
+def test_one_holder_at_a_time_with_stale_takeover(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "data.bin"
+    # A lock that was left by a killed process of this host, which all the processes want to break
+    dead_pid = get_dead_pid()
+    write_lock(path, "stale", dead_pid)
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=PROCESSES, mp_context=context) as executor:
+        futures = [
+            executor.submit(hold, os.fspath(path), os.fspath(tmp_path / "marker"), ITERATIONS, dead_pid)
+            for _ in range(PROCESSES)
+        ]
+        overlaps = [future.result() for future in futures]
+    assert overlaps == [0] * PROCESSES
+    assert not list(tmp_path.iterdir())
+
+
+def test_stale_lock_of_another_host_is_broken(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "data.bin"
+    # The modification time of the lock doesn't change, as measured by the waiter
+    get_lock_path(path).write_text(json.dumps({"token": "stale", "host": "elsewhere", "pid": 1}))
+    start = time.monotonic()
+    with FileLock(path, stale_after=STALE_AFTER, poll_interval=0.05, timeout=10) as lock:
+        assert lock.holds()
+    assert time.monotonic() - start >= STALE_AFTER
+    assert not list(tmp_path.iterdir())
+
+
+def test_live_lock_is_not_broken(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "data.bin"
+    with FileLock(path, stale_after=STALE_AFTER) as holder:
+        waiter = FileLock(path, stale_after=STALE_AFTER, poll_interval=0.05, timeout=4 * STALE_AFTER)
+        with pytest.raises(LockTimeoutError):
+            waiter.acquire()
+        assert holder.holds()
+
+
+@pytest.mark.parametrize("newcomer", [False, True])
+def test_lock_replaced_while_breaking_is_not_removed(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    *,
+    newcomer: bool,
+) -> None:
+    path = tmp_path / "data.bin"
+    lock_path = get_lock_path(path)
+    stale = {"token": "stale", "host": socket.gethostname(), "pid": get_dead_pid()}
+    # A new holder replaced the stale lock right after the waiter checked it
+    write_lock(path, "live", os.getpid())
+    original = _lock.read_owner
+
+    def read_owner(lock_path_: pathlib.Path) -> dict[str, T.Any] | None:
+        if lock_path_ == lock_path:
+            return stale
+        if newcomer:
+            # Yet another process creates the lock while it is moved aside
+            write_lock(path, "newcomer", os.getpid())
+        return original(lock_path_)
+
+    with monkeypatch.context() as context:
+        context.setattr(_lock, "read_owner", read_owner)
+        FileLock(path).break_stale()
+    # The live lock was moved aside, and put back unless the newcomer holds the lock
+    tokens = sorted(original(path_)["token"] for path_ in tmp_path.iterdir())  # type: ignore[index]
+    assert tokens == (["live", "newcomer"] if newcomer else ["live"])
+    assert original(lock_path)["token"] == ("newcomer" if newcomer else "live")  # type: ignore[index]
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from seareport_data import _overview as overview
+
+# Constants
+LEVELS = 3
+MISSING = 0.3
+
+
+@pytest.fixture
+def ds() -> xr.Dataset:
+    rng = np.random.default_rng(0)
+    # Odd sizes give partial blocks, and the NaNs (e.g. a land mask) give blocks with fewer values
+    n_lat, n_lon = 37, 53
+    z = rng.normal(0, 1000, (n_lat, n_lon)).astype(np.float32)
+    z[rng.random(z.shape) < MISSING] = np.nan
+    z[:10, :20] = np.nan
+    coords = {"lat": np.linspace(-90, 90, n_lat), "lon": np.linspace(-180, 180, n_lon)}
+    ds: xr.Dataset = xr.Dataset({"z": (("lat", "lon"), z)}, coords=coords).chunk(16)
+    return ds
+
+
+def test_levels_match_coarsen(ds: xr.Dataset) -> None:
+    level = ds
+    for k in range(1, LEVELS + 1):
+        level = overview.coarsen(level, is_overview=k > 1).compute()
+        expected = ds.z.coarsen(lat=2**k, lon=2**k, boundary="pad")
+        np.testing.assert_allclose(level.z, expected.mean(), rtol=1e-5, atol=1e-3)
+        np.testing.assert_array_equal(level.z_min, expected.min())
+        np.testing.assert_array_equal(level.z_max, expected.max())
+        np.testing.assert_array_equal(level.z_count, expected.count())
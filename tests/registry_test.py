@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import json
+import os
+import typing as T
+
+import httpx
+import pytest
+
+from seareport_data import _core as core
+
+if T.TYPE_CHECKING:
+    from seareport_data._testing import RangeServer
+
+
+def write_registry(server: RangeServer, version: str = "2.6") -> str:
+    registry = {"SRTM15+": {version: {"url": "srtm.nc", "filename": "srtm.nc", "hash": ""}}}
+    path = server.directory / "registry.json"
+    path.write_text(json.dumps(registry))
+    # A distinct modification time, so that the ETag changes
+    os.utime(path, ns=(path.stat().st_mtime_ns + 10**9,) * 2)
+    return f"{server.url}registry.json"
+
+
+def test_remote_registry_is_memoized(server: RangeServer) -> None:
+    registry_url = write_registry(server)
+    registry = core.load_registry(registry_url)
+    # Relative URLs are resolved against the URL of the registry
+    assert registry["SRTM15+"]["2.6"]["url"] == f"{server.url}srtm.nc"
+    assert core.load_registry(registry_url) is registry
+    # The copy on disk is used by other processes, i.e. without the memo
+    core.clear_registry_cache()
+    assert core.load_registry(registry_url) == registry
+    assert len(server.get_requests("GET")) == 1
+
+
+def test_stale_registry_is_revalidated(server: RangeServer, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SEAREPORT_DATA_REGISTRY_TTL", "0")
+    registry_url = write_registry(server)
+    registry = core.load_registry(registry_url)
+    first, second = core.load_registry(registry_url), core.load_registry(registry_url)
+    assert first == second == registry
+    requests = server.get_requests("GET")
+    etag = httpx.head(registry_url).headers["ETag"]
+    assert [headers.get("If-None-Match") for headers in requests] == [None, etag, etag]
+    # A modified registry is downloaded again
+    _ = write_registry(server, version="2.7")
+    assert list(core.load_registry(registry_url)["SRTM15+"]) == ["2.7"]
+
+
+def test_cached_registry_is_used_offline(server: RangeServer, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SEAREPORT_DATA_REGISTRY_TTL", "0")
+    registry_url = write_registry(server)
+    registry = core.load_registry(registry_url)
+    server.close()
+    core.close_httpx_client()
+    assert core.load_registry(registry_url) == registry
+    with pytest.raises(httpx.HTTPError):
+        core.load_registry(registry_url.replace("registry.json", "other.json"))
+
+
+def test_packaged_registry_is_loaded_once() -> None:
+    assert core.load_registry() is core.load_registry()
+    assert core.load_packaged_registry.cache_info().misses == 1
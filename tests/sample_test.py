@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import pathlib
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+import xarray as xr
+
+from seareport_data import _sample as sample
+
+# Constants
+POINTS = 5000
+
+
+@pytest.fixture
+def grid() -> xr.DataArray:
+    # A global grid of 1 degree cells, whose longitudes fit in a single block
+    lat = np.arange(-89.5, 90)
+    lon = np.arange(-179.5, 180)
+    z = np.broadcast_to(lon, (len(lat), len(lon))).astype(np.float32)
+    return xr.DataArray(z, dims=("lat", "lon"), coords={"lat": lat, "lon": lon}, name="z")
+
+
+def test_sample_across_antimeridian_in_a_single_block(grid: xr.DataArray) -> None:
+    # A single block has 2 edges on each axis
+    rows, cols = sample.get_block_edges(grid)
+    assert [len(rows), len(cols)] == [2, 2]
+    lons = np.array([179.9, -179.9, 180.0, 539.9])
+    values = sample.sample(np.column_stack([lons, np.full(len(lons), 0.25)]), grid)
+    # Between the cells at 179.5 and at -179.5 (i.e. 180.5)
+    offset = (lons - 179.5) % 360
+    np.testing.assert_allclose(values, (1 - offset) * 179.5 - offset * 179.5, rtol=1e-5)
+
+
+@pytest.fixture
+def random_grid() -> xr.DataArray:
+    # A global grid with blocks of uneven sizes, and dask chunks instead of on-disk chunks
+    rng = np.random.default_rng(0)
+    lat = np.arange(-89.5, 90)
+    lon = np.arange(-179.5, 180)
+    z = rng.normal(0, 1000, (len(lat), len(lon))).astype(np.float32)
+    grid = xr.DataArray(z, dims=("lat", "lon"), coords={"lat": lat, "lon": lon}, name="z")
+    chunked: xr.DataArray = grid.chunk(lat=50, lon=70)
+    return chunked
+
+
+@pytest.fixture
+def points() -> npt.NDArray[np.float64]:
+    # Away from the antimeridian and the poles, where `interp()` doesn't wrap
+    rng = np.random.default_rng(1)
+    return np.column_stack([rng.uniform(-179, 179, POINTS), rng.uniform(-89, 89, POINTS)])
+
+
+def interp(grid: xr.DataArray, points: npt.NDArray[np.float64], method: str) -> npt.NDArray[np.float32]:
+    lon = xr.DataArray(points[:, 0], dims="point")
+    lat = xr.DataArray(points[:, 1], dims="point")
+    if method == "nearest":
+        values: npt.NDArray[np.float32] = grid.sel(lon=lon, lat=lat, method="nearest").values
+    else:
+        values = grid.compute().interp(lon=lon, lat=lat, method="linear").values
+    return values
+
+
+@pytest.mark.parametrize("method", ["bilinear", "nearest"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_sample_matches_xarray(
+    random_grid: xr.DataArray,
+    points: npt.NDArray[np.float64],
+    method: sample.Method,
+    *,
+    descending: bool,
+) -> None:
+    assert len(sample.get_block_edges(random_grid)[0]) > 2  # noqa: PLR2004
+    expected = interp(random_grid, points, method)
+    if descending:
+        random_grid = random_grid.isel(lat=slice(None, None, -1))
+    np.testing.assert_allclose(
+        sample.sample(points, random_grid, method=method),
+        expected,
+        rtol=1e-5,
+        atol=1e-3,
+    )
+
+
+def test_sample_missing_cells(random_grid: xr.DataArray) -> None:
+    grid = random_grid.compute()
+    grid[10, 20] = np.nan
+    # In the middle of the 4 cells around the missing one, and at the center of the cell next to it
+    points = np.array([[-160.0, -79.0], [-158.5, -79.5]])
+    values = sample.sample(points, grid)
+    assert np.isnan(values[0])
+    np.testing.assert_allclose(values[1], grid[10, 21])
+    values = sample.sample(points, grid, skipna=True)
+    np.testing.assert_allclose(values[0], np.mean([grid[10, 19], grid[11, 19], grid[11, 20]]), rtol=1e-5)
+    np.testing.assert_allclose(values[1], grid[10, 21])
+    assert np.isnan(sample.sample([[-159.5, -79.5]], grid, method="nearest")).all()
+
+
+def test_sample_fill_value(random_grid: xr.DataArray) -> None:
+    # A regional grid doesn't wrap around the antimeridian
+    grid = random_grid.sel(lon=slice(-50, 50))
+    points = np.array([[0.0, 0.0], [60.0, 0.0], [0.0, np.nan], [np.nan, 0.0]])
+    values = sample.sample(points, grid, fill_value=-1)
+    assert not np.isnan(values[0])
+    assert values[1:].tolist() == [-1, -1, -1]
+    assert np.isnan(sample.sample(points, grid)[1:]).all()
+
+
+def test_sample_in_processes(
+    random_grid: xr.DataArray,
+    points: npt.NDArray[np.float64],
+    tmp_path: pathlib.Path,
+) -> None:
+    path = tmp_path / "grid.nc"
+    random_grid.to_netcdf(path, engine="h5netcdf", encoding={"z": {"chunksizes": (40, 60)}})
+    with xr.open_dataset(path, engine="h5netcdf", chunks={}) as ds:
+        expected = sample.sample(points, ds)
+        np.testing.assert_array_equal(sample.sample(points, ds, max_workers=2), expected)
+    np.testing.assert_allclose(expected, interp(random_grid, points, "bilinear"), rtol=1e-5, atol=1e-3)
+
+
+def test_sample_rejects_invalid_arguments(grid: xr.DataArray) -> None:
+    with pytest.raises(ValueError, match="method"):
+        sample.sample([[0, 0]], grid, method="cubic")  # type: ignore[arg-type]
+    with pytest.raises(ValueError, match="pairs"):
+        sample.sample([[0, 0, 0]], grid)
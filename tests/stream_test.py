@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import collections.abc
+import gzip
+import io
+import os
+import struct
+import zipfile
+import zlib
+
+import pytest
+import zstandard
+
+from seareport_data import _stream as stream
+
+# Constants
+# Small chunks split the headers, the compressed data and the data descriptors
+CHUNK_SIZE = 7
+PAYLOAD = os.urandom(1000) + b"seareport" * 1000
+MEMBERS = {"a.txt": b"first member", "b.txt": PAYLOAD, "c.txt": b"last member"}
+
+
+def split(data: bytes, size: int = CHUNK_SIZE) -> collections.abc.Iterator[bytes]:
+    return (data[offset : offset + size] for offset in range(0, len(data), size))
+
+
+def read_member(archive: bytes, filename: str) -> bytes:
+    return b"".join(stream.iter_zip_member(split(archive), filename))
+
+
+class Unseekable(io.RawIOBase):
+    """
+    A write-only stream, which makes `zipfile` write data descriptors, like streaming writers do.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = io.BytesIO()
+
+    def writable(self) -> bool:  # type: ignore[explicit-override]
+        return True
+
+    def write(self, data: bytes) -> int:  # type: ignore[override,explicit-override]
+        return self.buffer.write(data)
+
+
+def write_zip(compression: int, *, streamed: bool = False, force_zip64: bool = False) -> bytes:
+    output = Unseekable() if streamed else io.BytesIO()
+    with zipfile.ZipFile(output, "w", compression=compression) as archive:
+        for name, data in MEMBERS.items():
+            with archive.open(name, "w", force_zip64=force_zip64) as member:
+                member.write(data)
+    return output.buffer.getvalue() if isinstance(output, Unseekable) else output.getvalue()
+
+
+def write_streamed_zip64(members: dict[str, bytes]) -> bytes:
+    """
+    Return an archive like the ones of `zip -fz` or Java: the local headers have sizes of 0 and a zip64 extra
+    field, and the sizes are in 24 byte data descriptors.
+    """
+    parts: list[bytes] = []
+    for name, data in members.items():
+        compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        compressed = compressor.compress(data) + compressor.flush()
+        extra = struct.pack("<HHQQ", stream.ZIP64_EXTRA_ID, 16, 0, 0)
+        header = stream.ZIP_LOCAL_HEADER.pack(45, 0x0008, 8, 0, 0, 0, 0, 0, len(name), len(extra))
+        crc = zlib.crc32(data)
+        descriptor = struct.pack("<IQQ", crc, len(compressed), len(data))
+        parts += [b"PK\x03\x04", header, name.encode(), extra, compressed, b"PK\x07\x08", descriptor]
+    # The central directory isn't read
+    parts.append(b"PK\x01\x02" + bytes(42))
+    return b"".join(parts)
+
+
+@pytest.mark.parametrize(
+    ("compression", "streamed", "force_zip64"),
+    [
+        pytest.param(zipfile.ZIP_STORED, False, False, id="stored"),
+        pytest.param(zipfile.ZIP_DEFLATED, False, False, id="deflate"),
+        pytest.param(zipfile.ZIP_BZIP2, False, False, id="bzip2"),
+        pytest.param(zipfile.ZIP_DEFLATED, True, False, id="deflate-data-descriptor"),
+        pytest.param(zipfile.ZIP_DEFLATED, False, True, id="deflate-zip64"),
+        pytest.param(zipfile.ZIP_DEFLATED, True, True, id="deflate-data-descriptor-zip64"),
+    ],
+)
+def test_iter_zip_member(compression: int, *, streamed: bool, force_zip64: bool) -> None:
+    archive = write_zip(compression, streamed=streamed, force_zip64=force_zip64)
+    for name, data in MEMBERS.items():
+        assert read_member(archive, name) == data
+
+
+def test_iter_zip_member_of_streamed_zip64_archive() -> None:
+    archive = write_streamed_zip64(MEMBERS)
+    for name, data in MEMBERS.items():
+        assert read_member(archive, name) == data
+
+
+def test_iter_zip_member_of_missing_member() -> None:
+    with pytest.raises(ValueError, match="Member not found"):
+        read_member(write_zip(zipfile.ZIP_DEFLATED), "missing.txt")
+
+
+def test_misaligned_member_is_unsupported() -> None:
+    # A member that ends elsewhere than where its header says makes the next header unreadable
+    archive = bytearray(write_zip(zipfile.ZIP_STORED))
+    first = archive.index(b"first member")
+    archive[first:first] = b"garbage"
+    with pytest.raises(stream.UnsupportedArchiveError):
+        read_member(bytes(archive), "b.txt")
+
+
+def test_stored_member_with_data_descriptor_is_unsupported() -> None:
+    with pytest.raises(stream.UnsupportedArchiveError):
+        read_member(write_zip(zipfile.ZIP_STORED, streamed=True), "b.txt")
+
+
+def test_corrupted_member_fails_the_crc_check() -> None:
+    archive = bytearray(write_zip(zipfile.ZIP_STORED))
+    first = archive.index(b"seareport")
+    archive[first] ^= 0xFF
+    with pytest.raises(ValueError, match="CRC mismatch"):
+        read_member(bytes(archive), "b.txt")
+
+
+def test_iter_gzip_of_multiple_members() -> None:
+    data = gzip.compress(PAYLOAD) + gzip.compress(b"second member")
+    assert b"".join(stream.iter_gzip(split(data))) == PAYLOAD + b"second member"
+
+
+def test_iter_zstd_of_multiple_frames() -> None:
+    data = zstandard.compress(PAYLOAD) + zstandard.compress(b"second frame")
+    assert b"".join(stream.iter_zstd(split(data))) == PAYLOAD + b"second frame"
+
+
+def test_truncated_stream() -> None:
+    data = gzip.compress(PAYLOAD)
+    with pytest.raises(EOFError):
+        b"".join(stream.iter_gzip(split(data[:-10])))
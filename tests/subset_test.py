@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+import xarray as xr
+
+from seareport_data import _subset as subset
+
+# Constants
+LAT = np.arange(-10, 10.5, 1.0)
+
+
+def make_grid(lon: npt.NDArray[np.float64]) -> xr.Dataset:
+    # The values are the longitudes in [0, 360), so that they can be checked after stitching
+    z = np.broadcast_to(lon % 360, (len(LAT), len(lon)))
+    return xr.Dataset({"z": (("lat", "lon"), z)}, coords={"lat": LAT, "lon": lon})
+
+
+GRIDS = {
+    "cell-180": np.arange(-179.5, 180),
+    "node-180": np.arange(-180, 180.5),
+    "cell-360": np.arange(0.5, 360),
+    "node-360": np.arange(0, 360.5),
+}
+# The cells that overlap (or touch) 170..190, and the nodes within it
+EXPECTED = {"cell": np.arange(169.5, 191), "node": np.arange(170, 190.5)}
+
+
+@pytest.mark.parametrize("grid", GRIDS)
+@pytest.mark.parametrize("bbox", [(170, -5, -170, 5), (170, -5, 190, 5), (-190, -5, -170, 5)])
+@pytest.mark.parametrize("descending", [False, True])
+def test_subset_across_antimeridian(grid: str, bbox: subset.BBox, *, descending: bool) -> None:
+    ds = make_grid(GRIDS[grid])
+    if descending:
+        ds = ds.isel(lat=slice(None, None, -1), lon=slice(None, None, -1))
+    result = subset.subset_bbox(ds, bbox)
+    expected = EXPECTED[grid.partition("-")[0]]
+    # The longitudes keep increasing, without repeating the meridian of grids that include both -180 and 180
+    np.testing.assert_allclose(result.lon % 360, expected % 360)
+    assert (np.diff(result.lon) == 1).all()
+    np.testing.assert_allclose(result.z.isel(lat=0), expected % 360)
+    np.testing.assert_array_equal(result.lat, np.arange(-5, 6))
+
+
+def test_subset_with_buffer() -> None:
+    result = subset.subset_bbox(make_grid(GRIDS["node-180"]), (0, 0, 1, 1), buffer=2)
+    np.testing.assert_array_equal(result.lon, np.arange(-2, 4))
+    np.testing.assert_array_equal(result.lat, np.arange(-2, 4))
+
+
+def test_subset_of_the_whole_circle() -> None:
+    ds = make_grid(GRIDS["cell-360"])
+    assert subset.subset_bbox(ds, (-180, -5, 180, 5)).sizes["lon"] == ds.sizes["lon"]
+
+
+@pytest.mark.parametrize(
+    ("lon", "bbox", "expected"),
+    [
+        pytest.param(np.arange(160.5, 180), (170, -5, -170, 5), np.arange(169.5, 180), id="east-end"),
+        pytest.param(np.arange(-179.5, -160), (170, -5, -170, 5), np.arange(-179.5, -169), id="west-end"),
+        pytest.param(np.arange(160.5, 200), (170, -5, -170, 5), np.arange(169.5, 191), id="0-360"),
+        pytest.param(
+            np.arange(100.5, 120),
+            (-250, -5, -240, 5),
+            np.arange(109.5, 121),
+            id="other-convention",
+        ),
+    ],
+)
+def test_subset_regional_grid_across_antimeridian(
+    lon: npt.NDArray[np.float64],
+    bbox: subset.BBox,
+    expected: npt.NDArray[np.float64],
+) -> None:
+    result = subset.subset_bbox(make_grid(lon), bbox)
+    np.testing.assert_allclose(result.lon, expected[(expected >= lon[0]) & (expected <= lon[-1])])
+
+
+def test_subset_regional_grid_on_both_ends() -> None:
+    with pytest.raises(ValueError, match="both ends"):
+        subset.subset_bbox(make_grid(np.arange(-179.5, 170)), (160, -5, -170, 5))
+
+
+def test_subset_rejects_inverted_latitudes() -> None:
+    with pytest.raises(ValueError, match="lat_min"):
+        subset.subset_bbox(make_grid(GRIDS["cell-180"]), (0, 5, 1, -5))
+
+
+@pytest.mark.parametrize(
+    ("extent", "bbox", "expected"),
+    [
+        ((160, 0, 180, 10), (170, 0, -170, 10), True),
+        ((-180, 0, -160, 10), (170, 0, -170, 10), True),
+        ((-180, 0, -160, 10), (170, 0, 190, 10), True),
+        ((0, 0, 10, 10), (170, 0, 190, 10), False),
+        ((0, 0, 10, 10), (10, 10, 20, 20), True),
+        ((0, 0, 10, 10), (0, 11, 10, 20), False),
+        ((350, 0, 370, 10), (5, 0, 6, 10), True),
+    ],
+)
+def test_intersects(extent: subset.BBox, bbox: subset.BBox, *, expected: bool) -> None:
+    assert subset.intersects(extent, bbox) is expected
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import typing as T
+
+import pytest
+
+import seareport_data as D
+from seareport_data import _cache
+from seareport_data import _core as core
+from seareport_data._fetch import fetch
+
+if T.TYPE_CHECKING:
+    from seareport_data._testing import RangeServer
+
+# Constants
+SIZE = 4096
+RELATIVE_PATH = "TEST/1/data.bin"
+
+
+@pytest.fixture
+def tiers(
+    tmp_path: pathlib.Path,
+    cache_dir: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> list[pathlib.Path]:
+    dirs = [tmp_path / "mirror", tmp_path / "site", cache_dir]
+    monkeypatch.setenv("SEAREPORT_DATA_DIRS", os.pathsep.join(os.fspath(path) for path in dirs))
+    return dirs
+
+
+@pytest.fixture
+def resource(server: RangeServer, tiers: list[pathlib.Path]) -> core.Resource:
+    # Only the last read-only tier has the file, and the server doesn't
+    path = tiers[1] / RELATIVE_PATH
+    path.parent.mkdir(parents=True)
+    path.write_bytes(os.urandom(SIZE))
+    return core.Resource(
+        dataset="TEST",
+        version="1",
+        name="data",
+        url=f"{server.url}data.bin",
+        path=RELATIVE_PATH,
+        hash=core.hash_file(path),
+    )
+
+
+def test_cache_dirs(tiers: list[pathlib.Path]) -> None:
+    assert core.get_cache_dirs() == tiers
+    assert core.get_cache_path() == tiers[-1]
+
+
+def test_lookup_order(tiers: list[pathlib.Path]) -> None:
+    assert core.find_in_tiers(RELATIVE_PATH) is None
+    for tier in reversed(tiers):
+        (tier / RELATIVE_PATH).parent.mkdir(parents=True, exist_ok=True)
+        (tier / RELATIVE_PATH).write_bytes(b"")
+    # The writable tier is never returned, it is checked first by the callers
+    assert core.find_in_tiers(RELATIVE_PATH) == tiers[0] / RELATIVE_PATH
+
+
+def test_fetch_from_read_only_tier(
+    server: RangeServer,
+    tiers: list[pathlib.Path],
+    resource: core.Resource,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # As a user who can't write to the shared tiers (root can write anywhere)
+    monkeypatch.setattr(core, "is_writable_dir", lambda path: pathlib.Path(path).is_relative_to(tiers[-1]))
+    path = tiers[1] / RELATIVE_PATH
+    assert fetch(resource) == path
+    assert not server.requests
+    # The hash is stamped in the writable tier, and the tier is left as it was
+    stamp = core.read_stamp(path)
+    assert stamp is not None
+    assert stamp["hash"] == resource.hash
+    assert core.get_shadow_stamp_path(path).exists()
+    assert [item.name for item in path.parent.iterdir()] == [path.name]
+    # Changing the file invalidates the stamp
+    path.write_bytes(os.urandom(SIZE))
+    with pytest.raises(ValueError, match="hash"):
+        fetch(resource)
+    # Files of the read-only tiers are never evicted
+    assert D.evict(0) == []
+
+
+@pytest.mark.parametrize("mode", ["link", "copy"])
+def test_promote(
+    server: RangeServer,
+    tiers: list[pathlib.Path],
+    resource: core.Resource,
+    monkeypatch: pytest.MonkeyPatch,
+    mode: str,
+) -> None:
+    monkeypatch.setenv("SEAREPORT_DATA_PROMOTE", mode)
+    source = tiers[1] / RELATIVE_PATH
+    core.write_stamp(source, resource.hash, verified=True)
+    path = fetch(resource)
+    assert path == tiers[-1] / RELATIVE_PATH
+    assert path.read_bytes() == source.read_bytes()
+    assert path.samefile(source) is (mode == "link")
+    stamp = core.read_stamp(path)
+    assert stamp is not None
+    assert stamp["hash"] == resource.hash
+    assert _cache.get_access_path(path).exists()
+    assert not server.requests
+    # The promoted file is an entry of the writable tier, unlike the source
+    assert [entry.path for entry in D.list_cache()] == [path]
+
+
+def test_invalid_promote_mode(resource: core.Resource, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SEAREPORT_DATA_PROMOTE", "move")
+    with pytest.raises(ValueError, match="SEAREPORT_DATA_PROMOTE"):
+        fetch(resource)
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import json
+import os
+import pathlib
+import typing as T
+
+import httpx
+import pytest
+import stamina
+
+import validate_data
+from seareport_data import _core as core
+from seareport_data._fetch import HostLimiter
+
+if T.TYPE_CHECKING:
+    from seareport_data._testing import RangeServer
+
+# Constants
+SIZE = 1024
+SAMPLE = 2
+
+
+def get_resource(server: RangeServer, name: str, filename: str, **kwargs: T.Any) -> core.Resource:
+    path = server.directory / filename
+    return core.Resource(
+        dataset="TEST",
+        version="1",
+        name=name,
+        url=f"{server.url}{filename}",
+        path=f"TEST/1/{name}",
+        hash=core.hash_file(path) if path.exists() else "",
+        **kwargs,
+    )
+
+
+def count_gets(server: RangeServer) -> dict[str, int]:
+    return collections.Counter(path for method, path, _ in server.requests if method == "GET")
+
+
+@pytest.fixture
+def resources(server: RangeServer) -> dict[str, core.Resource]:
+    (server.directory / "a.bin").write_bytes(os.urandom(SIZE))
+    (server.directory / "b.bin").write_bytes(os.urandom(SIZE))
+    etag = core.get_httpx_client().head(f"{server.url}b.bin").headers["ETag"]
+    return {
+        "plain": get_resource(server, "plain", "a.bin"),
+        "validated": get_resource(server, "validated", "b.bin", size=SIZE, etag=etag),
+        "wrong_size": get_resource(server, "wrong_size", "a.bin", size=SIZE + 1),
+        "wrong_etag": get_resource(server, "wrong_etag", "b.bin", etag='"stale"'),
+        "missing": get_resource(server, "missing", "missing.bin"),
+    }
+
+
+def test_check_availability(server: RangeServer, resources: dict[str, core.Resource]) -> None:
+    records = validate_data.check_availability(list(resources.values()), workers=4, per_host_limit=2)  # type: ignore[no-untyped-call]
+    by_key = {record["key"]: record for record in records}
+    assert by_key["TEST/1/plain"]["ok"]
+    assert by_key["TEST/1/plain"]["size"] == SIZE
+    assert by_key["TEST/1/validated"]["ok"]
+    assert by_key["TEST/1/wrong_size"]["error"] == f"size {SIZE} != {SIZE + 1}"
+    assert by_key["TEST/1/wrong_etag"]["error"].startswith("ETag")
+    assert "404" in by_key["TEST/1/missing"]["error"]
+    # Nothing is downloaded: the servers that support HEAD only get HEAD requests, and the missing file
+    # gets a ranged GET for its first byte
+    assert count_gets(server) == {"/missing.bin": 1}
+
+
+def test_check_url_falls_back_to_ranged_get(
+    server: RangeServer,
+    resources: dict[str, core.Resource],
+) -> None:
+    server.head_allowed = False
+    with httpx.Client() as client:
+        record = validate_data.check_url(client, HostLimiter(1), resources["validated"])  # type: ignore[no-untyped-call]
+    assert record["ok"], record
+    assert record["size"] == SIZE
+    (headers,) = server.get_requests("GET")
+    assert headers["Range"] == "bytes=0-0"
+
+
+def test_validate_sample(server: RangeServer, resources: dict[str, core.Resource]) -> None:
+    sample = [resources["plain"], resources["validated"], resources["missing"]]
+    with stamina.set_testing(True):
+        records = validate_data.validate_sample(sample, sample=SAMPLE, workers=2, seed=0)  # type: ignore[no-untyped-call]
+    assert len(records) == SAMPLE
+    for record in records:
+        assert record["ok"] is (record["key"] != "TEST/1/missing")
+        assert record.get("size", SIZE) == SIZE
+    assert sum(count_gets(server).values()) == len(records)
+
+
+def test_check_url_without_range_support(
+    server: RangeServer,
+    resources: dict[str, core.Resource],
+) -> None:
+    # The server sends the whole file to the ranged GET, and its length is the size of the file
+    server.head_allowed = False
+    server.honour_ranges = False
+    with httpx.Client() as client:
+        record = validate_data.check_url(client, HostLimiter(1), resources["validated"])  # type: ignore[no-untyped-call]
+    assert record["ok"], record
+    assert record["size"] == SIZE
+    assert record["status"] == httpx.codes.OK
+
+
+def test_record_validators(
+    server: RangeServer,
+    resources: dict[str, core.Resource],
+    tmp_path: pathlib.Path,
+) -> None:
+    registry = {
+        "TEST": {
+            "1": {"url": resources["plain"].url, "hash": ""},
+            "2": {"base_url": server.url, "hashes": {"b.bin": "", "missing.bin": ""}},
+        },
+    }
+    path = tmp_path / "registry.json"
+    path.write_text(json.dumps(registry))
+    checked = [
+        resources["plain"],
+        dataclasses.replace(resources["validated"], version="2", etag=None, size=None),
+        dataclasses.replace(resources["missing"], version="2"),
+    ]
+    records = validate_data.check_availability(checked, workers=2, per_host_limit=2)  # type: ignore[no-untyped-call]
+    assert validate_data.record_validators(path, checked, records) == len(checked) - 1  # type: ignore[no-untyped-call]
+    updated = json.loads(path.read_text())["TEST"]
+    assert updated["1"]["size"] == SIZE
+    assert updated["1"]["etag"] == core.get_httpx_client().head(resources["plain"].url).headers["ETag"]
+    # The missing file isn't recorded
+    assert updated["2"]["sizes"] == {"b.bin": SIZE}
+    assert updated["2"]["etags"] == {"b.bin": resources["validated"].etag}
+    # The recorded validators are compared by the next checks
+    resource = core.Resource(
+        dataset="TEST",
+        version="2",
+        name="b",
+        url=f"{server.url}b.bin",
+        path="TEST/2/b",
+        hash="",
+        **core.get_upstream_validators(updated["2"], "b.bin"),
+    )
+    assert resource.size == SIZE
+    (record,) = validate_data.check_availability([resource], workers=1, per_host_limit=1)  # type: ignore[no-untyped-call]
+    assert record["ok"], record
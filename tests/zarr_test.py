@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+import pathlib
+import typing as T
+
+import numpy as np
+import pytest
+import xarray as xr
+
+import seareport_data as D
+from seareport_data import _core as core
+from seareport_data import _zarr
+from seareport_data._srtm15p import get_srtm15p_resource
+
+if T.TYPE_CHECKING:
+    from seareport_data._testing import RangeServer
+
+# Constants
+VERSION: T.Final = "2.6"
+SHAPE = (90, 180)
+CHUNK = 32
+
+
+def write_grid(path: pathlib.Path, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    z = rng.integers(-8000, 8000, SHAPE, dtype=np.int16)
+    coords = {"lat": np.linspace(-89, 89, SHAPE[0]), "lon": np.linspace(-179, 179, SHAPE[1])}
+    ds = xr.Dataset({"z": (("lat", "lon"), z)}, coords=coords)
+    ds.to_netcdf(path, engine="h5netcdf", encoding={"z": {"chunksizes": (30, 60), "zlib": True}})
+
+
+def write_registry(server: RangeServer, seed: int = 0) -> str:
+    path = server.directory / "srtm.nc"
+    write_grid(path, seed)
+    registry = {
+        "SRTM15+": {VERSION: {"url": "srtm.nc", "filename": "srtm.nc", "hash": core.hash_file(path)}},
+    }
+    registry_path = server.directory / "registry.json"
+    registry_path.write_text(json.dumps(registry))
+    return registry_path.as_uri()
+
+
+def get_resource(registry_url: str) -> core.Resource:
+    return get_srtm15p_resource(core.load_registry(registry_url), VERSION)
+
+
+def test_zarr_matches_netcdf(server: RangeServer, cache_dir: pathlib.Path) -> None:
+    registry_url = write_registry(server)
+    expected = D.srtm15p_ds(registry_url=registry_url)
+    ds = D.srtm15p_ds(registry_url=registry_url, format="zarr")
+    xr.testing.assert_equal(ds, expected)
+    store_path = cache_dir / _zarr.get_zarr_path(get_resource(registry_url))
+    assert ds.encoding["source"] == str(store_path)
+    # The store is an entry of the cache of its own
+    assert store_path in {entry.path for entry in D.list_cache()}
+
+
+def test_store_is_reused(server: RangeServer, monkeypatch: pytest.MonkeyPatch) -> None:
+    registry_url = write_registry(server)
+    first = D.srtm15p_ds(registry_url=registry_url, format="zarr")
+
+    def write_zarr(*_: T.Any, **__: T.Any) -> None:
+        raise AssertionError("The store was transcoded again")
+
+    monkeypatch.setattr(_zarr, "write_zarr", write_zarr)
+    xr.testing.assert_equal(D.srtm15p_ds(registry_url=registry_url, format="zarr"), first)
+
+
+def test_new_version_of_a_file_gets_a_new_store(server: RangeServer, cache_dir: pathlib.Path) -> None:
+    registry_url = write_registry(server, seed=0)
+    old = D.srtm15p_ds(registry_url=registry_url, format="zarr").load()
+    old_store = cache_dir / _zarr.get_zarr_path(get_resource(registry_url))
+    # The file is updated upstream, with a new hash, and the copy in the cache is replaced
+    registry_url = write_registry(server, seed=1)
+    core.clear_registry_cache()
+    (cache_dir / "SRTM15+" / VERSION / "srtm.nc").unlink()
+    new = D.srtm15p_ds(registry_url=registry_url, format="zarr").load()
+    new_store = cache_dir / _zarr.get_zarr_path(get_resource(registry_url))
+    assert new_store != old_store
+    assert old_store.exists()
+    assert not np.array_equal(new.z, old.z)
+    xr.testing.assert_equal(new, D.srtm15p_ds(registry_url=registry_url))
+
+
+def test_native_chunks(server: RangeServer) -> None:
+    registry_url = write_registry(server)
+    path = D.srtm15p(registry_url=registry_url, as_paths=True)[0]
+    resource = get_resource(registry_url)
+    # A store that was left behind by an interrupted transcoding is replaced
+    (path.parent / f"{path.name}.{resource.hash}.zarr.tmp").mkdir()
+    store_path = _zarr.transcode(resource, path, engine="h5netcdf", chunk=CHUNK)
+    layout = {variable.name: variable for variable in _zarr.read_zarr_layout(store_path)}
+    assert layout["z"].chunks == (CHUNK, CHUNK)
+    # The options of NetCDF files are ignored
+    ds = _zarr.open_zarr(store_path, {"chunks": "native", "engine": "h5netcdf"})
+    for sizes in ds.z.chunks:
+        assert all(size % CHUNK == 0 for size in sizes[:-1])
+    assert not list(path.parent.glob("*.tmp"))
@@ -4,13 +4,26 @@
 Validate all seareport_data resources by downloading them.
 This script downloads each resource and immediately cleans up to manage disk space.
 """
+
+import argparse
+import concurrent.futures
+import datetime as dt
 import functools
+import json
+import operator
 import os
+import pathlib
+import random
 import shutil
 import sys
+import time
 from itertools import product
 
+import httpx
+
 import seareport_data as D
+from seareport_data._core import load_registry
+from seareport_data._fetch import HostLimiter
 
 
 def clean_data_dir():
@@ -71,27 +84,16 @@ def generate_all_resources():
         resources[key] = lambda d=dataset: D.rtopo_ds(d)
 
     # SRTM15+ - no options
-    resources["SRTM15+"] = lambda: D.srtm15p_ds()
+    resources["SRTM15+"] = D.srtm15p_ds
 
     # UTM - no options
-    resources["UTM"] = lambda: D.utm_df()
+    resources["UTM"] = D.utm_df
 
     return resources
 
 
-def main():
-    """Main validation function."""
-    data_dir = os.environ.get("SEAREPORT_DATA_DIR", "./seareport_data_temp")
-
-    # Set the environment variable if not set
-    if "SEAREPORT_DATA_DIR" not in os.environ:
-        print(f"Setting SEAREPORT_DATA_DIR to: {data_dir}")
-        os.environ["SEAREPORT_DATA_DIR"] = data_dir
-
-    resources = generate_all_resources()
-    for key in resources:
-        print(key)
-
+def validate_sequentially(resources):
+    """Download the resources one by one, cleaning up after each one."""
     failed = []
     succeeded = []
 
@@ -113,6 +115,286 @@ def main():
             # Try to clean up even on failure
             clean_data_dir()
 
+    return succeeded, failed
+
+
+def validate_concurrently(resources, workers):
+    """Download the registry resources concurrently and the rest of the resources one by one."""
+    registry_resources = list(D.iter_resources())
+    print(f"Data directory: {os.environ['SEAREPORT_DATA_DIR']}")
+    print(f"Total resources to validate: {len(registry_resources) + 2} using {workers} workers\n")
+    print("=" * 60)
+
+    failed = []
+    succeeded = []
+
+    def on_result(result):
+        if result.ok:
+            print(f"✅ Successfully downloaded {result.resource.key} ({result.elapsed:.1f}s)")
+            succeeded.append(result.resource.key)
+            os.remove(result.path)
+        else:
+            print(f"❌ Failed to download {result.resource.key}: {result.error}")
+            failed.append((result.resource.key, str(result.error)))
+
+    D.fetch_many(registry_resources, max_workers=workers, callback=on_result)
+
+    # These are not downloaded from the registry URLs
+    remaining = {name: func for name, func in resources.items() if name.startswith(("Copernicus", "UTM"))}
+    remaining_succeeded, remaining_failed = validate_sequentially(remaining)
+    return succeeded + remaining_succeeded, failed + remaining_failed
+
+
+def get_remote_size(response):
+    """Return the size of the remote file from a HEAD or ranged GET response."""
+    # e.g. "bytes 0-0/12345"
+    total = response.headers.get("Content-Range", "").rpartition("/")[2]
+    if total.isdigit():
+        return int(total)
+    # The length of a GET is the size of the file, unless the server honoured the range
+    length = response.headers.get("Content-Length")
+    is_whole_file = response.request.method == "HEAD" or response.status_code == httpx.codes.OK
+    return int(length) if length is not None and is_whole_file else None
+
+
+def check_url(client, limiter, resource):
+    """Check that a resource is available upstream, without downloading it.
+
+    A HEAD request is used. Servers that don't support HEAD (or don't report the size) get a GET
+    for the first byte instead.
+    """
+    record = {
+        "key": resource.key,
+        "url": resource.url,
+        "expected_size": resource.size,
+        "expected_etag": resource.etag,
+    }
+    start = time.perf_counter()
+    try:
+        with limiter.get(resource.url):
+            response = client.head(resource.url)
+            if response.is_error or get_remote_size(response) is None:
+                with client.stream("GET", resource.url, headers={"Range": "bytes=0-0"}) as response:
+                    pass
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        return {**record, "ok": False, "error": str(exc), "elapsed": time.perf_counter() - start}
+    size = get_remote_size(response)
+    etag = response.headers.get("ETag")
+    errors = []
+    if resource.size is not None and size != resource.size:
+        errors.append(f"size {size} != {resource.size}")
+    if resource.etag is not None and etag != resource.etag:
+        errors.append(f"ETag {etag} != {resource.etag}")
+    return {
+        **record,
+        "ok": not errors,
+        "error": "; ".join(errors) or None,
+        "status": response.status_code,
+        "size": size,
+        "etag": etag,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def check_availability(registry_resources, workers, per_host_limit):
+    """Check all the registry URLs concurrently. Nothing is downloaded."""
+    print(f"Checking {len(registry_resources)} URLs using {workers} workers\n")
+    limiter = HostLimiter(per_host_limit or workers)
+    limits = httpx.Limits(max_connections=workers, max_keepalive_connections=workers)
+    records = []
+    with httpx.Client(follow_redirects=True, timeout=30, limits=limits) as client:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(check_url, client, limiter, resource) for resource in registry_resources
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                record = future.result()
+                if record["ok"]:
+                    print(f"✅ {record['key']} ({record['size']} bytes, {record['elapsed']:.2f}s)")
+                else:
+                    print(f"❌ {record['key']}: {record['error'].splitlines()[0]}")
+                records.append(record)
+    return records
+
+
+def iter_records(node, path=()):
+    """Yield the path and the value of every mapping of a registry."""
+    if isinstance(node, dict):
+        yield path, node
+        for key, value in node.items():
+            yield from iter_records(value, (*path, key))
+
+
+def record_validators(path, registry_resources, records):
+    """Record the sizes and the ETags that the servers reported in the registry at `path`.
+
+    Records with a `url` get `size` and `etag` keys, and records with a `base_url` get `sizes` and
+    `etags` mappings, keyed by the name of the file relative to the base URL. URLs that couldn't be
+    checked keep their previous values. Return the number of recorded URLs.
+    """
+    registry = json.loads(pathlib.Path(path).read_text())
+    # The URLs of the resources are resolved against the location of the registry
+    resolved = load_registry(pathlib.Path(path).resolve().as_uri())
+    resources = {resource.url: resource for resource in registry_resources}
+    checked = {
+        record["url"]: record for record in records if "status" in record and record["url"] in resources
+    }
+    recorded = set()
+    for keys, node in iter_records(resolved):
+        target = functools.reduce(operator.getitem, keys, registry)
+        if node.get("url") in checked:
+            record = checked[node["url"]]
+            target.update({key: record[key] for key in ("size", "etag") if record[key] is not None})
+            recorded.add(node["url"])
+        elif isinstance(node.get("base_url"), str):
+            for url, record in checked.items():
+                resource = resources[url]
+                if keys != (resource.dataset, resource.version) or not url.startswith(node["base_url"]):
+                    continue
+                filename = url.removeprefix(node["base_url"])
+                for key in ("size", "etag"):
+                    if record[key] is not None:
+                        target.setdefault(f"{key}s", {})[filename] = record[key]
+                recorded.add(url)
+    pathlib.Path(path).write_text(json.dumps(registry, indent=2) + "\n")
+    print(f"\nRecorded the sizes and the ETags of {len(recorded)} URLs in: {path}")
+    return len(recorded)
+
+
+def validate_sample(registry_resources, sample, workers, seed):
+    """Download a random subset of the registry resources concurrently, to measure throughput."""
+    # The sample only needs to be reproducible, not unpredictable
+    rng = random.Random(seed)  # noqa: S311
+    resources = rng.sample(registry_resources, min(sample, len(registry_resources)))
+    print(f"Downloading a sample of {len(resources)} resources using {workers} workers\n")
+    records = []
+    for result in D.fetch_many(resources, max_workers=workers):
+        record = {"key": result.resource.key, "url": result.resource.url, "elapsed": result.elapsed}
+        if result.ok:
+            size = os.path.getsize(result.path)
+            record.update(ok=True, error=None, size=size, throughput=size / max(result.elapsed, 1e-9))
+            print(f"✅ {result.resource.key} ({size / 2**20:.1f} MiB in {result.elapsed:.1f}s)")
+        else:
+            record.update(ok=False, error=str(result.error))
+            print(f"❌ {result.resource.key}: {result.error}")
+        records.append(record)
+    return records
+
+
+def write_report(path, args, records, elapsed):
+    """Write a JSON report with the outcome and the timings of every resource."""
+    report = {
+        "check": args.check,
+        "sample": args.sample,
+        "seed": args.seed,
+        "created_at": dt.datetime.now(tz=dt.timezone.utc).isoformat(),
+        "registry_url": args.registry_url,
+        "workers": args.workers,
+        "elapsed": elapsed,
+        "total": len(records),
+        "failed": sum(not record["ok"] for record in records),
+        "resources": sorted(records, key=lambda record: record["key"]),
+    }
+    with open(path, "w") as fd:
+        json.dump(report, fd, indent=2)
+    print(f"\nWrote report to: {path}")
+
+
+def run_fast_modes(args):
+    """Run the availability check and/or the sampled download. Return the exit code."""
+    registry_resources = list(D.iter_resources(args.registry_url))
+    args.workers = args.workers or 16
+    start = time.perf_counter()
+    records = []
+    if args.check:
+        records += [
+            {**record, "mode": "check"}
+            for record in check_availability(registry_resources, args.workers, args.per_host_limit)
+        ]
+        if args.update_registry:
+            record_validators(args.update_registry, registry_resources, records)
+    if args.sample:
+        records += [
+            {**record, "mode": "sample"}
+            for record in validate_sample(registry_resources, args.sample, args.workers, args.seed)
+        ]
+        clean_data_dir()
+    elapsed = time.perf_counter() - start
+    failed = [record for record in records if not record["ok"]]
+    print(f"\nChecked {len(records)} resources in {elapsed:.1f}s: {len(failed)} failed")
+    if args.report:
+        write_report(args.report, args, records, elapsed)
+    return 1 if failed else 0
+
+
+def main():
+    """Main validation function."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="The number of resources to download concurrently. "
+        "If greater than 1, the registry resources are downloaded with `fetch_many()` and are only hashed. "
+        "Defaults to 1, or to 16 with `--check` and `--sample`.",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only check that the registry URLs are available, with HEAD requests. "
+        "The sizes and ETags are compared to the registry, if it records them.",
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=0,
+        help="Download a random sample of this many registry resources concurrently.",
+    )
+    parser.add_argument("--seed", type=int, help="The seed of the random sample.")
+    parser.add_argument(
+        "--per-host-limit",
+        type=int,
+        help="The maximum number of concurrent requests per host.",
+    )
+    parser.add_argument(
+        "--registry-url",
+        help="Validate the resources of this registry, e.g. a local mirror.",
+    )
+    parser.add_argument(
+        "--update-registry",
+        metavar="PATH",
+        help="With `--check`, record the sizes and the ETags that the servers report in the registry at PATH "
+        "(e.g. `seareport_data/registry.json`), so that later checks and downloads compare them.",
+    )
+    parser.add_argument(
+        "--report",
+        help="Write a JSON report with the timings of `--check` and `--sample`.",
+    )
+    args = parser.parse_args()
+    if args.update_registry and not args.check:
+        parser.error("--update-registry requires --check")
+
+    data_dir = os.environ.get("SEAREPORT_DATA_DIR", "./seareport_data_temp")
+
+    # Set the environment variable if not set
+    if "SEAREPORT_DATA_DIR" not in os.environ:
+        print(f"Setting SEAREPORT_DATA_DIR to: {data_dir}")
+        os.environ["SEAREPORT_DATA_DIR"] = data_dir
+
+    if args.check or args.sample:
+        exit_code = run_fast_modes(args)
+        clean_data_dir()
+        return exit_code
+
+    resources = generate_all_resources()
+    for key in resources:
+        print(key)
+
+    if args.workers is not None and args.workers > 1:
+        succeeded, failed = validate_concurrently(resources, workers=args.workers)
+    else:
+        succeeded, failed = validate_sequentially(resources)
+
     # Final cleanup
     clean_data_dir()
 
@@ -120,7 +402,7 @@ def main():
     print("\n" + "=" * 60)
     print("VALIDATION SUMMARY")
     print("=" * 60)
-    print(f"Total resources: {len(resources)}")
+    print(f"Total resources: {len(succeeded) + len(failed)}")
     print(f"✅ Succeeded: {len(succeeded)}")
     print(f"❌ Failed: {len(failed)}")
 